@@ -1,8 +1,10 @@
 from app.services.video_processing import VideoProcessingService
 from app.services.face_recognition import FaceRecognitionService
+from app.services.face_recognition_service import FaceVerificationService
 
 _video_service = None
 _face_service = None
+_verification_service = None
 
 
 def get_video_service() -> VideoProcessingService:
@@ -16,4 +18,12 @@ def get_face_service() -> FaceRecognitionService:
     global _face_service
     if _face_service is None:
         _face_service = FaceRecognitionService()
-    return _face_service
\ No newline at end of file
+    return _face_service
+
+
+def get_verification_service() -> FaceVerificationService:
+    global _verification_service
+    if _verification_service is None:
+        # Share the recognizer (detector, encoder, storage) with the attendance endpoints
+        _verification_service = FaceVerificationService(get_face_service())
+    return _verification_service
@@ -1,24 +1,59 @@
-from fastapi import APIRouter, UploadFile, HTTPException
-from app.services.face_recognition_service import FaceRecognitionService
-from app.schemas.face import FaceVerificationResult
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
+from typing import List
+from app.api.dependencies import get_verification_service
+from app.config import settings
+from app.services.face_recognition_service import FaceVerificationService
+from app.schemas.face import BatchVerificationResult, FaceVerificationResult
 
 router = APIRouter()
-face_service = FaceRecognitionService()
 
 @router.post("/enroll")
-async def enroll_face(user_id: str, image: UploadFile):
+async def enroll_face(
+    user_id: str,
+    image: UploadFile,
+    face_service: FaceVerificationService = Depends(get_verification_service)
+):
     try:
         image_bytes = await image.read()
-        result = face_service.enroll_face(user_id, image_bytes)
-        return {"success": True, "message": "Face enrolled successfully"}
+        result = await face_service.enroll_face(user_id, image_bytes)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['message'])
+    return {"success": True, "message": "Face enrolled successfully"}
 
 @router.post("/verify", response_model=FaceVerificationResult)
-async def verify_face(user_id: str, image: UploadFile):
+async def verify_face(
+    user_id: str,
+    image: UploadFile,
+    face_service: FaceVerificationService = Depends(get_verification_service)
+):
     try:
         image_bytes = await image.read()
-        result = face_service.verify_face(user_id, image_bytes)
+        result = await face_service.verify_face(user_id, image_bytes)
         return result
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/verify-batch", response_model=BatchVerificationResult)
+async def verify_faces(
+    user_ids: List[str] = Form(...),
+    images: List[UploadFile] = File(...),
+    face_service: FaceVerificationService = Depends(get_verification_service)
+):
+    """
+    Verify many (user_id, image) pairs in one request
+
+    - **user_ids**: One form field per pair, in the same order as images
+    - **images**: One image per pair
+
+    Per-pair failures (unknown user, no face) are reported in `error`.
+    """
+    if len(user_ids) != len(images):
+        raise HTTPException(status_code=400, detail="One user_id required per image")
+    if len(images) > settings.MAX_VERIFY_BATCH:
+        raise HTTPException(status_code=400, detail=f"Maximum {settings.MAX_VERIFY_BATCH} pairs per request")
+
+    pairs = [(user_id, await image.read()) for user_id, image in zip(user_ids, images)]
+    results = await face_service.verify_batch(pairs)
+    return BatchVerificationResult(results=results, matched=sum(r.is_match for r in results))
@@ -0,0 +1,147 @@
+import hmac
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.utils.profiling import PROFILE_MODES, ProfileSession, end_session, is_valid_request_id, start_session
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TIMEOUT_HEADER = b'x-queue-timeout'
+PROFILE_HEADER = b'x-profile'
+PROFILE_MODE_HEADER = b'x-profile-mode'
+REQUEST_ID_HEADER = b'x-request-id'
+
+
+def is_profiling_admin(token: Optional[str]) -> bool:
+    """Whether token is the configured PROFILING_TOKEN"""
+    return _token_matches(token, settings.PROFILING_TOKEN)
+
+
+def is_detector_admin(token: Optional[str]) -> bool:
+    """Whether token is the configured DETECTOR_ADMIN_TOKEN"""
+    return _token_matches(token, settings.DETECTOR_ADMIN_TOKEN)
+
+
+def _token_matches(token: Optional[str], expected: Optional[str]) -> bool:
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+class AdmissionMiddleware:
+    """
+    Admit expensive requests through their AdmissionController
+
+    Runs before the request body is read, so a rejected upload is
+    answered at once instead of after it has streamed to disk. Clients
+    may shorten their queue deadline with an X-Queue-Timeout header
+    (seconds); admitted responses carry the time spent queued in
+    X-Queue-Wait. The arrival time (time.time()) is kept in
+    request.state.arrived_at, so latency budgets include the queue wait
+    and the upload.
+    """
+
+    def __init__(self, app, routes: Dict[str, AdmissionController]):
+        """
+        Args:
+            app: ASGI application
+            routes: Request path -> controller admitting POSTs to it
+        """
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        controller = None
+        if scope['type'] == 'http' and scope['method'] == 'POST':
+            controller = self.routes.get(scope['path'])
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope.setdefault('state', {})['arrived_at'] = time.time()
+        try:
+            waited = await controller.acquire(self._queue_timeout(scope))
+        except AdmissionRejected as e:
+            logger.warning("Rejected %s (%s): %s", scope['path'], e.status_code, e)
+            response = JSONResponse(
+                {'detail': str(e)},
+                status_code=e.status_code,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_wait(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-queue-wait', f"{waited:.3f}".encode())
+                ]
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_wait)
+        finally:
+            controller.release(time.monotonic() - started)
+
+    @staticmethod
+    def _queue_timeout(scope):
+        for name, value in scope.get('headers', []):
+            if name == QUEUE_TIMEOUT_HEADER:
+                try:
+                    return float(value)
+                except ValueError:
+                    return None
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request CPU and memory profiling
+
+    A request is profiled when it carries X-Profile: <PROFILING_TOKEN>, or
+    for every request with PROFILE_ALL_REQUESTS. X-Profile-Mode picks
+    'sample' (all threads) or 'cprofile' (calling thread); the default is
+    PROFILING_MODE. The instrumented service calls of the request write
+    their artifacts under its X-Request-ID (generated if missing), which
+    is returned in X-Profile-Id. With profiling off a request pays only
+    for the header scan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not (settings.PROFILING_TOKEN or settings.PROFILE_ALL_REQUESTS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name: value.decode('latin-1') for name, value in scope.get('headers', [])
+                   if name in (PROFILE_HEADER, PROFILE_MODE_HEADER, REQUEST_ID_HEADER)}
+        if not settings.PROFILE_ALL_REQUESTS and not is_profiling_admin(headers.get(PROFILE_HEADER)):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get(REQUEST_ID_HEADER, '')
+        if not is_valid_request_id(request_id):
+            request_id = uuid.uuid4().hex
+        mode = headers.get(PROFILE_MODE_HEADER, settings.PROFILING_MODE)
+        if mode not in PROFILE_MODES:
+            mode = settings.PROFILING_MODE
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-profile-id', request_id.encode())
+                ]
+            await send(message)
+
+        token = start_session(ProfileSession(request_id, mode))
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            end_session(token)
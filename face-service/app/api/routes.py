@@ -1,50 +1,147 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Header, Request
+from fastapi.responses import FileResponse
+from typing import List, Optional
 import logging
 
-from app.api.schemas.video import VideoProcessRequest, VideoProcessResponse
+from app.api.schemas.video import VideoProcessRequest, VideoProcessResponse, SessionProcessResponse
 from app.api.schemas.face import FaceEnrollRequest, FaceEnrollResponse
+from app.api.schemas.detector import DetectorBackendOverride, DetectorBackendStatus
+from app.api.schemas.admission import AdmissionStatus
+from app.api.schemas.profiling import ProfileArtifacts
 from app.services.video_processing import VideoProcessingService
 from app.services.face_recognition import FaceRecognitionService
 from app.api.dependencies import get_video_service, get_face_service
+from app.api.middleware import is_detector_admin, is_profiling_admin
+from app.services.admission import get_admission_controllers
+from app.services.cancellation import JobAlreadyRunning, abort_job, cancellable_job
+from app.services.detector_backends import detector_backend_status, set_detector_backend
+from app.services.qos import PRIORITIES
+from app.utils.exceptions import ProcessingCancelledException
+from app.utils.profiling import get_profile_store
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Nginx's "client closed request"; only seen by callers that aborted via DELETE /jobs
+CANCELLED_STATUS = 499
+
 
 @router.post("/process-video", response_model=VideoProcessResponse)
 async def process_video(
+    request: Request,
     video: UploadFile = File(...),
-    class_id: str = None,
+    class_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    latency_budget: Optional[float] = Form(None),
+    priority: str = Form('normal'),
+    job_id: Optional[str] = Form(None),
     video_service: VideoProcessingService = Depends(get_video_service)
 ):
     """
     Process attendance video and detect faces
     
     - **video**: Video file (MP4, MOV, AVI)
-    - **class_id**: Optional class identifier
+    - **class_id**: Optional class identifier (defaults to the session's class)
+    - **session_id**: Optional attendance session; results are written to
+      attendance_records and the session counters in one transaction
+    - **latency_budget**: Optional seconds processing may take; fewer frames
+      are sampled, small faces skipped or processing stopped early to fit.
+      The response's `qos` reports what was done and the coverage achieved
+    - **priority**: `interactive` (may also skip small faces), `normal`, or
+      `batch` (budget ignored, never degraded)
+    - **job_id**: Optional caller-chosen id; `DELETE /jobs/{job_id}` aborts
+      the job. Processing also stops when the client disconnects
     """
     try:
         # Validate video file
         if not video.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="File must be a video")
         
-        # Read video content
-        video_content = await video.read()
-        
-        logger.info(f"Processing video: {video.filename} ({len(video_content)} bytes)")
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+        if latency_budget is not None and latency_budget <= 0:
+            raise HTTPException(status_code=400, detail="latency_budget must be positive")
         
-        # Process video
-        result = await video_service.process_video(
-            video_content=video_content,
-            filename=video.filename,
-            class_id=class_id
-        )
+        # Stream to disk and process (repeat uploads are served from the result cache)
+        async with cancellable_job(request, job_id) as token:
+            result = await video_service.process_upload(
+                video, class_id=class_id, session_id=session_id,
+                latency_budget=latency_budget, priority=priority, cancel_token=token,
+                arrived_at=getattr(request.state, 'arrived_at', None)
+            )
         
         return VideoProcessResponse(**result)
         
+    except HTTPException:
+        raise
+    except ProcessingCancelledException as e:
+        raise HTTPException(status_code=CANCELLED_STATUS, detail=str(e))
+    except JobAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        logger.error(f"Error processing video: {str(e)}")
+        logger.error("Error processing video: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/process-session", response_model=SessionProcessResponse)
+async def process_session(
+    request: Request,
+    videos: List[UploadFile] = File(...),
+    class_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    offsets: Optional[str] = Form(None),
+    job_id: Optional[str] = Form(None),
+    video_service: VideoProcessingService = Depends(get_video_service)
+):
+    """
+    Process videos from several cameras of one session and merge attendance
+    
+    - **videos**: One video file per camera
+    - **class_id**: Optional class identifier (defaults to the session's class)
+    - **session_id**: Optional attendance session; fused results are written
+      to attendance_records and the session counters in one transaction
+    - **offsets**: Optional comma-separated start offset in seconds of each
+      video on the session clock, e.g. "0,2.5"
+    - **job_id**: Optional caller-chosen id; `DELETE /jobs/{job_id}` aborts
+      the job. Processing also stops when the client disconnects
+    """
+    try:
+        if len(videos) > settings.MAX_SESSION_VIDEOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Maximum {settings.MAX_SESSION_VIDEOS} videos per session"
+            )
+        
+        for video in videos:
+            if not video.content_type.startswith('video/'):
+                raise HTTPException(status_code=400, detail=f"{video.filename} must be a video")
+        
+        start_offsets = None
+        if offsets:
+            try:
+                start_offsets = [float(offset) for offset in offsets.split(',')]
+            except ValueError:
+                raise HTTPException(status_code=400, detail="offsets must be comma-separated seconds")
+            if len(start_offsets) != len(videos):
+                raise HTTPException(status_code=400, detail="One offset required per video")
+        
+        async with cancellable_job(request, job_id) as token:
+            result = await video_service.process_session(
+                videos, class_id=class_id, session_id=session_id, offsets=start_offsets,
+                cancel_token=token
+            )
+        
+        return SessionProcessResponse(**result)
+        
+    except HTTPException:
+        raise
+    except ProcessingCancelledException as e:
+        raise HTTPException(status_code=CANCELLED_STATUS, detail=str(e))
+    except JobAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Error processing session videos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -75,7 +172,7 @@ async def enroll_face(
             content = await img.read()
             image_data.append(content)
         
-        logger.info(f"Enrolling face for student: {student_id} with {len(image_data)} images")
+        logger.info("Enrolling face for student: %s with %s images", student_id, len(image_data))
         
         # Enroll face
         result = await face_service.enroll_student_face(
@@ -86,7 +183,7 @@ async def enroll_face(
         return FaceEnrollResponse(**result)
         
     except Exception as e:
-        logger.error(f"Error enrolling face: {str(e)}")
+        logger.error("Error enrolling face: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -100,7 +197,7 @@ async def get_student_embeddings(
         embeddings = await face_service.get_student_embeddings(student_id)
         return {"student_id": student_id, "embeddings": embeddings}
     except Exception as e:
-        logger.error(f"Error fetching embeddings: {str(e)}")
+        logger.error("Error fetching embeddings: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -114,5 +211,73 @@ async def delete_student_embeddings(
         await face_service.delete_student_embeddings(student_id)
         return {"message": "Embeddings deleted successfully", "student_id": student_id}
     except Exception as e:
-        logger.error(f"Error deleting embeddings: {str(e)}")
+        logger.error("Error deleting embeddings: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/detector/backend", response_model=DetectorBackendStatus)
+async def get_detector_backend_status():
+    """Selected face detector backend, how it was chosen, and calibration results"""
+    return detector_backend_status()
+
+
+@router.put("/detector/backend", response_model=DetectorBackendStatus)
+async def override_detector_backend(
+    request: DetectorBackendOverride,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Override the detector backend on this instance (requires X-Admin-Token)
+    
+    - **backend**: Name from the `available` list of GET /detector/backend
+    """
+    if not is_detector_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Detector admin token required")
+    try:
+        set_detector_backend(request.backend, source='override')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return detector_backend_status()
+
+
+@router.get("/admission", response_model=AdmissionStatus)
+async def get_admission_metrics():
+    """Concurrency, queue depth, wait times and rejections of the admission controllers"""
+    return {name: controller.metrics() for name, controller in get_admission_controllers().items()}
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Abort a running /process-video or /process-session job
+    
+    - **job_id**: The `job_id` the job was submitted with
+    """
+    if not abort_job(job_id, reason='aborted by caller'):
+        raise HTTPException(status_code=404, detail=f"No running job {job_id} on this instance")
+    return {"message": "Job cancelled", "job_id": job_id}
+
+
+@router.get("/profiles", response_model=List[ProfileArtifacts])
+async def list_profiles(x_profile: Optional[str] = Header(None)):
+    """Profiled requests and their artifacts, newest first (requires X-Profile)"""
+    if not is_profiling_admin(x_profile):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    return get_profile_store().list()
+
+
+@router.get("/profiles/{request_id}/{artifact}")
+async def download_profile_artifact(request_id: str, artifact: str, x_profile: Optional[str] = Header(None)):
+    """
+    Download one profile artifact (requires X-Profile)
+    
+    - **request_id**: X-Profile-Id of the profiled request
+    - **artifact**: `<call>.prof` (pstats), `<call>.folded` (flamegraph stacks)
+      or `<call>.txt` (top functions and allocation sites)
+    """
+    if not is_profiling_admin(x_profile):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    path = get_profile_store().artifact_path(request_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    return FileResponse(path, filename=f"{request_id}-{artifact}")
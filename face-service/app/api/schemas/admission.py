@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+
+class AdmissionMetrics(BaseModel):
+    name: str
+    max_concurrent: int
+    max_queue: int
+    active: int
+    queued: int
+    admitted: int
+    rejected_queue_full: int
+    rejected_timeout: int
+    mean_wait_seconds: float
+    max_wait_seconds: float
+    mean_service_seconds: float
+
+
+class AdmissionStatus(BaseModel):
+    video: AdmissionMetrics
+    enrollment: AdmissionMetrics
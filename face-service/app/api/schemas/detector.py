@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class DetectorBackendInfo(BaseModel):
+    name: str
+    kind: str
+    input_size: Optional[int] = None
+
+
+class BackendCalibration(BaseModel):
+    backend: str
+    latency_ms: Optional[float] = None
+    recall: Optional[float] = None
+    false_positives: Optional[int] = None
+    error: Optional[str] = None
+
+
+class DetectorBackendStatus(BaseModel):
+    selected: DetectorBackendInfo
+    source: Optional[str] = None
+    available: List[str]
+    calibration: List[BackendCalibration] = []
+
+
+class DetectorBackendOverride(BaseModel):
+    backend: str
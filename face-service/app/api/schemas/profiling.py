@@ -0,0 +1,9 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class ProfileArtifacts(BaseModel):
+    request_id: str
+    created_at: float  # unix time of the newest artifact
+    artifacts: List[str]
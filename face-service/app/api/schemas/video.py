@@ -8,6 +8,21 @@ class FaceDetection(BaseModel):
     confidence: float
     frame_number: int
     timestamp: float
+    camera: Optional[int] = None
+
+
+class LivenessResult(BaseModel):
+    score: float
+    is_live: Optional[bool] = None
+    samples: int
+    motion: float
+    blink: float
+    texture: float
+
+
+class PresenceInterval(BaseModel):
+    start: float
+    end: float
 
 
 class RecognizedStudent(BaseModel):
@@ -15,10 +30,36 @@ class RecognizedStudent(BaseModel):
     student_name: str
     confidence: float
     detections: List[FaceDetection]
+    first_seen: Optional[float] = None
+    last_seen: Optional[float] = None
+    presence_duration: float = 0.0
+    presence_intervals: List[PresenceInterval] = []
+    present: bool = True
+    cameras: Optional[List[int]] = None
+    liveness: Optional[LivenessResult] = None
 
 
 class VideoProcessRequest(BaseModel):
     class_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class SessionAttendance(BaseModel):
+    session_id: str
+    total_students: int
+    present_count: int
+    absent_count: int
+
+
+class QosReport(BaseModel):
+    priority: str
+    latency_budget: Optional[float] = None
+    frame_rate: float
+    min_face_size: int = 0
+    degraded: bool = False
+    stopped_early: bool = False
+    estimated_coverage: float = 1.0
+    coverage: float = 1.0
 
 
 class VideoProcessResponse(BaseModel):
@@ -29,5 +70,36 @@ class VideoProcessResponse(BaseModel):
     total_faces_detected: int
     unique_students_identified: int
     recognized_students: List[RecognizedStudent]
+    liveness_rejected: List[RecognizedStudent] = []
+    processing_time: float
+    content_hash: Optional[str] = None
+    cache_hit: bool = False
+    session: Optional[SessionAttendance] = None
+    qos: Optional[QosReport] = None
+    timestamp: datetime = datetime.now()
+
+
+class SessionVideoSummary(BaseModel):
+    camera: int
+    filename: str
+    video_id: str
+    content_hash: Optional[str] = None
+    cache_hit: bool = False
+    total_frames: int
+    processed_frames: int
+    total_faces_detected: int
+    unique_students_identified: int
+    processing_time: float
+
+
+class SessionProcessResponse(BaseModel):
+    success: bool
+    class_id: Optional[str] = None
+    videos: List[SessionVideoSummary]
+    total_faces_detected: int
+    unique_students_identified: int
+    recognized_students: List[RecognizedStudent]
+    liveness_rejected: List[RecognizedStudent] = []
     processing_time: float
+    session: Optional[SessionAttendance] = None
     timestamp: datetime = datetime.now()
@@ -115,6 +115,30 @@ class Settings(BaseSettings):
     MIN_FACE_SIZE: int = 80
     MAX_FACES_PER_FRAME: int = 50
     
+    # Quality gate (video faces below these are not embedded; floors keep small back-row faces)
+    ENABLE_QUALITY_GATE: bool = True
+    QUALITY_MIN_FACE_SIZE: int = 24  # pixels, shorter box side
+    QUALITY_MIN_CONFIDENCE: float = 0.7  # at DETECTION_CONFIDENCE, so confidence alone never gates
+    QUALITY_MIN_SHARPNESS: float = 50.0  # Laplacian variance of the 32x32 grayscale crop
+    QUALITY_MIN_BRIGHTNESS: float = 40.0  # mean gray level, 0-255
+    QUALITY_MAX_BRIGHTNESS: float = 220.0
+    QUALITY_DEFER_SECONDS: float = 2.0  # a face seen only below the gate is embedded once this often
+    
+    # Detector backend ("auto" = pick by startup calibration, or a backend name
+    # from GET /api/detector/backend, e.g. "dnn-300-opencv-cpu" or "haar")
+    DETECTOR_BACKEND: str = "auto"
+    DETECTOR_MIN_RECALL: float = 0.9  # accuracy floor on the calibration frames
+    DETECTOR_MAX_FALSE_POSITIVES: float = 0.2  # per calibration frame
+    DETECTOR_CALIBRATION_ROUNDS: int = 3
+    DETECTOR_THREADS: int = 0  # cv2 threads; 0 keeps the OpenCV default
+    DETECTOR_ADMIN_TOKEN: Optional[str] = None  # X-Admin-Token for PUT /api/detector/backend; unset = config only
+    
+    # Detection cascade (cheap Haar prefilter in front of the DNN)
+    DETECTION_CASCADE: bool = True
+    CASCADE_PREFILTER_WIDTH: int = 640  # frame width for the Haar pass
+    CASCADE_FULL_FRAME_INTERVAL: int = 10  # every Nth frame skips the prefilter; 0 = never
+    CASCADE_MIN_FACE_SIZE: int = 40  # pixels; the Haar pass is never downscaled so far it misses these
+    
     # Face Recognition Settings
     RECOGNITION_THRESHOLD: float = 0.6
     EMBEDDING_SIZE: int = 512
@@ -122,11 +146,78 @@ class Settings(BaseSettings):
     # Liveness Detection
     ENABLE_LIVENESS: bool = True
     LIVENESS_THRESHOLD: float = 0.85
+    LIVENESS_MIN_SAMPLES: int = 3  # sightings needed before a track can be rejected
+    LIVENESS_GATING: bool = False  # drop non-live identities; off: report scores only (uncalibrated)
     
     # Processing
     VIDEO_FRAME_RATE: int = 2
     MAX_VIDEO_DURATION: int = 10
     BATCH_SIZE: int = 16
+    MAX_SESSION_VIDEOS: int = 4  # cameras per /process-session request
+    
+    # Presence (duration-based attendance)
+    PRESENCE_GAP_SECONDS: float = 10.0  # gaps up to this long do not split an interval
+    MIN_PRESENCE_SECONDS: float = 0.0  # 0 disables the minimum-presence rule
+    
+    # Video Pipeline (decode -> detect -> recognize -> aggregate)
+    PIPELINE_BATCH_FRAMES: int = 4  # sampled frames per queue item
+    PIPELINE_QUEUE_SIZE: int = 4  # batches buffered between stages
+    PIPELINE_DETECT_WORKERS: int = 2
+    PIPELINE_RECOGNIZE_WORKERS: int = 1
+    
+    # Segment-parallel processing of long videos (worker processes)
+    SEGMENT_WORKERS: int = os.cpu_count() or 1
+    SEGMENT_MIN_SECONDS: int = 60  # shortest segment worth its own worker
+    
+    # Result Cache (skips reprocessing of re-uploaded videos)
+    ENABLE_RESULT_CACHE: bool = True
+    RESULT_CACHE_DIR: str = "./storage/result_cache"
+    RESULT_CACHE_TTL: int = 24 * 60 * 60  # seconds
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    MODEL_VERSION: str = "res10-ssd+dlib-resnet-v1"
+    
+    # 1:1 Verification (/api/face/verify, /api/face/verify-batch)
+    VERIFY_TEMPLATE_CACHE_SIZE: int = 1024  # students whose templates stay in memory
+    MAX_VERIFY_BATCH: int = 64  # pairs per /verify-batch request
+    
+    # Latency-budget QoS for /process-video (latency_budget, priority)
+    QOS_BUDGET_FRACTION: float = 0.8  # share of the budget planned for processing
+    QOS_MIN_FRAME_RATE: float = 0.5  # lowest sampling rate a budget may force
+    QOS_MIN_FACE_SIZE: int = 40  # pixels; interactive requests skip smaller faces when short on time
+    QOS_FRAME_COST: float = 0.1  # seconds per sampled frame on one pipeline until measured on this host
+    
+    # Admission Control (concurrent jobs, bounded wait queue, 429/503 + Retry-After)
+    MAX_CONCURRENT_VIDEO_JOBS: int = 2
+    VIDEO_QUEUE_SIZE: int = 8
+    VIDEO_QUEUE_TIMEOUT: float = 120.0  # seconds a video request may wait for a slot
+    MAX_CONCURRENT_ENROLLMENTS: int = 4
+    ENROLLMENT_QUEUE_SIZE: int = 16
+    ENROLLMENT_QUEUE_TIMEOUT: float = 10.0
+    
+    # Cancellation (client disconnects, DELETE /api/jobs/{job_id})
+    DISCONNECT_POLL_INTERVAL: float = 1.0  # seconds between client disconnect checks
+    
+    # Job Checkpoints (long videos resume after a pod restart)
+    ENABLE_CHECKPOINTS: bool = True
+    CHECKPOINT_DIR: str = "./storage/checkpoints"
+    CHECKPOINT_INTERVAL: int = 60  # seconds between checkpoints of a running job
+    CHECKPOINT_TTL: int = 24 * 60 * 60  # seconds; abandoned checkpoints are pruned after this
+    
+    # Gallery Cache (kept current across pods via Postgres LISTEN/NOTIFY)
+    ENABLE_GALLERY_CACHE: bool = True
+    GALLERY_NOTIFY_CHANNEL: str = "face_gallery"
+    GALLERY_LISTENER_PING_INTERVAL: int = 30  # seconds
+    GALLERY_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # prefetching never grows the cache past this
+    GALLERY_PRECISION: str = "float64"  # float64, float32, float16 or int8 (codes + per-row scale)
+    GALLERY_RERANK_CANDIDATES: int = 10  # closest students per face measured again directly (float16/int8)
+    
+    # Gallery Prefetch (warm galleries of upcoming attendance sessions)
+    ENABLE_GALLERY_PREFETCH: bool = True
+    GALLERY_PREFETCH_INTERVAL: int = 300  # seconds between scans of attendance_sessions
+    GALLERY_PREFETCH_HORIZON: int = 3600  # seconds; pending sessions starting within this are warmed
+    GALLERY_PREFETCH_RECENT: int = 24 * 60 * 60  # seconds; classes with sessions created within this are warmed
+    GALLERY_PREFETCH_MAX_PER_CYCLE: int = 20  # galleries loaded per scan at most
+    GALLERY_PREFETCH_DELAY: float = 0.5  # seconds between two gallery loads
     
     # GPU
     USE_GPU: bool = False
@@ -134,6 +225,17 @@ class Settings(BaseSettings):
     
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    LOG_SAMPLE_EVERY: int = 100  # keep 1 in N per-frame / per-face debug messages
+    
+    # Profiling (opt-in per request: X-Profile: <PROFILING_TOKEN>)
+    PROFILING_TOKEN: Optional[str] = None  # unset disables header-triggered profiling
+    PROFILE_ALL_REQUESTS: bool = False  # profile every instrumented call (staging only)
+    PROFILING_MODE: str = "sample"  # "sample" (all threads) or "cprofile" (calling thread)
+    PROFILING_SAMPLE_INTERVAL: float = 0.005  # seconds between stack samples
+    PROFILING_TRACEMALLOC_FRAMES: int = 1  # traceback depth of allocation sites
+    PROFILE_DIR: str = "./storage/profiles"
+    PROFILE_MAX_REQUESTS: int = 50  # newest profiled requests kept on disk
     
     def is_s3_enabled(self) -> bool:
         """Check if S3 storage is enabled and configured"""
@@ -1,5 +1,12 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class FaceVerificationResult(BaseModel):
     is_match: bool
-    confidence: float
\ No newline at end of file
+    confidence: float
+    user_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchVerificationResult(BaseModel):
+    results: List[FaceVerificationResult]
+    matched: int
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils.exceptions import FaceServiceException
+from app.utils.stats_utils import RunningStat
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(FaceServiceException):
+    """Request not admitted; the client should retry after retry_after seconds"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded FIFO wait queue
+
+    At most max_concurrent requests run at once; up to max_queue more
+    wait for a slot, each for at most its deadline. A full queue is
+    rejected immediately (429), a request whose deadline passes while
+    queued is rejected with 503. Both carry a Retry-After estimated from
+    recent service times.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+
+        self._active = 0
+        self._waiters = deque()
+
+        self.wait_time = RunningStat()
+        self.service_time = RunningStat()
+        self.max_wait_seen = 0.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a slot
+
+        Args:
+            timeout: Seconds this request may queue (capped at max_wait)
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            AdmissionRejected: Queue full (429) or deadline passed (503)
+        """
+        timeout = self.max_wait if timeout is None else min(max(0.0, timeout), self.max_wait)
+
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._record_wait(0.0)
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(
+                f"Too many {self.name} requests in progress", 429, self.retry_after()
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise AdmissionRejected(
+                    f"Timed out waiting for a {self.name} slot", 503, self.retry_after()
+                )
+            raise
+
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    def release(self, service_seconds: Optional[float] = None):
+        """Free a slot, handing it straight to the oldest waiter if any"""
+        if service_seconds is not None:
+            self.service_time.push(service_seconds)
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot ownership moves; _active unchanged
+                return
+        self._active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely get a slot"""
+        mean = self.service_time.mean if self.service_time.count else self.max_wait
+        estimate = mean * (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, min(int(math.ceil(estimate)), 3600))
+
+    def metrics(self) -> Dict:
+        return {
+            'name': self.name,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'active': self._active,
+            'queued': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+            'mean_wait_seconds': self.wait_time.mean,
+            'max_wait_seconds': self.max_wait_seen,
+            'mean_service_seconds': self.service_time.mean
+        }
+
+    def _record_wait(self, waited: float):
+        self.admitted += 1
+        self.wait_time.push(waited)
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def _remove_waiter(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controllers() -> Dict[str, AdmissionController]:
+    """Per-workload controllers of this process ('video', 'enrollment')"""
+    if not _controllers:
+        _controllers['video'] = AdmissionController(
+            'video',
+            settings.MAX_CONCURRENT_VIDEO_JOBS,
+            settings.VIDEO_QUEUE_SIZE,
+            settings.VIDEO_QUEUE_TIMEOUT
+        )
+        _controllers['enrollment'] = AdmissionController(
+            'enrollment',
+            settings.MAX_CONCURRENT_ENROLLMENTS,
+            settings.ENROLLMENT_QUEUE_SIZE,
+            settings.ENROLLMENT_QUEUE_TIMEOUT
+        )
+    return _controllers
@@ -0,0 +1,140 @@
+import logging
+from typing import Dict, List, Optional
+
+from app.core.database import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+# One statement: the roster of the session's class is upserted as present/absent
+# from the unnest()ed recognition arrays, and the session counters are updated
+# from the same snapshot. Manually overridden records are left untouched.
+PERSIST_SESSION_SQL = """
+WITH session AS (
+    SELECT id, class_id
+    FROM attendance_sessions
+    WHERE id = $1
+    FOR UPDATE
+),
+detected AS (
+    SELECT DISTINCT ON (student_id) student_id, confidence_score
+    FROM unnest($2::uuid[], $3::float8[]) AS d(student_id, confidence_score)
+    ORDER BY student_id, confidence_score DESC
+),
+roster AS (
+    SELECT s.id AS student_id, d.confidence_score, d.student_id IS NOT NULL AS face_detected
+    FROM students s
+    INNER JOIN session ON s.class_id = session.class_id
+    LEFT JOIN detected d ON d.student_id = s.id
+    WHERE s.is_active
+),
+overridden AS (
+    SELECT ar.student_id, ar.status
+    FROM attendance_records ar
+    WHERE ar.session_id = $1 AND ar.is_manual_override
+),
+upserted AS (
+    INSERT INTO attendance_records
+        (session_id, student_id, status, confidence_score, face_detected, updated_at)
+    SELECT
+        $1,
+        r.student_id,
+        CASE WHEN r.face_detected THEN 'present' ELSE 'absent' END,
+        r.confidence_score,
+        r.face_detected,
+        CURRENT_TIMESTAMP
+    FROM roster r
+    ON CONFLICT (session_id, student_id) DO UPDATE SET
+        status = EXCLUDED.status,
+        confidence_score = EXCLUDED.confidence_score,
+        face_detected = EXCLUDED.face_detected,
+        updated_at = EXCLUDED.updated_at
+    WHERE NOT attendance_records.is_manual_override
+    RETURNING 1
+),
+written AS (
+    SELECT count(*) AS records_written FROM upserted
+),
+counts AS (
+    SELECT
+        count(*) AS total_students,
+        count(*) FILTER (
+            WHERE COALESCE(o.status, CASE WHEN r.face_detected THEN 'present' ELSE 'absent' END)
+                = 'present'
+        ) AS present_count
+    FROM roster r
+    LEFT JOIN overridden o ON o.student_id = r.student_id
+)
+UPDATE attendance_sessions AS ats SET
+    total_students = counts.total_students,
+    present_count = counts.present_count,
+    absent_count = counts.total_students - counts.present_count,
+    processing_status = 'completed',
+    processing_completed_at = CURRENT_TIMESTAMP
+FROM counts, session, written
+WHERE ats.id = session.id
+RETURNING
+    ats.total_students,
+    ats.present_count,
+    ats.absent_count,
+    written.records_written
+"""
+
+
+class AttendanceWriterService:
+    """Persist video recognition results into attendance_records"""
+
+    async def get_session_class(self, session_id: str) -> Optional[str]:
+        """Class of an attendance session, used when the caller omits class_id"""
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            class_id = await conn.fetchval(
+                "SELECT class_id FROM attendance_sessions WHERE id = $1",
+                session_id
+            )
+            return str(class_id) if class_id is not None else None
+
+    async def persist_session_results(
+        self,
+        session_id: str,
+        recognized_students: List[Dict]
+    ) -> Dict:
+        """
+        Write attendance for a whole session in one round trip
+
+        Present students get their confidence and face_detected=true, the
+        rest of the active class roster is marked absent, and the session's
+        present/absent counters are updated in the same transaction.
+
+        Args:
+            session_id: attendance_sessions.id
+            recognized_students: recognized_students from the video result
+
+        Returns:
+            Session counters after the write
+        """
+        # Students seen for less than MIN_PRESENCE_SECONDS are recorded absent
+        present = [s for s in recognized_students if s.get('present', True)]
+        student_ids = [s['student_id'] for s in present]
+        confidences = [float(s['confidence']) for s in present]
+
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    PERSIST_SESSION_SQL, session_id, student_ids, confidences
+                )
+
+        if row is None:
+            raise ValueError(f"Attendance session not found: {session_id}")
+
+        logger.info(
+            "Session %s: %s/%s present (%s records written)",
+            session_id, row['present_count'], row['total_students'], row['records_written']
+        )
+
+        return {
+            'session_id': session_id,
+            'total_students': row['total_students'],
+            'present_count': row['present_count'],
+            'absent_count': row['absent_count']
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.exceptions import FaceServiceException, ProcessingCancelledException
+
+logger = logging.getLogger(__name__)
+
+# Running jobs of this process, by job id
+_jobs: Dict[str, 'CancellationToken'] = {}
+
+
+class JobAlreadyRunning(FaceServiceException):
+    """A job with the requested id is already running on this instance"""
+
+
+class CancellationToken:
+    """Cooperative cancellation signal for one video job
+
+    Set when the client disconnects or the job is aborted. Pipeline stages
+    poll is_set() between batches; callbacks forward the signal to where
+    polling cannot reach (e.g. events shared with segment worker processes).
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'cancelled'):
+        """Signal cancellation; only the first call has an effect"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+
+        logger.info("Job %s cancelled: %s", self.job_id, reason)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Cancellation callback failed for job %s: %s", self.job_id, e)
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Call callback on cancellation, at once if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ProcessingCancelledException(f"Video processing cancelled: {self.reason}")
+
+
+def register_job(job_id: Optional[str] = None) -> CancellationToken:
+    """
+    Token for a new job, abortable by id until unregister_job()
+
+    Raises:
+        JobAlreadyRunning: A job with this id is already running
+    """
+    token = CancellationToken(job_id)
+    if token.job_id in _jobs:
+        raise JobAlreadyRunning(f"Job {token.job_id} is already running")
+    _jobs[token.job_id] = token
+    return token
+
+
+def unregister_job(token: CancellationToken):
+    if _jobs.get(token.job_id) is token:
+        del _jobs[token.job_id]
+
+
+def abort_job(job_id: str, reason: str = 'aborted') -> bool:
+    """Cancel a running job; False if no such job runs on this instance"""
+    token = _jobs.get(job_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+
+async def watch_disconnect(request, token: CancellationToken, interval: Optional[float] = None):
+    """
+    Cancel token once the client of request goes away
+
+    Meant to run as a task next to the handler; ends when the token is
+    set for any reason.
+    """
+    interval = interval or settings.DISCONNECT_POLL_INTERVAL
+    while not token.is_set():
+        if await request.is_disconnected():
+            token.cancel('client disconnected')
+            return
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def cancellable_job(request, job_id: Optional[str] = None):
+    """
+    Register a job for the duration of a request and watch its client
+
+    Yields:
+        The job's CancellationToken
+
+    Raises:
+        JobAlreadyRunning: A job with this id is already running
+    """
+    token = register_job(job_id)
+    watcher = asyncio.ensure_future(watch_disconnect(request, token))
+    try:
+        yield token
+    finally:
+        watcher.cancel()
+        unregister_job(token)
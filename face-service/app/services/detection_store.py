@@ -0,0 +1,162 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+class DetectionRecord:
+    """One recognized face, materialized only at the API boundary"""
+
+    __slots__ = ('frame_number', 'timestamp', 'bbox', 'confidence')
+
+    def __init__(self, frame_number: int, timestamp: float, bbox: List[int], confidence: float):
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.bbox = bbox
+        self.confidence = confidence
+
+    def sort_key(self) -> Tuple[float, int]:
+        """Best first: higher confidence, then earlier frame"""
+        return -self.confidence, self.frame_number
+
+    def to_dict(self) -> Dict:
+        return {
+            'bbox': self.bbox,
+            'confidence': self.confidence,
+            'frame_number': self.frame_number,
+            'timestamp': self.timestamp
+        }
+
+
+class DetectionColumns:
+    """Growable columnar buffer of detections (one NumPy array per field)"""
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.student = np.empty(capacity, dtype=np.int32)
+        self.frame_number = np.empty(capacity, dtype=np.int64)
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.confidence = np.empty(capacity, dtype=np.float64)
+        self.bbox = np.empty((capacity, 4), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getstate__(self):
+        # Pickle (checkpoints, worker results) only the filled rows
+        n = self.size
+        return {
+            'capacity': len(self.student),
+            'columns': (self.student[:n], self.frame_number[:n], self.timestamp[:n],
+                        self.confidence[:n], self.bbox[:n])
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'])
+        columns = state['columns']
+        n = self.size = len(columns[0])
+        self.student[:n], self.frame_number[:n], self.timestamp[:n], self.confidence[:n], self.bbox[:n] = columns
+
+    def append(
+        self,
+        student: int,
+        frame_number: int,
+        timestamp: float,
+        bbox: List[int],
+        confidence: float
+    ):
+        if self.size == len(self.student):
+            self._grow()
+
+        i = self.size
+        self.student[i] = student
+        self.frame_number[i] = frame_number
+        self.timestamp[i] = timestamp
+        self.confidence[i] = confidence
+        self.bbox[i] = bbox
+        self.size += 1
+
+    def clear(self):
+        """Drop all rows, keeping the allocated capacity"""
+        self.size = 0
+
+    def record(self, i: int) -> DetectionRecord:
+        return DetectionRecord(
+            int(self.frame_number[i]),
+            float(self.timestamp[i]),
+            self.bbox[i].tolist(),
+            float(self.confidence[i])
+        )
+
+    def best_per_student(self, k: int) -> Dict[int, List[DetectionRecord]]:
+        """Top-k rows of each student by confidence (ties: earlier frame)"""
+        n = self.size
+        if n == 0:
+            return {}
+
+        student = self.student[:n]
+        order = np.lexsort((self.frame_number[:n], -self.confidence[:n], student))
+        grouped = student[order]
+
+        # Rank of each sorted row within its student's run
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        run_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+        keep = order[np.arange(n) - run_start < k]
+
+        best: Dict[int, List[DetectionRecord]] = {}
+        for i in keep.tolist():
+            best.setdefault(int(self.student[i]), []).append(self.record(i))
+        return best
+
+    def _grow(self):
+        capacity = max(1, 2 * len(self.student))
+        self.student = np.resize(self.student, capacity)
+        self.frame_number = np.resize(self.frame_number, capacity)
+        self.timestamp = np.resize(self.timestamp, capacity)
+        self.confidence = np.resize(self.confidence, capacity)
+        self.bbox = np.resize(self.bbox, (capacity, 4))
+
+
+class PresenceIntervals:
+    """Sightings of one student compressed into [start, end] time intervals
+
+    Each sighting covers one sampling period; sightings closer than the gap
+    tolerance extend the current interval, so brief occlusions or missed
+    detections do not split a continuous presence.
+    """
+
+    __slots__ = ('gap', 'sample_period', 'intervals')
+
+    def __init__(self, gap: float, sample_period: float):
+        self.gap = gap
+        self.sample_period = sample_period
+        self.intervals: List[List[float]] = []
+
+    def add(self, timestamp: float):
+        """Record a sighting; timestamps must arrive in increasing order"""
+        self.add_interval(timestamp, timestamp + self.sample_period)
+
+    def merge(self, other: 'PresenceIntervals'):
+        """Append the intervals of a later segment"""
+        for start, end in other.intervals:
+            self.add_interval(start, end)
+
+    def add_interval(self, start: float, end: float):
+        """Add an interval starting no earlier than the last one"""
+        if self.intervals and start <= self.intervals[-1][1] + self.gap:
+            self.intervals[-1][1] = max(self.intervals[-1][1], end)
+        else:
+            self.intervals.append([start, end])
+
+    @property
+    def duration(self) -> float:
+        return sum(end - start for start, end in self.intervals)
+
+    @property
+    def first_seen(self) -> Optional[float]:
+        return self.intervals[0][0] if self.intervals else None
+
+    @property
+    def last_seen(self) -> Optional[float]:
+        return self.intervals[-1][1] if self.intervals else None
+
+    def to_list(self) -> List[Dict]:
+        return [{'start': start, 'end': end} for start, end in self.intervals]
@@ -0,0 +1,122 @@
+import cv2
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Input resolutions the res10 SSD is run at (trained at 300)
+DNN_INPUT_SIZES = (300, 240, 180)
+
+DEFAULT_BACKEND = 'dnn-300-opencv-cpu'
+
+_DNN_BACKENDS = (
+    ('opencv', 'DNN_BACKEND_OPENCV'),
+    ('openvino', 'DNN_BACKEND_INFERENCE_ENGINE'),
+    ('cuda', 'DNN_BACKEND_CUDA'),
+    ('vulkan', 'DNN_BACKEND_VKCOM'),
+)
+
+
+class DetectorBackend:
+    """One way of running face detection on this host"""
+
+    __slots__ = ('name', 'kind', 'input_size', 'dnn_backend', 'dnn_target')
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        input_size: Optional[int] = None,
+        dnn_backend: Optional[int] = None,
+        dnn_target: Optional[int] = None
+    ):
+        self.name = name
+        self.kind = kind  # 'dnn' or 'haar'
+        self.input_size = input_size
+        self.dnn_backend = dnn_backend
+        self.dnn_target = dnn_target
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'kind': self.kind, 'input_size': self.input_size}
+
+
+def _target_names() -> Dict[int, str]:
+    return {
+        getattr(cv2.dnn, attr): attr[len('DNN_TARGET_'):].lower()
+        for attr in dir(cv2.dnn) if attr.startswith('DNN_TARGET_')
+    }
+
+
+def available_backends() -> List[DetectorBackend]:
+    """Every detector configuration this OpenCV build can run"""
+    targets = _target_names()
+    backends = []
+
+    for backend_name, attr in _DNN_BACKENDS:
+        backend_id = getattr(cv2.dnn, attr, None)
+        if backend_id is None:
+            continue
+        try:
+            available = cv2.dnn.getAvailableTargets(backend_id)
+        except cv2.error:
+            continue
+
+        for target in available:
+            target_name = targets.get(int(target), str(int(target)))
+            for size in DNN_INPUT_SIZES:
+                backends.append(DetectorBackend(
+                    f"dnn-{size}-{backend_name}-{target_name}", 'dnn', size, backend_id, int(target)
+                ))
+
+    backends.append(DetectorBackend('haar', 'haar'))
+    return backends
+
+
+def get_backend(name: str) -> DetectorBackend:
+    """Look up a backend by name; ValueError if this host cannot run it"""
+    for backend in available_backends():
+        if backend.name == name:
+            return backend
+    raise ValueError(f"Unknown or unavailable detector backend: {name}")
+
+
+_lock = threading.Lock()
+_selection = {'backend': None, 'source': None, 'calibration': []}
+
+
+def get_detector_backend() -> DetectorBackend:
+    """Backend new detectors should use"""
+    if _selection['backend'] is None:
+        with _lock:
+            if _selection['backend'] is None:
+                configured = settings.DETECTOR_BACKEND
+                if configured != 'auto':
+                    _selection.update(backend=get_backend(configured), source='config')
+                else:
+                    # Until calibration has run
+                    _selection.update(backend=get_backend(DEFAULT_BACKEND), source='default')
+    return _selection['backend']
+
+
+def set_detector_backend(name: str, source: str = 'override', calibration: List[Dict] = None):
+    """Select a backend; detectors following the selection switch on their next frame"""
+    backend = get_backend(name)
+    with _lock:
+        _selection['backend'] = backend
+        _selection['source'] = source
+        if calibration is not None:
+            _selection['calibration'] = calibration
+    logger.info("Detector backend: %s (%s)", name, source)
+
+
+def detector_backend_status() -> Dict:
+    backend = get_detector_backend()
+    return {
+        'selected': backend.to_dict(),
+        'source': _selection['source'],
+        'available': [b.name for b in available_backends()],
+        'calibration': _selection['calibration']
+    }
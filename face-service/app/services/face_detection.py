@@ -3,36 +3,76 @@ import numpy as np
 from typing import List, Dict, Tuple
 import logging
 
+from app.config import settings
+from app.services.detector_backends import DetectorBackend, get_detector_backend
+
 logger = logging.getLogger(__name__)
 
+# res10 SSD training mean, BGR
+_DNN_MEAN = np.array([104.0, 177.0, 123.0], dtype=np.float32).reshape(3, 1, 1)
+
 
 class FaceDetectionService:
-    """Face detection using OpenCV DNN"""
+    """Face detection using OpenCV DNN
+    
+    Not thread-safe: besides the cv2.dnn net, each instance owns the
+    preprocessing buffers it reuses across frames. Use one instance per
+    worker (see ModelPool).
+    """
+    
+    # Cascade: above these the ROIs cost more than one full-frame pass
+    CASCADE_MAX_ROIS = 4
+    CASCADE_MAX_ROI_FRACTION = 0.3
+    CASCADE_ROI_MARGIN = 1.5  # ROI half-size relative to the Haar box size
     
-    def __init__(self):
+    def __init__(self, backend: DetectorBackend = None):
+        """
+        Args:
+            backend: Fixed backend; by default the host's selected backend
+                is followed, including later changes to the selection
+        """
+        self.cascade_stats = {'frames': 0, 'skipped': 0, 'roi': 0, 'full': 0}
+        self._frames_since_full = 0
+        self._buffers: Dict[str, np.ndarray] = {}
+        self._follow_selection = backend is None
+        self.backend = backend or get_detector_backend()
         self.load_model()
     
     def load_model(self):
         """Load pre-trained face detection model"""
+        # DNN fallback, and the cheap first stage of the detection cascade
+        self.face_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        self.input_size = self.backend.input_size or 300
+        self._buffers.clear()
+        
+        if self.backend.kind == 'haar':
+            self.net = None
+            logger.info("Using Haar Cascade for face detection")
+            return
+        
         try:
             # Load Caffe model
             prototxt_path = "app/models/deploy.prototxt"
             model_path = "app/models/res10_300x300_ssd_iter_140000.caffemodel"
             
             self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-            logger.info("✅ Face detection model loaded successfully")
+            self.net.setPreferableBackend(self.backend.dnn_backend)
+            self.net.setPreferableTarget(self.backend.dnn_target)
+            logger.info("✅ Face detection model loaded successfully (%s)", self.backend.name)
         except Exception as e:
-            logger.error(f"❌ Error loading face detection model: {e}")
+            logger.error("❌ Error loading face detection model: %s", e)
             # Fallback to Haar Cascade
             self.net = None
-            self.face_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-            )
             logger.info("Using Haar Cascade for face detection")
     
     def detect_faces(self, image: np.ndarray, confidence_threshold: float = 0.7) -> List[Dict]:
         """
-        Detect faces in image
+        Detect faces in a still image (enrollment, verification)
+        
+        Always runs the full detector: the cascade prefilter is for video,
+        where a face it misses is picked up again a few frames later.
         
         Args:
             image: Input image (BGR format)
@@ -41,51 +81,182 @@ class FaceDetectionService:
         Returns:
             List of detected faces with bounding boxes
         """
+        self._follow_backend()
+        return self.detect_single_stage(image, confidence_threshold)
+    
+    def detect_video_frame(self, frame: np.ndarray, confidence_threshold: float = None) -> List[Dict]:
+        """
+        Detect faces in one frame of a video, through the cascade when
+        DETECTION_CASCADE is on
+        
+        Every CASCADE_FULL_FRAME_INTERVAL-th frame this detector sees gets
+        a full pass; pooled detectors count across the videos they serve.
+        The threshold defaults to DETECTION_CONFIDENCE.
+        """
+        if confidence_threshold is None:
+            confidence_threshold = settings.DETECTION_CONFIDENCE
+        self._follow_backend()
+        if self.net is not None and settings.DETECTION_CASCADE:
+            return self._detect_cascade(frame, confidence_threshold)
+        return self.detect_single_stage(frame, confidence_threshold)
+    
+    def _follow_backend(self):
+        if self._follow_selection and self.backend is not get_detector_backend():
+            self.backend = get_detector_backend()
+            self.load_model()
+    
+    def detect_single_stage(self, image: np.ndarray, confidence_threshold: float = 0.7) -> List[Dict]:
+        """Detect with the backend alone, without the cascade prefilter"""
         if self.net is not None:
             return self._detect_with_dnn(image, confidence_threshold)
-        else:
-            return self._detect_with_haar(image)
+        return self._detect_with_haar(image)
     
-    def _detect_with_dnn(self, image: np.ndarray, threshold: float) -> List[Dict]:
-        """Detect faces using DNN"""
+    def _detect_cascade(self, image: np.ndarray, threshold: float) -> List[Dict]:
+        """
+        Two-stage detection: the DNN only runs where a cheap Haar pass
+        on a downscaled frame found candidates
+        
+        Frames without candidates are skipped, frames with a few small
+        candidates run the DNN on those regions only. Every
+        CASCADE_FULL_FRAME_INTERVAL-th frame gets a full DNN pass so a face
+        the prefilter misses is still picked up regularly.
+        """
+        self.cascade_stats['frames'] += 1
+        self._frames_since_full += 1
+        
+        interval = settings.CASCADE_FULL_FRAME_INTERVAL
+        if interval and self._frames_since_full >= interval:
+            return self._detect_full_frame(image, threshold)
+        
+        rois = self._candidate_regions(image)
+        if not rois:
+            self.cascade_stats['skipped'] += 1
+            return []
+        
         h, w = image.shape[:2]
+        roi_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rois)
+        if len(rois) > self.CASCADE_MAX_ROIS or roi_area > self.CASCADE_MAX_ROI_FRACTION * h * w:
+            return self._detect_full_frame(image, threshold)
+        
+        self.cascade_stats['roi'] += 1
+        faces = []
+        for x1, y1, x2, y2 in rois:
+            for face in self._detect_with_dnn(image[y1:y2, x1:x2], threshold):
+                bx1, by1, bx2, by2 = face['bbox']
+                face['bbox'] = [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]
+                faces.append(face)
         
-        # Prepare blob
-        blob = cv2.dnn.blobFromImage(
-            cv2.resize(image, (300, 300)),
-            1.0,
-            (300, 300),
-            (104.0, 177.0, 123.0)
+        return faces
+    
+    def _detect_full_frame(self, image: np.ndarray, threshold: float) -> List[Dict]:
+        self.cascade_stats['full'] += 1
+        self._frames_since_full = 0
+        return self._detect_with_dnn(image, threshold)
+    
+    def _candidate_regions(self, image: np.ndarray) -> List[List[int]]:
+        """
+        Merged regions around permissive Haar hits on a downscaled frame
+        
+        The frame is downscaled to CASCADE_PREFILTER_WIDTH, but never so far
+        that a CASCADE_MIN_FACE_SIZE face shrinks below the Haar window:
+        on 1080p and 4K input that would hide small back-row faces on every
+        frame without a full pass.
+        """
+        h, w = image.shape[:2]
+        gray = self._gray(image)
+        
+        window = min(self.face_cascade.getOriginalWindowSize())
+        scale = min(1.0, max(
+            settings.CASCADE_PREFILTER_WIDTH / w,
+            window / max(1, settings.CASCADE_MIN_FACE_SIZE)
+        ))
+        if scale < 1.0:
+            # Buffer shaped as OpenCV rounds the fx/fy output size, so it is reused
+            gray = cv2.resize(
+                gray, None, dst=self._buffer('prefilter', (round(h * scale), round(w * scale)), np.uint8),
+                fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+        
+        # Low minNeighbors: stage one trades precision for recall
+        candidates = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.2,
+            minNeighbors=2,
+            minSize=(window, window)
         )
         
+        rois = []
+        for (x, y, cw, ch) in candidates:
+            cx, cy = (x + cw / 2) / scale, (y + ch / 2) / scale
+            half = max(cw, ch) / scale * self.CASCADE_ROI_MARGIN
+            rois.append([
+                max(0, int(cx - half)), max(0, int(cy - half)),
+                min(w, int(cx + half)), min(h, int(cy + half))
+            ])
+        
+        return _merge_boxes(rois)
+    
+    def _detect_with_dnn(self, image: np.ndarray, threshold: float) -> List[Dict]:
+        """Detect faces using DNN"""
+        h, w = image.shape[:2]
+        
         # Run detection
-        self.net.setInput(blob)
+        self.net.setInput(self._prepare_blob(image))
         detections = self.net.forward()
         
-        faces = []
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            
-            if confidence > threshold:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                x1, y1, x2, y2 = box.astype("int")
-                
-                # Validate bbox
-                if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
-                    continue
-                
-                faces.append({
-                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                    'confidence': float(confidence),
-                    'width': int(x2 - x1),
-                    'height': int(y2 - y1)
-                })
+        return self._parse_detections(detections, w, h, threshold)
+    
+    def _prepare_blob(self, image: np.ndarray) -> np.ndarray:
+        """
+        Network input for image, written into buffers reused across frames
         
-        return faces
+        Same values as cv2.dnn.blobFromImage(cv2.resize(image, size), 1.0,
+        size, mean): the resize goes into a preallocated HWC buffer and the
+        mean subtraction writes the CHW float blob in place. The returned
+        blob is overwritten by the next call.
+        """
+        size = self.input_size
+        resized = cv2.resize(image, (size, size), dst=self._buffer('resized', (size, size, 3), np.uint8))
+        blob = self._buffer('blob', (1, 3, size, size), np.float32)
+        np.subtract(resized.transpose(2, 0, 1), _DNN_MEAN, out=blob[0])
+        return blob
+    
+    @staticmethod
+    def _parse_detections(detections: np.ndarray, w: int, h: int, threshold: float) -> List[Dict]:
+        """Threshold, scale and bounds-check the SSD output (1, 1, N, 7) in one pass"""
+        rows = detections[0, 0]
+        rows = rows[rows[:, 2] > threshold]
+        if len(rows) == 0:
+            return []
+        
+        # float64 scaling, so boxes truncate exactly as the per-row loop did
+        boxes = (rows[:, 3:7] * np.array([w, h, w, h], dtype=np.float64)).astype(np.int64)
+        inside = (boxes[:, 0] >= 0) & (boxes[:, 1] >= 0) & (boxes[:, 2] <= w) & (boxes[:, 3] <= h)
+        
+        return [
+            {
+                'bbox': [x1, y1, x2, y2],
+                'confidence': confidence,
+                'width': x2 - x1,
+                'height': y2 - y1
+            }
+            for (x1, y1, x2, y2), confidence in zip(boxes[inside].tolist(), rows[inside, 2].tolist())
+        ]
+    
+    def _buffer(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """Preallocated array, reallocated only when the shape changes"""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+    
+    def _gray(self, image: np.ndarray) -> np.ndarray:
+        """Grayscale image into a buffer reused for frames of the same size"""
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._buffer('gray', image.shape[:2], np.uint8))
     
     def _detect_with_haar(self, image: np.ndarray) -> List[Dict]:
         """Detect faces using Haar Cascade"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = self._gray(image)
         
         faces_rect = self.face_cascade.detectMultiScale(
             gray,
@@ -106,7 +277,7 @@ class FaceDetectionService:
         return faces
     
     def extract_face(self, image: np.ndarray, bbox: List[int], margin: float = 0.2) -> np.ndarray:
-        """Extract face region with margin"""
+        """Face region with margin, as a view into image (copy it to keep it past the frame)"""
         x1, y1, x2, y2 = bbox
         h, w = image.shape[:2]
         
@@ -119,4 +290,24 @@ class FaceDetectionService:
         x2 = min(w, int(x2 + width * margin))
         y2 = min(h, int(y2 + height * margin))
         
-        return image[y1:y2, x1:x2]
\ No newline at end of file
+        return image[y1:y2, x1:x2]
+
+def _merge_boxes(boxes: List[List[int]]) -> List[List[int]]:
+    """Union overlapping [x1, y1, x2, y2] boxes until none overlap"""
+    merged = []
+    for box in boxes:
+        box = list(box)
+        overlapping = True
+        while overlapping:
+            overlapping = False
+            for other in merged:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    merged.remove(other)
+                    box = [
+                        min(box[0], other[0]), min(box[1], other[1]),
+                        max(box[2], other[2]), max(box[3], other[3])
+                    ]
+                    overlapping = True
+                    break
+        merged.append(box)
+    return merged
@@ -0,0 +1,147 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# BGR -> luma weights, as cv2.COLOR_BGR2GRAY
+_GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+# Match placeholder for faces the gate kept from the encoder
+GATED_MATCH = {'recognized': False, 'reason': 'Below quality gate'}
+
+
+class FaceQualityGate:
+    """Pre-embedding quality gate for the faces of a pipeline batch
+
+    A face is embedded only if it is at least min_size pixels wide and
+    high, was detected with at least min_confidence, and its crop is
+    sharp enough (Laplacian variance) and neither too dark nor
+    overexposed. Sharpness and brightness are computed on crop_size x
+    crop_size grayscale thumbnails, stacked so all faces of a batch are
+    scored in one vectorized pass.
+
+    A rejected face is deferred, not dropped: it is still embedded on the
+    first sampled frame of every defer_seconds window of the video clock.
+    Someone who is only ever seen small or blurred is therefore still
+    recognized, at most defer_seconds plus one sampling period apart,
+    which keeps their presence intervals unbroken while defer_seconds <
+    PRESENCE_GAP_SECONDS. The decision depends only on the face and its
+    frame's timestamp, so segments processed in parallel and jobs resumed
+    from a checkpoint embed exactly the faces an uninterrupted run does.
+    """
+
+    def __init__(
+        self,
+        min_size: int = None,
+        min_confidence: float = None,
+        min_sharpness: float = None,
+        brightness: Tuple[float, float] = None,
+        defer_seconds: float = None,
+        crop_size: int = 32
+    ):
+        self.min_size = settings.QUALITY_MIN_FACE_SIZE if min_size is None else min_size
+        self.min_confidence = settings.QUALITY_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.min_sharpness = settings.QUALITY_MIN_SHARPNESS if min_sharpness is None else min_sharpness
+        self.brightness = brightness or (settings.QUALITY_MIN_BRIGHTNESS, settings.QUALITY_MAX_BRIGHTNESS)
+        self.defer_seconds = settings.QUALITY_DEFER_SECONDS if defer_seconds is None else defer_seconds
+        self.crop_size = crop_size
+
+    def score(self, frames: List[np.ndarray], faces: List[List[Dict]]) -> Dict[str, np.ndarray]:
+        """
+        Quality measures of every face of a batch
+
+        Args:
+            frames: Full frames (BGR)
+            faces: Detected faces of each frame
+
+        Returns:
+            'size' (shorter box side), 'confidence', 'sharpness' and
+            'brightness', each (N,) over the faces in order
+        """
+        boxes = np.array([face['bbox'] for frame_faces in faces for face in frame_faces], dtype=np.int64)
+        if len(boxes) == 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return {'size': empty, 'confidence': empty, 'sharpness': empty, 'brightness': empty}
+
+        thumbnails = np.zeros((len(boxes), self.crop_size, self.crop_size, 3), dtype=np.uint8)
+        i = 0
+        for frame, frame_faces in zip(frames, faces):
+            h, w = frame.shape[:2]
+            for face in frame_faces:
+                x1, y1, x2, y2 = face['bbox']
+                crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+                if crop.size:
+                    thumbnails[i] = cv2.resize(crop, (self.crop_size, self.crop_size), interpolation=cv2.INTER_AREA)
+                i += 1
+
+        gray = thumbnails.astype(np.float32) @ _GRAY_WEIGHTS
+        laplacian = (
+            gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+            - 4.0 * gray[:, 1:-1, 1:-1]
+        )
+
+        return {
+            'size': np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]).astype(np.float32),
+            'confidence': np.array(
+                [face['confidence'] for frame_faces in faces for face in frame_faces], dtype=np.float32
+            ),
+            'sharpness': laplacian.var(axis=(1, 2)),
+            'brightness': gray.mean(axis=(1, 2))
+        }
+
+    def passes(self, scores: Dict[str, np.ndarray]) -> np.ndarray:
+        """(N,) bool: which scored faces meet every threshold"""
+        return (
+            (scores['size'] >= self.min_size)
+            & (scores['confidence'] >= self.min_confidence)
+            & (scores['sharpness'] >= self.min_sharpness)
+            & (scores['brightness'] >= self.brightness[0])
+            & (scores['brightness'] <= self.brightness[1])
+        )
+
+    def select(
+        self,
+        frames: List[np.ndarray],
+        faces: List[List[Dict]],
+        timestamps: List[float],
+        period: float
+    ) -> List[List[bool]]:
+        """
+        Decide which faces of a batch to embed
+
+        Args:
+            frames: Full frames (BGR)
+            faces: Detected faces of each frame
+            timestamps: Video time (seconds) of each frame
+            period: Seconds between sampled frames
+
+        Returns:
+            Per frame, one flag per face: True to embed it
+        """
+        passed = self.passes(self.score(frames, faces)).tolist()
+
+        selected = []
+        i = 0
+        for frame_faces, timestamp in zip(faces, timestamps):
+            rescue = self._opens_window(timestamp, period)
+            selected.append([passed[i + j] or rescue for j in range(len(frame_faces))])
+            i += len(frame_faces)
+        return selected
+
+    def _opens_window(self, timestamp: float, period: float) -> bool:
+        """Whether timestamp is the first sampled frame of its defer window"""
+        if self.defer_seconds <= 0:
+            return True
+        # Small epsilon so frame_number / fps rounding does not shift windows
+        window = np.floor(timestamp / self.defer_seconds + 1e-9)
+        return bool(window > np.floor((timestamp - period) / self.defer_seconds + 1e-9))
+
+
+def new_quality_gate() -> Optional[FaceQualityGate]:
+    """Gate for one video from the settings; None when disabled"""
+    return FaceQualityGate() if settings.ENABLE_QUALITY_GATE else None
@@ -1,11 +1,17 @@
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 from datetime import datetime
 import face_recognition
 
 from app.core.database import get_db_pool
+from app.services.face_detection import FaceDetectionService
+from app.services.gallery import Gallery
+from app.services.gallery_cache import get_gallery_cache
+from app.utils.assignment_utils import assign
 from app.utils.image_utils import preprocess_image
+from app.utils.logger import SAMPLE_FACE
+from app.utils.profiling import profiled
 from app.utils.storage import StorageService  # NEW IMPORT
 from app.config import settings
 
@@ -20,15 +26,17 @@ import numpy as np
 
 class FaceRecognitionService:
     def __init__(self):
-        # Load face detection model
-        self.face_net = cv2.dnn.readNetFromCaffe(
-            'app/models/deploy.prototxt',
-            'app/models/res10_300x300_ssd_iter_140000.caffemodel'
-        )
+        # Same detector as the video pipeline, so enrollment and recognition
+        # embeddings are aligned from the same kind of boxes
+        self.face_detector = FaceDetectionService()
+        self.storage = StorageService(settings)
+        # face_recognition detector model for single-crop recognize_face()
+        self.model = 'cnn' if settings.USE_GPU else 'hog'
         logger.info("✅ Face recognition service initialized (OpenCV mode)")
     
     # ... rest of the methods use OpenCV instead
     
+    @profiled('face.enroll_student_face')
     async def enroll_student_face(self, student_id: str, images: List[bytes]) -> Dict:
         """
         Enroll student face from multiple images
@@ -51,32 +59,28 @@ class FaceRecognitionService:
                 image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                 
                 if image is None:
-                    logger.warning(f"Failed to decode image {idx}")
+                    logger.warning("Failed to decode image %s", idx)
                     continue
                 
-                # Preprocess
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                
                 # Detect faces
-                face_locations = face_recognition.face_locations(image_rgb, model=self.model)
+                faces = self.face_detector.detect_faces(image)
                 
-                if len(face_locations) == 0:
-                    logger.warning(f"No face detected in image {idx}")
+                if len(faces) == 0:
+                    logger.warning("No face detected in image %s", idx)
                     continue
                 
-                if len(face_locations) > 1:
-                    logger.warning(f"Multiple faces detected in image {idx}, using first")
+                if len(faces) > 1:
+                    logger.warning("Multiple faces detected in image %s, using first", idx)
                 
                 # Extract face for storage
-                top, right, bottom, left = face_locations[0]
-                face_img = image[top:bottom, left:right]
+                x1, y1, x2, y2 = faces[0]['bbox']
+                face_img = image[y1:y2, x1:x2]
                 
-                # Generate embedding
-                face_encodings = face_recognition.face_encodings(image_rgb, face_locations)
+                # Generate embedding from the detected box (no second detection)
+                embedding = self.encode_faces(image, [faces[0]['bbox']])[0]
                 
-                if len(face_encodings) > 0:
-                    embedding = face_encodings[0]
-                    quality = self._assess_quality(image, face_locations[0])
+                if embedding is not None:
+                    quality = self._assess_quality(image, (y1, x2, y2, x1))
                     
                     # Save face image using storage service
                     image_url = await self.storage.save_face_image(
@@ -110,9 +114,10 @@ class FaceRecognitionService:
             }
             
         except Exception as e:
-            logger.error(f"Error enrolling face: {e}")
+            logger.error("Error enrolling face: %s", e)
             raise
     
+    @profiled('face.recognize_face')
     async def recognize_face(self, image: np.ndarray, class_id: str = None) -> Dict:
         """
         Recognize face in image
@@ -125,59 +130,166 @@ class FaceRecognitionService:
             Recognition result with student_id and confidence
         """
         try:
-            # Convert to RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(image_rgb, model=self.model)
+            face_encoding = self.encode_face(image)
             
-            if len(face_locations) == 0:
+            if face_encoding is None:
                 return {'recognized': False, 'reason': 'No face detected'}
             
-            # Generate embedding
-            face_encodings = face_recognition.face_encodings(image_rgb, face_locations)
-            
-            if len(face_encodings) == 0:
-                return {'recognized': False, 'reason': 'Could not generate encoding'}
-            
-            face_encoding = face_encodings[0]
-            
             # Get enrolled students
-            enrolled_students = await self._get_enrolled_students(class_id)
+            gallery = await self.load_gallery(class_id)
             
-            if not enrolled_students:
+            if len(gallery) == 0:
                 return {'recognized': False, 'reason': 'No enrolled students found'}
             
-            # Compare with enrolled faces
-            best_match = None
-            best_distance = float('inf')
+            return self.match_encoding(face_encoding, gallery)
             
-            for student in enrolled_students:
-                for emb_data in student['embeddings']:
-                    stored_encoding = np.array(emb_data['embedding'])
-                    distance = face_recognition.face_distance([stored_encoding], face_encoding)[0]
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match = student
+        except Exception as e:
+            logger.error("Error recognizing face: %s", e)
+            raise
+    
+    def encode_face(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Detect the face in a crop and compute its encoding
+        
+        Synchronous so it can run on pipeline worker threads.
+        
+        Returns:
+            128-d encoding, or None if no face was found
+        """
+        # Convert to RGB
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        
+        # Detect faces
+        face_locations = face_recognition.face_locations(image_rgb, model=self.model)
+        
+        if len(face_locations) == 0:
+            return None
+        
+        # Generate embedding
+        face_encodings = face_recognition.face_encodings(image_rgb, face_locations)
+        
+        if len(face_encodings) == 0:
+            return None
+        
+        return face_encodings[0]
+    
+    def encode_faces(self, image: np.ndarray, bboxes: List[List[int]]) -> List[Optional[np.ndarray]]:
+        """
+        Compute encodings for already-detected faces
+        
+        Landmarks and alignment are computed from the given boxes, so no
+        detector runs here.
+        
+        Args:
+            image: Full frame (BGR)
+            bboxes: [x1, y1, x2, y2] boxes in frame coordinates
             
-            # Check threshold (lower distance = better match)
-            threshold = 0.6
-            if best_match and best_distance < threshold:
-                confidence = 1.0 - best_distance
-                return {
-                    'recognized': True,
-                    'student_id': best_match['student_id'],
-                    'student_name': best_match['name'],
-                    'confidence': float(confidence),
-                    'distance': float(best_distance)
-                }
+        Returns:
+            One 128-d encoding per box, None for degenerate boxes
+        """
+        h, w = image.shape[:2]
+        locations = []
+        valid = []
+        for x1, y1, x2, y2 in bboxes:
+            top, bottom = max(0, int(y1)), min(h, int(y2))
+            left, right = max(0, int(x1)), min(w, int(x2))
+            valid.append(bottom > top and right > left)
+            if valid[-1]:
+                # face_recognition uses (top, right, bottom, left)
+                locations.append((top, right, bottom, left))
+        
+        encodings: List[Optional[np.ndarray]] = [None] * len(bboxes)
+        if not locations:
+            return encodings
+        
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        computed = iter(face_recognition.face_encodings(image_rgb, known_face_locations=locations))
+        
+        for i, is_valid in enumerate(valid):
+            if is_valid:
+                encodings[i] = next(computed)
+        
+        return encodings
+    
+    def recognize_faces(
+        self,
+        image: np.ndarray,
+        bboxes: List[List[int]],
+        gallery: Gallery
+    ) -> List[Dict]:
+        """
+        Recognize already-detected faces in a frame
+        
+        Faces are assigned to students jointly, so one student is never
+        matched to two faces of the same frame.
+        
+        Args:
+            image: Full frame (BGR)
+            bboxes: [x1, y1, x2, y2] boxes from FaceDetectionService
+            gallery: Loaded gallery from load_gallery()
             
-            return {'recognized': False, 'reason': 'No match found above threshold'}
+        Returns:
+            One recognition result per box
+        """
+        if len(gallery) == 0:
+            return [{'recognized': False, 'reason': 'No enrolled students found'} for _ in bboxes]
+        
+        encodings = self.encode_faces(image, bboxes)
+        results = [{'recognized': False, 'reason': 'Invalid face box'} for _ in bboxes]
+        
+        valid = [i for i, encoding in enumerate(encodings) if encoding is not None]
+        if not valid:
+            return results
+        
+        # Joint assignment: each student gets at most one face per frame
+        distances = gallery.student_distances(np.stack([encodings[i] for i in valid]))
+        assigned = dict(assign(distances, settings.RECOGNITION_THRESHOLD))
+        
+        for row, face_index in enumerate(valid):
+            student_index = assigned.get(row)
+            if student_index is not None:
+                results[face_index] = self._match_result(
+                    gallery, student_index, distances[row, student_index]
+                )
+            elif distances[row].min() < settings.RECOGNITION_THRESHOLD:
+                results[face_index] = {
+                    'recognized': False,
+                    'reason': 'Matched student assigned to another face'
+                }
+            else:
+                results[face_index] = {'recognized': False, 'reason': 'No match found above threshold'}
             
-        except Exception as e:
-            logger.error(f"Error recognizing face: {e}")
-            raise
+            logger.debug(
+                "Face %s: %s", face_index,
+                results[face_index].get('student_id') or results[face_index].get('reason'),
+                extra=SAMPLE_FACE
+            )
+        
+        return results
+    
+    def match_encoding(self, face_encoding: np.ndarray, gallery: Gallery) -> Dict:
+        """Match an encoding against a loaded gallery"""
+        match = gallery.match(face_encoding)
+        
+        # Check threshold (lower distance = better match)
+        if match is not None and match[1] < settings.RECOGNITION_THRESHOLD:
+            return self._match_result(gallery, *match)
+        
+        return {'recognized': False, 'reason': 'No match found above threshold'}
+    
+    @staticmethod
+    def _match_result(gallery: Gallery, student_index: int, distance: float) -> Dict:
+        return {
+            'recognized': True,
+            'student_id': gallery.student_ids[student_index],
+            'student_name': gallery.student_names[student_index],
+            'confidence': float(1.0 - distance),
+            'distance': float(distance)
+        }
+    
+    async def load_gallery(self, class_id: str = None) -> Gallery:
+        """Load enrolled embeddings once for matching many faces"""
+        return await get_gallery_cache().get(class_id)
     
     async def get_student_embeddings(self, student_id: str) -> List[Dict]:
         """Get stored embeddings for student"""
@@ -199,7 +311,7 @@ class FaceRecognitionService:
         """Delete all embeddings for student"""
         # Delete from storage
         deleted_count = await self.storage.delete_student_images(student_id)
-        logger.info(f"Deleted {deleted_count} images for student {student_id}")
+        logger.info("Deleted %s images for student %s", deleted_count, student_id)
         
         # Delete from database
         pool = await get_db_pool()
@@ -208,7 +320,10 @@ class FaceRecognitionService:
                 "DELETE FROM face_embeddings WHERE student_id = $1",
                 student_id
             )
-            logger.info(f"Deleted database embeddings for student: {student_id}")
+            logger.info("Deleted database embeddings for student: %s", student_id)
+        
+        # Other pods pick this up via NOTIFY; apply it here without waiting
+        await get_gallery_cache().refresh_student(student_id)
     
     async def _store_embeddings(
         self,
@@ -233,34 +348,8 @@ class FaceRecognitionService:
                     url,
                     datetime.now()
                 )
-    
-    async def _get_enrolled_students(self, class_id: str = None) -> List[Dict]:
-        """Get enrolled students with embeddings"""
-        pool = await get_db_pool()
-        async with pool.acquire() as conn:
-            query = """
-                SELECT 
-                    s.id as student_id,
-                    s.name,
-                    s.roll_number,
-                    json_agg(
-                        json_build_object(
-                            'id', fe.id,
-                            'embedding', fe.embedding_vector,
-                            'quality', fe.quality_score
-                        )
-                    ) as embeddings
-                FROM students s
-                INNER JOIN face_embeddings fe ON s.id = fe.student_id
-            """
-            
-            if class_id:
-                query += " WHERE s.class_id = $1"
-                rows = await conn.fetch(query + " GROUP BY s.id, s.name, s.roll_number", class_id)
-            else:
-                rows = await conn.fetch(query + " GROUP BY s.id, s.name, s.roll_number")
-            
-            return [dict(row) for row in rows]
+        
+        await get_gallery_cache().refresh_student(student_id)
     
     def _assess_quality(self, image: np.ndarray, face_location: tuple) -> float:
         """Assess face image quality"""
@@ -1,61 +1,212 @@
-import os
-import face_recognition
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import cv2
 import numpy as np
+
 from app.config import settings
 from app.schemas.face import FaceVerificationResult
+from app.services.face_detection import FaceDetectionService
+from app.services.face_recognition import FaceRecognitionService
+from app.services.gallery import Gallery
+from app.services.gallery_cache import GalleryCache, fetch_students, get_gallery_cache
+from app.services.video_pipeline import ModelPool
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateCache:
+    """LRU cache of per-student embedding templates for 1:1 verification
+
+    Templates come from face_embeddings, like the class galleries, and are
+    dropped whenever the gallery cache applies a change to that student.
+    As with galleries, nothing is served from memory while the gallery
+    listener is disconnected.
+    """
+
+    def __init__(self, gallery_cache: GalleryCache, max_size: int, fetch_students=fetch_students):
+        self.gallery_cache = gallery_cache
+        self.max_size = max_size
+        self._fetch_students = fetch_students
+        self._templates: 'OrderedDict[str, Optional[np.ndarray]]' = OrderedDict()
+        self._generation = 0  # bumped on every invalidation
+        gallery_cache.on_student_change(self.invalidate)
+
+    async def get_many(self, student_ids: List[str]) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Templates of several students, fetching all misses in one query
+
+        Returns:
+            student_id -> (K, D) embeddings, or None if not enrolled/active
+        """
+        if not self.gallery_cache.listening:
+            self._templates.clear()
+
+        keys = {student_id: _normalize_id(student_id) for student_id in student_ids}
+        missing = [
+            key for key in dict.fromkeys(keys.values())
+            if key is not None and key not in self._templates
+        ]
+
+        fetched = {}
+        generation = self._generation
+        if missing:
+            students = await self._fetch_students(missing)
+            for key in missing:
+                student = students.get(key)
+                gallery = Gallery.from_students([student]) if student and student['is_active'] else None
+                fetched[key] = gallery.embeddings if gallery is not None and len(gallery) else None
+
+        templates = {}
+        for student_id, key in keys.items():
+            if key in fetched:
+                templates[student_id] = fetched[key]
+            elif key in self._templates:
+                self._templates.move_to_end(key)
+                templates[student_id] = self._templates[key]
+            else:
+                templates[student_id] = None
+
+        # Skip caching if a change arrived while fetching: the rows may predate it
+        if self.gallery_cache.listening and generation == self._generation:
+            for key, template in fetched.items():
+                self._templates[key] = template
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+
+        return templates
+
+    def invalidate(self, student_id: Optional[str] = None):
+        """Drop one student's template, or all of them"""
+        self._generation += 1
+        if student_id is None:
+            self._templates.clear()
+        else:
+            self._templates.pop(_normalize_id(student_id), None)
+
+
+def _normalize_id(student_id: str) -> Optional[str]:
+    """Canonical UUID text, or None if it cannot be a student id"""
+    try:
+        return str(uuid.UUID(str(student_id)))
+    except ValueError:
+        return None
+
+
+def pair_distances(encodings: np.ndarray, templates: List[np.ndarray]) -> np.ndarray:
+    """
+    Distance of each probe encoding to the closest embedding of its own template
+
+    All template rows are stacked and compared with their probe in one pass.
+
+    Args:
+        encodings: (P, D) probe encodings
+        templates: P templates, each (K_i, D)
+
+    Returns:
+        (P,) distances
+    """
+    distances = np.full(len(encodings), np.inf)
+    if len(encodings) == 0:
+        return distances
+
+    rows = np.vstack(templates)
+    probe = np.repeat(np.arange(len(templates)), [len(t) for t in templates])
+    per_row = np.linalg.norm(rows - encodings[probe], axis=1)
+    np.minimum.at(distances, probe, per_row)
+    return distances
+
+
+class FaceVerificationService:
+    """1:1 verification (is this image of user X?) against enrolled embeddings
+
+    Uses the same detector, encoder, embedding store and image storage as
+    attendance recognition; user ids are student ids.
+    """
+
+    def __init__(self, recognizer: FaceRecognitionService = None, templates: TemplateCache = None):
+        self.recognizer = recognizer or FaceRecognitionService()
+        # Images are encoded on executor threads; cv2.dnn nets are not thread-safe
+        self.detector_pool = ModelPool(FaceDetectionService)
+        self.templates = templates or TemplateCache(get_gallery_cache(), settings.VERIFY_TEMPLATE_CACHE_SIZE)
+
+    async def enroll_face(self, user_id: str, image_bytes: bytes) -> Dict:
+        """Enroll one image; stored like /enroll-face enrollments"""
+        return await self.recognizer.enroll_student_face(user_id, [image_bytes])
+
+    async def verify_face(self, user_id: str, image_bytes: bytes) -> FaceVerificationResult:
+        """
+        Verify one image against one user
+
+        Raises:
+            ValueError: User not enrolled, or not exactly one face in the image
+        """
+        result = (await self.verify_batch([(user_id, image_bytes)]))[0]
+        if result.error is not None and result.error != 'No face detected':
+            raise ValueError(result.error)
+        return result
+
+    async def verify_batch(self, pairs: List[Tuple[str, bytes]]) -> List[FaceVerificationResult]:
+        """
+        Verify many (user_id, image) pairs in one pass
+
+        Templates are looked up once per distinct user, images are encoded
+        off the event loop, and all distances are computed together.
+
+        Returns:
+            One result per pair, in order; failures carry an error instead of raising
+        """
+        user_ids = [user_id for user_id, _ in pairs]
+        templates, encoded = await asyncio.gather(
+            self.templates.get_many(user_ids),
+            asyncio.get_running_loop().run_in_executor(
+                None, self._encode_images, [image_bytes for _, image_bytes in pairs]
+            )
+        )
+
+        results: List[FaceVerificationResult] = [None] * len(pairs)
+        valid = []
+        for i, (user_id, (encoding, error)) in enumerate(zip(user_ids, encoded)):
+            if templates[user_id] is None:
+                error = f"No face data found for user {user_id}"
+            if error is not None:
+                results[i] = FaceVerificationResult(user_id=user_id, is_match=False, confidence=0.0, error=error)
+            else:
+                valid.append(i)
+
+        if valid:
+            distances = pair_distances(
+                np.stack([encoded[i][0] for i in valid]),
+                [templates[user_ids[i]] for i in valid]
+            )
+            for i, distance in zip(valid, distances.tolist()):
+                results[i] = FaceVerificationResult(
+                    user_id=user_ids[i],
+                    is_match=distance <= settings.RECOGNITION_THRESHOLD,
+                    confidence=max(0.0, 1.0 - distance)
+                )
+
+        return results
+
+    def _encode_images(self, images: List[bytes]) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+        """(encoding, error) per image: one detection, then encode that box"""
+        encoded = []
+        for image_bytes in images:
+            image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                encoded.append((None, 'Invalid image'))
+                continue
 
-class FaceRecognitionService:
-    def __init__(self):
-        self.face_data_dir = settings.FACE_DATA_DIR
-        os.makedirs(self.face_data_dir, exist_ok=True)
-
-    def _load_face_encoding(self, user_id: str) -> np.ndarray:
-        encoding_file = os.path.join(self.face_data_dir, f"{user_id}.npy")
-        if not os.path.exists(encoding_file):
-            raise ValueError(f"No face data found for user {user_id}")
-        return np.load(encoding_file)
-
-    def _save_face_encoding(self, user_id: str, encoding: np.ndarray):
-        encoding_file = os.path.join(self.face_data_dir, f"{user_id}.npy")
-        np.save(encoding_file, encoding)
-
-    def enroll_face(self, user_id: str, image_bytes: bytes) -> bool:
-        # Load image from bytes
-        image = face_recognition.load_image_file(image_bytes)
-        face_locations = face_recognition.face_locations(image)
-        
-        if not face_locations:
-            raise ValueError("No face detected in the image")
-        
-        if len(face_locations) > 1:
-            raise ValueError("Multiple faces detected in the image")
-        
-        # Get face encoding
-        face_encoding = face_recognition.face_encodings(image, face_locations)[0]
-        
-        # Save face encoding
-        self._save_face_encoding(user_id, face_encoding)
-        return True
-
-    def verify_face(self, user_id: str, image_bytes: bytes) -> FaceVerificationResult:
-        # Load enrolled face encoding
-        known_encoding = self._load_face_encoding(user_id)
-        
-        # Load and encode the provided image
-        image = face_recognition.load_image_file(image_bytes)
-        face_locations = face_recognition.face_locations(image)
-        
-        if not face_locations:
-            return FaceVerificationResult(is_match=False, confidence=0.0)
-        
-        if len(face_locations) > 1:
-            raise ValueError("Multiple faces detected in the image")
-        
-        face_encoding = face_recognition.face_encodings(image, face_locations)[0]
-        
-        # Compare faces
-        face_distance = face_recognition.face_distance([known_encoding], face_encoding)[0]
-        is_match = face_distance <= settings.FACE_RECOGNITION_TOLERANCE
-        confidence = 1 - face_distance
-        
-        return FaceVerificationResult(is_match=is_match, confidence=float(confidence))
\ No newline at end of file
+            with self.detector_pool.lease() as detector:
+                faces = detector.detect_faces(image)
+            if not faces:
+                encoded.append((None, 'No face detected'))
+            elif len(faces) > 1:
+                encoded.append((None, 'Multiple faces detected in the image'))
+            else:
+                encoding = self.recognizer.encode_faces(image, [faces[0]['bbox']])[0]
+                encoded.append((encoding, None) if encoding is not None else (None, 'Invalid face box'))
+        return encoded
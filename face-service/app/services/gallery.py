@@ -0,0 +1,322 @@
+import hashlib
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Storage types of the embedding matrix; the compact ones are scanned in
+# float32 and their closest candidates measured again (see Gallery)
+PRECISIONS = ('float64', 'float32', 'float16', 'int8')
+
+# Rows of a compact gallery upcast to float32 at a time while scanning
+_SCAN_BLOCK = 1024
+
+
+def _parse_embeddings(embeddings) -> List[Dict]:
+    """json_agg() rows arrive as a JSON string; LEFT JOINs yield null entries"""
+    if isinstance(embeddings, str):
+        embeddings = json.loads(embeddings)
+    return [e for e in (embeddings or []) if e and e.get('embedding') is not None]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization
+
+    Returns:
+        (codes, scales) with vectors ~= codes * scales[:, None]
+    """
+    peak = np.abs(vectors).max(axis=1, initial=0.0)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _row_starts(owners: np.ndarray, students: int) -> Optional[np.ndarray]:
+    """First row of each student if rows are grouped by student in order, else None"""
+    if len(owners) == 0 or owners[0] != 0 or owners[-1] != students - 1:
+        return None
+    steps = np.diff(owners)
+    if np.any((steps != 0) & (steps != 1)):
+        return None
+    return np.flatnonzero(np.concatenate([[True], steps != 0]))
+
+
+class Gallery:
+    """Enrolled face embeddings of a class, stacked for vectorized matching
+
+    Galleries are treated as immutable: updates return a new Gallery, so
+    pipeline threads matching against one never see a half-applied change.
+
+    With a precision other than float64 the embeddings are stored more
+    compactly: float32, float16, or int8 codes with one scale per row
+    (nothing else is kept, so int8 takes about half the memory of
+    float16). The scan runs in float32 on |a|^2 + |b|^2 - 2ab. For
+    float16 and int8, every row of the rerank closest students of each
+    face is then measured again directly, in float32, from the stored
+    (dequantized) vector. This removes the scan's rounding but not the
+    storage error: distances stay within about 1e-4 of float32 for
+    float16 and 1e-2 for int8 (see scripts/benchmark.py quantization).
+    """
+
+    def __init__(
+        self,
+        student_ids: List[str],
+        student_names: List[str],
+        embeddings: np.ndarray,
+        owners: np.ndarray,
+        embedding_ids: Optional[List[str]] = None,
+        precision: str = 'float64',
+        rerank: int = 10
+    ):
+        """
+        Args:
+            student_ids: One entry per student
+            student_names: Display names, aligned with student_ids
+            embeddings: (N, D) matrix, one row per enrolled embedding
+            owners: (N,) index into student_ids for each embedding row
+            embedding_ids: face_embeddings.id per row, used for the version
+            precision: One of PRECISIONS
+            rerank: Closest students per face re-ranked (float16 and int8)
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown gallery precision: {precision}")
+
+        self.student_ids = student_ids
+        self.student_names = student_names
+        self.owners = owners
+        self.embedding_ids = embedding_ids if embedding_ids is not None else [''] * len(owners)
+        self.precision = precision
+        self.rerank = rerank
+        self._version = None
+
+        self._rows = self.codes = self.scales = self._norms = None
+        if precision == 'int8':
+            self.codes, self.scales = quantize_int8(np.asarray(embeddings, dtype=np.float32))
+        else:
+            self._rows = np.asarray(embeddings, dtype=precision)
+        if precision != 'float64':
+            stored = self.embeddings.astype(np.float32, copy=False)
+            self._norms = np.einsum('ij,ij->i', stored, stored)
+        self._starts = _row_starts(owners, len(student_ids))
+
+        # Rows of student s: _order[_bounds[s]:_bounds[s + 1]] (_order None: identity)
+        self._order = self._bounds = None
+        if precision in ('float16', 'int8'):
+            order = np.argsort(owners, kind='stable')
+            self._order = None if self._starts is not None else order
+            self._bounds = np.searchsorted(owners[order], np.arange(len(student_ids) + 1))
+
+    @classmethod
+    def from_students(cls, students: List[Dict], precision: str = 'float64', rerank: int = 10) -> 'Gallery':
+        """Build from enrolled-student rows (student_id, name, embeddings json)"""
+        student_ids, student_names, vectors, owners, embedding_ids = [], [], [], [], []
+
+        for student in students:
+            embeddings = _parse_embeddings(student['embeddings'])
+            if not embeddings:
+                continue
+
+            index = len(student_ids)
+            student_ids.append(str(student['student_id']))
+            student_names.append(student['name'])
+
+            for emb_data in embeddings:
+                vectors.append(emb_data['embedding'])
+                owners.append(index)
+                embedding_ids.append(str(emb_data.get('id', '')))
+
+        if not vectors:
+            return cls.empty(precision, rerank)
+
+        return cls(
+            student_ids,
+            student_names,
+            np.asarray(vectors, dtype=np.float64),
+            np.asarray(owners, dtype=np.int32),
+            embedding_ids,
+            precision,
+            rerank
+        )
+
+    @classmethod
+    def empty(cls, precision: str = 'float64', rerank: int = 10) -> 'Gallery':
+        return cls(
+            [], [], np.empty((0, 0), dtype=np.float64), np.empty(0, dtype=np.int32), [], precision, rerank
+        )
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """(N, D) embedding matrix; dequantized to float32 for int8 galleries"""
+        if self.codes is not None:
+            return self.codes * self.scales[:, None]
+        return self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the embedding matrix, owner index and quantization data"""
+        arrays = (self._rows, self.codes, self.scales, self._norms, self.owners)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @property
+    def version(self) -> str:
+        """
+        Content fingerprint, identical on every pod holding the same gallery
+
+        Matches the md5 computed in SQL by gallery_cache.fetch_gallery_version().
+        """
+        if self._version is None:
+            pairs = sorted(
+                (emb_id, self.student_ids[owner])
+                for emb_id, owner in zip(self.embedding_ids, self.owners)
+            )
+            raw = ','.join(f"{student_id}:{emb_id}" for emb_id, student_id in pairs)
+            self._version = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return self._version
+
+    def with_student(self, student_id: str, name: str, embeddings) -> 'Gallery':
+        """
+        Return a gallery with this student's embeddings replaced
+
+        Args:
+            student_id: Student identifier
+            name: Student display name
+            embeddings: List (or JSON string) of {'id', 'embedding'} dicts
+        """
+        gallery = self.without_student(student_id)
+        embeddings = _parse_embeddings(embeddings)
+        if not embeddings:
+            return gallery
+
+        vectors = np.asarray([e['embedding'] for e in embeddings], dtype=np.float64)
+        index = len(gallery.student_ids)
+        stacked = vectors if len(gallery.embeddings) == 0 else np.vstack([gallery.embeddings, vectors])
+
+        return Gallery(
+            gallery.student_ids + [student_id],
+            gallery.student_names + [name],
+            stacked,
+            np.concatenate([gallery.owners, np.full(len(vectors), index, dtype=np.int32)]),
+            gallery.embedding_ids + [str(e.get('id', '')) for e in embeddings],
+            self.precision,
+            self.rerank
+        )
+
+    def without_student(self, student_id: str) -> 'Gallery':
+        """Return a gallery without this student (self if not present)"""
+        if student_id not in self.student_ids:
+            return self
+
+        index = self.student_ids.index(student_id)
+        keep = self.owners != index
+        owners = self.owners[keep]
+        owners = np.where(owners > index, owners - 1, owners).astype(np.int32)
+
+        return Gallery(
+            self.student_ids[:index] + self.student_ids[index + 1:],
+            self.student_names[:index] + self.student_names[index + 1:],
+            self.embeddings[keep] if keep.any() else Gallery.empty().embeddings,
+            owners,
+            [emb_id for emb_id, k in zip(self.embedding_ids, keep) if k],
+            self.precision,
+            self.rerank
+        )
+
+    def match(self, encoding: np.ndarray) -> Optional[Tuple[int, float]]:
+        """
+        Find the closest enrolled embedding
+
+        Args:
+            encoding: Face encoding (D,)
+
+        Returns:
+            (student_index, distance) or None if the gallery is empty
+        """
+        if len(self.owners) == 0:
+            return None
+
+        if self.precision != 'float64':
+            distances = self.student_distances(encoding[None, :])[0]
+            best = int(np.argmin(distances))
+            return best, float(distances[best])
+
+        distances = np.linalg.norm(self.embeddings - encoding, axis=1)
+        best = int(np.argmin(distances))
+        return int(self.owners[best]), float(distances[best])
+
+    def student_distances(self, encodings: np.ndarray) -> np.ndarray:
+        """
+        Distance of each face to each student's closest enrolled embedding
+
+        Args:
+            encodings: Face encodings (F, D)
+
+        Returns:
+            (F, S) matrix, S = len(self)
+        """
+        distances = np.full((len(encodings), len(self.student_ids)), np.inf)
+        if len(encodings) == 0 or len(self.owners) == 0:
+            return distances
+
+        if self.precision == 'float64':
+            # |a - b|^2 = |a|^2 + |b|^2 - 2ab, one matrix product for all pairs
+            squared = (
+                np.einsum('ij,ij->i', encodings, encodings)[:, None]
+                + np.einsum('ij,ij->i', self.embeddings, self.embeddings)[None, :]
+                - 2.0 * encodings @ self.embeddings.T
+            )
+            per_embedding = np.sqrt(np.maximum(squared, 0.0))
+        else:
+            per_embedding = self._compact_distances(encodings)
+
+        # Reduce embedding columns to their owning student
+        if self._starts is not None:
+            distances[:] = np.minimum.reduceat(per_embedding, self._starts, axis=1)
+        else:
+            np.minimum.at(distances.T, self.owners, per_embedding.T)
+
+        if self._bounds is not None and self.rerank > 0:
+            self._rerank(np.asarray(encodings, dtype=np.float32), distances)
+        return distances
+
+    def _compact_distances(self, encodings: np.ndarray) -> np.ndarray:
+        """(F, N) float32 distances to every row of a float32/float16/int8 gallery"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        stored = self.codes if self.codes is not None else self._rows
+
+        # Scan in blocks so at most _SCAN_BLOCK rows exist upcast at a time
+        dots = np.empty((len(encodings), len(stored)), dtype=np.float32)
+        for start in range(0, len(stored), _SCAN_BLOCK):
+            block = stored[start:start + _SCAN_BLOCK].astype(np.float32, copy=False)
+            np.matmul(encodings, block.T, out=dots[:, start:start + _SCAN_BLOCK])
+        if self.scales is not None:
+            dots *= self.scales
+
+        squared = np.einsum('ij,ij->i', encodings, encodings)[:, None] + self._norms[None, :] - 2.0 * dots
+        return np.sqrt(np.maximum(squared, 0.0, out=squared), out=squared)
+
+    def _rerank(self, encodings: np.ndarray, distances: np.ndarray):
+        """Replace each face's rerank closest student distances with directly measured ones"""
+        k = min(self.rerank, distances.shape[1])
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+
+        # All rows of every candidate, flattened face by face
+        starts = self._bounds[candidates].ravel()
+        lengths = self._bounds[candidates + 1].ravel() - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        rows = positions if self._order is None else self._order[positions]
+        faces = np.repeat(np.repeat(np.arange(len(encodings)), k), lengths)
+
+        if self.codes is not None:
+            vectors = self.codes[rows] * self.scales[rows, None]
+        else:
+            vectors = self._rows[rows].astype(np.float32)
+        exact = np.linalg.norm(vectors - encodings[faces], axis=1)
+        reranked = np.full(len(lengths), np.inf)
+        filled = lengths > 0
+        if filled.any():
+            reranked[filled] = np.minimum.reduceat(exact, offsets[filled])
+        np.put_along_axis(distances, candidates, reranked.reshape(candidates.shape), axis=1)
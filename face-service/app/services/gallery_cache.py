@@ -0,0 +1,326 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+import asyncpg
+
+from app.config import settings
+from app.core.database import get_db_pool
+from app.services.gallery import Gallery
+
+logger = logging.getLogger(__name__)
+
+ALL_CLASSES = '*'
+
+ENROLLED_STUDENTS_SQL = """
+    SELECT
+        s.id as student_id,
+        s.name,
+        json_agg(
+            json_build_object(
+                'id', fe.id,
+                'embedding', fe.embedding_vector,
+                'quality', fe.quality_score
+            )
+        ) as embeddings
+    FROM students s
+    INNER JOIN face_embeddings fe ON s.id = fe.student_id
+    WHERE s.is_active
+"""
+
+STUDENT_SQL = """
+    SELECT
+        s.id as student_id,
+        s.name,
+        s.class_id,
+        s.is_active,
+        COALESCE(
+            json_agg(
+                json_build_object('id', fe.id, 'embedding', fe.embedding_vector)
+            ) FILTER (WHERE fe.id IS NOT NULL),
+            '[]'
+        ) as embeddings
+    FROM students s
+    LEFT JOIN face_embeddings fe ON s.id = fe.student_id
+    WHERE s.id = $1
+    GROUP BY s.id, s.name, s.class_id, s.is_active
+"""
+
+STUDENTS_SQL = STUDENT_SQL.replace("WHERE s.id = $1", "WHERE s.id = ANY($1::uuid[])")
+
+GALLERY_VERSION_SQL = """
+    SELECT md5(COALESCE(
+        string_agg(s.id::text || ':' || fe.id::text, ',' ORDER BY fe.id),
+        ''
+    ))
+    FROM students s
+    INNER JOIN face_embeddings fe ON s.id = fe.student_id
+    WHERE s.is_active
+"""
+
+
+async def fetch_gallery(class_id: Optional[str]) -> Gallery:
+    """Load the gallery of a class (all classes if None) from the database"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        if class_id:
+            rows = await conn.fetch(
+                ENROLLED_STUDENTS_SQL + " AND s.class_id = $1 GROUP BY s.id, s.name",
+                class_id
+            )
+        else:
+            rows = await conn.fetch(ENROLLED_STUDENTS_SQL + " GROUP BY s.id, s.name")
+
+    return Gallery.from_students(
+        [dict(row) for row in rows], settings.GALLERY_PRECISION, settings.GALLERY_RERANK_CANDIDATES
+    )
+
+
+async def fetch_student(student_id: str) -> Optional[Dict]:
+    """Current gallery-relevant state of one student (None if deleted)"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(STUDENT_SQL, student_id)
+    return dict(row) if row is not None else None
+
+
+async def fetch_students(student_ids: List[str]) -> Dict[str, Dict]:
+    """fetch_student() for several students in one query; absent ids are omitted"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(STUDENTS_SQL, student_ids)
+    return {str(row['student_id']): dict(row) for row in rows}
+
+
+async def fetch_gallery_version(class_id: Optional[str]) -> str:
+    """Gallery version computed in SQL; equals Gallery.version for the same rows"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        if class_id:
+            return await conn.fetchval(GALLERY_VERSION_SQL + " AND s.class_id = $1", class_id)
+        return await conn.fetchval(GALLERY_VERSION_SQL)
+
+
+class GalleryCache:
+    """In-process class galleries kept current by database notifications
+
+    Galleries are only served from memory while the GalleryListener is
+    connected. While it is not (startup, reconnect, worker processes)
+    every lookup goes to the database, so a missed notification can never
+    leave a stale gallery in use. Changes that arrive while a class is
+    being loaded are recorded and applied before the gallery is published.
+    """
+
+    def __init__(
+        self,
+        fetch_gallery=fetch_gallery,
+        fetch_student=fetch_student,
+        fetch_gallery_version=fetch_gallery_version
+    ):
+        self._fetch_gallery = fetch_gallery
+        self._fetch_student = fetch_student
+        self._fetch_gallery_version = fetch_gallery_version
+        self._galleries: Dict[str, Gallery] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Students changed while a class's first load was in flight
+        self._loading: Dict[str, Set[str]] = {}
+        self._subscribers = []
+        self.listening = False
+
+    async def get(self, class_id: Optional[str] = None) -> Gallery:
+        """Gallery for a class, loading it on first use"""
+        if not self.listening:
+            return await self._fetch_gallery(class_id)
+
+        key = class_id or ALL_CLASSES
+        gallery = self._galleries.get(key)
+        if gallery is not None:
+            return gallery
+
+        async with self._lock(key):
+            gallery = self._galleries.get(key)
+            if gallery is None:
+                gallery = await self._load(key, class_id)
+                self._galleries[key] = gallery
+                logger.info("Cached gallery for class %s: %s students", key, len(gallery))
+            return gallery
+
+    def is_cached(self, class_id: Optional[str] = None) -> bool:
+        return (class_id or ALL_CLASSES) in self._galleries
+
+    def memory_bytes(self) -> int:
+        """Memory held by all cached galleries"""
+        return sum(gallery.nbytes for gallery in list(self._galleries.values()))
+
+    def on_student_change(self, callback):
+        """Call callback(student_id) whenever a student's enrollment changes"""
+        self._subscribers.append(callback)
+
+    async def refresh_student(self, student_id: str, class_ids=()):
+        """
+        Apply one student's current database state to cached galleries
+
+        Args:
+            student_id: Student whose embeddings or status changed
+            class_ids: Classes known to be affected; all cached ones if empty
+        """
+        for callback in self._subscribers:
+            callback(student_id)
+
+        keys = {c for c in class_ids if c}
+        if keys:
+            keys.add(ALL_CLASSES)
+
+        # Loads in flight may have read the student before this change
+        for key, changed in self._loading.items():
+            if not keys or key in keys:
+                changed.add(student_id)
+
+        keys = keys & set(self._galleries) if keys else set(self._galleries)
+
+        for key in sorted(keys):
+            async with self._lock(key):
+                if key not in self._galleries:
+                    continue
+
+                # Fetch under the lock so concurrent refreshes apply in order
+                self._galleries[key] = await self._apply_student(self._galleries[key], key, student_id)
+
+    async def resync(self):
+        """Reload cached galleries whose database version no longer matches"""
+        for key in list(self._galleries):
+            async with self._lock(key):
+                class_id = None if key == ALL_CLASSES else key
+                if await self._fetch_gallery_version(class_id) != self._galleries[key].version:
+                    self._galleries[key] = await self._fetch_gallery(class_id)
+                    logger.info("Resynced gallery for class %s", key)
+
+    def invalidate(self, class_id: Optional[str] = None):
+        """Drop one cached gallery, or all of them"""
+        if class_id is None:
+            self._galleries.clear()
+        else:
+            self._galleries.pop(class_id, None)
+
+    async def _load(self, key: str, class_id: Optional[str]) -> Gallery:
+        """First load of a class, with changes made during the fetch re-applied"""
+        self._loading[key] = set()
+        try:
+            gallery = await self._fetch_gallery(class_id)
+            # No await between the last check and publishing, so nothing is missed
+            while self._loading[key]:
+                changed, self._loading[key] = self._loading[key], set()
+                for student_id in sorted(changed):
+                    gallery = await self._apply_student(gallery, key, student_id)
+            return gallery
+        finally:
+            del self._loading[key]
+
+    async def _apply_student(self, gallery: Gallery, key: str, student_id: str) -> Gallery:
+        """gallery with student_id replaced by its current database state"""
+        student = await self._fetch_student(student_id)
+        gallery = gallery.without_student(student_id)
+
+        if student is not None and student['is_active'] and (
+            key == ALL_CLASSES or str(student['class_id']) == key
+        ):
+            gallery = gallery.with_student(student_id, student['name'], student['embeddings'])
+        return gallery
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+
+class GalleryListener:
+    """Dedicated LISTEN connection feeding gallery changes into the cache"""
+
+    def __init__(self, cache: GalleryCache, channel: str = None):
+        self.cache = cache
+        self.channel = channel or settings.GALLERY_NOTIFY_CHANNEL
+        self._task: Optional[asyncio.Task] = None
+        self._pending = set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(
+                    host=settings.POSTGRES_HOST,
+                    port=settings.POSTGRES_PORT,
+                    database=settings.POSTGRES_DB,
+                    user=settings.POSTGRES_USER,
+                    password=settings.POSTGRES_PASSWORD
+                )
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+
+                # LISTEN is active before resync, so no change can fall in between
+                await self.cache.resync()
+                self.cache.listening = True
+                backoff = 1
+                logger.info("✅ Listening for gallery changes on '%s'", self.channel)
+
+                await self._watch(conn, lost)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Gallery listener connection failed: %s", e)
+            finally:
+                self.cache.listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _watch(self, conn, lost: asyncio.Event):
+        """Return when the connection is lost; ping it so dead sockets are noticed"""
+        while True:
+            try:
+                await asyncio.wait_for(lost.wait(), timeout=settings.GALLERY_LISTENER_PING_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                await conn.execute("SELECT 1", timeout=10)
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed gallery notification: %s", payload)
+            return
+
+        task = asyncio.create_task(self.cache.refresh_student(
+            change['student_id'],
+            class_ids=(change.get('class_id'), change.get('old_class_id'))
+        ))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+_gallery_cache: Optional[GalleryCache] = None
+
+
+def get_gallery_cache() -> GalleryCache:
+    """Process-wide gallery cache"""
+    global _gallery_cache
+    if _gallery_cache is None:
+        _gallery_cache = GalleryCache()
+    return _gallery_cache
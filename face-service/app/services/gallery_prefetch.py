@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.config import settings
+from app.core.database import get_db_pool
+from app.services.gallery_cache import GalleryCache
+
+logger = logging.getLogger(__name__)
+
+# Classes about to need their gallery, soonest first: pending sessions
+# starting within the horizon (or started up to an hour ago), then classes
+# whose sessions were created recently
+UPCOMING_CLASSES_SQL = """
+    SELECT class_id::text
+    FROM (
+        SELECT
+            class_id,
+            MIN(CASE WHEN processing_status = 'pending' THEN session_date + session_time END) AS due,
+            MAX(created_at) AS last_created
+        FROM attendance_sessions
+        WHERE (
+            processing_status = 'pending'
+            AND session_date + session_time
+                BETWEEN LOCALTIMESTAMP - interval '1 hour' AND LOCALTIMESTAMP + make_interval(secs => $1)
+        ) OR created_at >= now() - make_interval(secs => $2)
+        GROUP BY class_id
+    ) upcoming
+    ORDER BY due ASC NULLS LAST, last_created DESC
+    LIMIT $3
+"""
+
+
+async def fetch_upcoming_classes(horizon: float, recent: float, limit: int) -> List[str]:
+    """Class ids whose galleries will be needed soon, most urgent first"""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(UPCOMING_CLASSES_SQL, float(horizon), float(recent), limit)
+    return [row['class_id'] for row in rows]
+
+
+class GalleryPrefetcher:
+    """Background task warming class galleries before their sessions start
+
+    Every interval it reads the classes of upcoming and just-created
+    attendance sessions and loads the galleries not yet cached, so the
+    first video of a session is matched against an in-memory gallery
+    instead of waiting for the database. Loads are spaced by delay and
+    capped at max_per_cycle, and stop once the cache holds max_bytes;
+    a gallery that pushes the cache past it is dropped again.
+
+    Prefetching only runs while the GalleryListener is connected, since
+    galleries are not cached otherwise.
+    """
+
+    def __init__(
+        self,
+        cache: GalleryCache,
+        fetch_classes=fetch_upcoming_classes,
+        interval: float = None,
+        max_per_cycle: int = None,
+        delay: float = None,
+        max_bytes: int = None
+    ):
+        self.cache = cache
+        self._fetch_classes = fetch_classes
+        self.interval = settings.GALLERY_PREFETCH_INTERVAL if interval is None else interval
+        self.max_per_cycle = settings.GALLERY_PREFETCH_MAX_PER_CYCLE if max_per_cycle is None else max_per_cycle
+        self.delay = settings.GALLERY_PREFETCH_DELAY if delay is None else delay
+        self.max_bytes = settings.GALLERY_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def prefetch_once(self) -> List[str]:
+        """
+        Warm the galleries of upcoming sessions' classes
+
+        Returns:
+            Class ids whose galleries were loaded by this call
+        """
+        if not self.cache.listening:
+            return []
+
+        class_ids = await self._fetch_classes(
+            settings.GALLERY_PREFETCH_HORIZON,
+            settings.GALLERY_PREFETCH_RECENT,
+            self.max_per_cycle * 2
+        )
+
+        warmed = []
+        for class_id in class_ids:
+            if len(warmed) >= self.max_per_cycle:
+                break
+            if self.cache.is_cached(class_id):
+                continue
+            if self.cache.memory_bytes() >= self.max_bytes:
+                logger.info("Gallery prefetch stopped: cache is at its %s byte budget", self.max_bytes)
+                break
+
+            if warmed and self.delay > 0:
+                await asyncio.sleep(self.delay)
+
+            gallery = await self.cache.get(class_id)
+            if self.cache.memory_bytes() > self.max_bytes:
+                self.cache.invalidate(class_id)
+                logger.info(
+                    "Gallery of class %s (%s bytes) does not fit the cache budget; not prefetched",
+                    class_id, gallery.nbytes
+                )
+                break
+            warmed.append(class_id)
+
+        if warmed:
+            logger.info(
+                "Prefetched %s class galleries (cache now %.1f MiB)",
+                len(warmed), self.cache.memory_bytes() / 2 ** 20
+            )
+        return warmed
+
+    async def _run(self):
+        while True:
+            # Wait for the listener so the first scan after startup is not wasted
+            while not self.cache.listening:
+                await asyncio.sleep(1)
+
+            try:
+                await self.prefetch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Gallery prefetch failed: %s", e)
+
+            await asyncio.sleep(self.interval)
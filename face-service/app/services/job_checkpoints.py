@@ -0,0 +1,213 @@
+import fcntl
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.video_pipeline import FrameResult
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'FSCP'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHqq')  # magic, version, next frame, processed frames
+
+_store = {}
+
+
+class CheckpointStore:
+    """Disk-backed checkpoints of in-progress video jobs
+
+    A checkpoint holds the next frame to decode, the number of frames
+    processed so far and the aggregator state (per-student aggregates,
+    presence intervals and liveness tracks), pickled and zlib-compressed
+    behind a small fixed header. Writes are atomic, so a crash mid-write
+    leaves the previous checkpoint in place.
+
+    A job claims its id before checkpointing under it, so two jobs of the
+    same upload never overwrite or delete each other's checkpoint. Claims
+    are flocks on a lock file and end with the process that holds them.
+    """
+
+    def __init__(self, checkpoint_dir: str, ttl_seconds: int):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.ttl_seconds = ttl_seconds
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(self, job_id: str, next_frame: int, processed_frames: int, aggregator: DetectionAggregator):
+        payload = zlib.compress(pickle.dumps(aggregator, protocol=pickle.HIGHEST_PROTOCOL))
+        header = _HEADER.pack(_MAGIC, _VERSION, next_frame, processed_frames)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(job_id))
+        except Exception:
+            self._remove(Path(tmp_path))
+            raise
+
+    def load(self, job_id: str) -> Optional[Tuple[int, int, DetectionAggregator]]:
+        """
+        Latest checkpoint of a job
+
+        Returns:
+            (next_frame, processed_frames, aggregator), or None if there is
+            no usable checkpoint
+        """
+        path = self._path(job_id)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.ttl_seconds:
+                self._remove(path)
+                return None
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            magic, version, next_frame, processed_frames = _HEADER.unpack_from(data)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"unsupported format {magic!r} v{version}")
+            aggregator = pickle.loads(zlib.decompress(data[_HEADER.size:]))
+        except Exception as e:
+            logger.warning("Discarding unreadable checkpoint %s: %s", job_id, e)
+            self._remove(path)
+            return None
+
+        return next_frame, processed_frames, aggregator
+
+    def claim(self, job_id: str):
+        """
+        Reserve job_id's checkpoint for the calling job
+
+        Returns:
+            Handle for release(), or None while another running job (in any
+            process sharing checkpoint_dir) holds the claim
+        """
+        lock_path = self.checkpoint_dir / f"{job_id}.lock"
+        handle = open(lock_path, "a")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+        # Fresh mtime keeps prune() away from lock files in use
+        os.utime(lock_path)
+        return handle
+
+    def release(self, handle):
+        handle.close()
+
+    def delete(self, job_id: str):
+        self._remove(self._path(job_id))
+
+    def prune(self):
+        """Drop checkpoints of jobs that were never resumed"""
+        now = time.time()
+        for path in self.checkpoint_dir.glob("*.ckpt"):
+            try:
+                if now - path.stat().st_mtime > self.ttl_seconds:
+                    self._remove(path)
+            except FileNotFoundError:
+                continue
+
+        for path in self.checkpoint_dir.glob("*.lock"):
+            try:
+                if now - path.stat().st_mtime > self.ttl_seconds:
+                    self._remove(path)
+            except FileNotFoundError:
+                continue
+
+    def _path(self, job_id: str) -> Path:
+        return self.checkpoint_dir / f"{job_id}.ckpt"
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """This process's checkpoint store, or None when checkpointing is disabled"""
+    if not settings.ENABLE_CHECKPOINTS:
+        return None
+    if 'store' not in _store:
+        store = CheckpointStore(settings.CHECKPOINT_DIR, settings.CHECKPOINT_TTL)
+        store.prune()
+        _store['store'] = store
+    return _store['store']
+
+
+class JobCheckpointer:
+    """Resumes a pipeline run from its last checkpoint and checkpoints it periodically
+
+    Checkpoints are taken from the aggregation callback, which the
+    pipeline calls in frame order, so a checkpoint always sits on a frame
+    boundary: frames before next_frame are fully aggregated, later ones
+    not at all. Resuming from it reproduces the uninterrupted result.
+    """
+
+    def __init__(
+        self,
+        store: Optional[CheckpointStore],
+        job_id: Optional[str],
+        liveness: Optional[LivenessDetectionService],
+        start_frame: int = 0,
+        interval: float = 60.0,
+        frame_rate: float = None
+    ):
+        """
+        Args:
+            store: Checkpoint store; None disables checkpointing
+            job_id: Identifies the job across restarts; None disables checkpointing
+            liveness: Liveness service for fresh and restored aggregators
+            start_frame: First frame of the job (segment start)
+            interval: Seconds between checkpoints
+            frame_rate: Sampling rate of the run (default VIDEO_FRAME_RATE)
+        """
+        self.store = store if job_id else None
+        self.job_id = job_id
+        self.interval = interval
+        self.start_frame = self._first_frame = start_frame
+        self.resumed_frames = 0
+        self.aggregator = DetectionAggregator(liveness, frame_rate=frame_rate)
+        self._processed = 0
+        self._last_save = time.monotonic()
+
+        checkpoint = self.store.load(job_id) if self.store is not None else None
+        if checkpoint is not None:
+            self.start_frame, self.resumed_frames, self.aggregator = checkpoint
+            self.aggregator.liveness = liveness
+            logger.info("Resuming job %s from frame %s", job_id, self.start_frame)
+
+    def on_frame(self, result: FrameResult):
+        """Pipeline aggregation callback"""
+        self.aggregator.add_frame(result)
+        self._processed += 1
+
+        if self.store is not None and time.monotonic() - self._last_save >= self.interval:
+            self.store.save(
+                self.job_id, result.frame_number + 1, self.resumed_frames + self._processed, self.aggregator
+            )
+            self._last_save = time.monotonic()
+
+    def finish(self, stats: dict) -> dict:
+        """Account for frames processed before the restart and drop the checkpoint"""
+        stats['processed_frames'] += self.resumed_frames
+        stats['covered_frames'] = stats.get('covered_frames', 0) + self.start_frame - self._first_frame
+        if self.store is not None:
+            self.store.delete(self.job_id)
+        return stats
@@ -0,0 +1,170 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+import logging
+
+from app.config import settings
+from app.utils.stats_utils import RunningStat
+
+logger = logging.getLogger(__name__)
+
+# Normalized bbox displacement between consecutive sightings that counts as fully "alive"
+MOTION_REFERENCE = 0.02
+# Observations further apart than this (seconds) are not compared for motion
+MOTION_MAX_GAP = 2.0
+# Std of the eye-band/face brightness ratio that counts as blinking
+BLINK_REFERENCE = 0.015
+# Spectral peak-to-median ratio range mapped from "natural skin" to "screen moire"
+MOIRE_LOW = 20.0
+MOIRE_HIGH = 45.0
+
+TEXTURE_SIZE = 64
+WEIGHTS = {'motion': 0.35, 'blink': 0.25, 'texture': 0.4}
+
+
+def _build_high_band_mask(size: int) -> np.ndarray:
+    freqs = np.fft.fftfreq(size) * size
+    radius = np.hypot(freqs[:, None], freqs[None, :])
+    return (radius > size * 10 / 64) & (radius <= size / 2)
+
+
+_HIGH_BAND = _build_high_band_mask(TEXTURE_SIZE)
+_WINDOW = np.outer(np.hanning(TEXTURE_SIZE), np.hanning(TEXTURE_SIZE)).astype(np.float32)
+
+
+class TrackLiveness:
+    """Incremental liveness evidence for one tracked identity"""
+
+    __slots__ = ('motion', 'eye_ratio', 'moire', 'last_center', 'last_timestamp')
+
+    def __init__(self):
+        self.motion = RunningStat()
+        self.eye_ratio = RunningStat()
+        self.moire = RunningStat()
+        self.last_center = None
+        self.last_timestamp = None
+
+    @property
+    def samples(self) -> int:
+        return self.moire.count
+
+    def update(self, gray_face: np.ndarray, bbox: List[int], timestamp: float):
+        """
+        Add one sighting of the face
+
+        Args:
+            gray_face: Grayscale crop of the bbox
+            bbox: [x1, y1, x2, y2] in frame coordinates
+            timestamp: Frame timestamp in seconds
+        """
+        x1, y1, x2, y2 = bbox
+        size = max(x2 - x1, y2 - y1, 1)
+        center = ((x1 + x2) / 2.0 / size, (y1 + y2) / 2.0 / size)
+
+        if self.last_center is not None and timestamp - self.last_timestamp <= MOTION_MAX_GAP:
+            self.motion.push(float(np.hypot(
+                center[0] - self.last_center[0],
+                center[1] - self.last_center[1]
+            )))
+        self.last_center = center
+        self.last_timestamp = timestamp
+
+        h = gray_face.shape[0]
+        face_mean = float(gray_face.mean()) + 1e-6
+        eye_band = gray_face[int(h * 0.2):int(h * 0.45)]
+        if eye_band.size:
+            self.eye_ratio.push(float(eye_band.mean()) / face_mean)
+
+        self.moire.push(_moire_peakiness(gray_face))
+
+    def merge(self, other: 'TrackLiveness'):
+        """Fold evidence gathered by another worker for the same identity"""
+        self.motion.merge(other.motion)
+        self.eye_ratio.merge(other.eye_ratio)
+        self.moire.merge(other.moire)
+        if other.last_timestamp is not None and (
+            self.last_timestamp is None or other.last_timestamp > self.last_timestamp
+        ):
+            self.last_center = other.last_center
+            self.last_timestamp = other.last_timestamp
+
+
+def _moire_peakiness(gray_face: np.ndarray) -> float:
+    """Ratio of the strongest high-frequency peak to the band median
+
+    Screen replays and halftone prints add narrow periodic peaks that natural
+    skin texture does not have.
+    """
+    small = cv2.resize(gray_face, (TEXTURE_SIZE, TEXTURE_SIZE), interpolation=cv2.INTER_AREA)
+    small = small.astype(np.float32)
+    small -= small.mean()
+    small *= _WINDOW
+
+    band = np.abs(np.fft.fft2(small))[_HIGH_BAND]
+    return float(band.max() / (np.median(band) + 1e-6))
+
+
+class LivenessDetectionService:
+    """Cheap anti-spoofing from temporal signals of a face track
+
+    Scores combine bbox micro-motion, eye-region brightness variation
+    (blinks) and moire statistics on the face crop. All of them are
+    updated incrementally from crops the video pipeline already has, so
+    no extra model inference is needed.
+    """
+
+    def __init__(self, threshold: float = None, min_samples: int = None):
+        self.threshold = settings.LIVENESS_THRESHOLD if threshold is None else threshold
+        self.min_samples = settings.LIVENESS_MIN_SAMPLES if min_samples is None else min_samples
+
+    def new_track(self) -> TrackLiveness:
+        return TrackLiveness()
+
+    def crop(self, frame: np.ndarray, bbox: List[int]) -> Optional[np.ndarray]:
+        """Grayscale face crop used as liveness evidence (None if empty)"""
+        x1, y1, x2, y2 = bbox
+        face = frame[max(0, y1):y2, max(0, x1):x2]
+
+        if face.size == 0:
+            return None
+
+        return cv2.cvtColor(face, cv2.COLOR_BGR2GRAY) if face.ndim == 3 else face
+
+    def observe(
+        self,
+        track: TrackLiveness,
+        frame: np.ndarray,
+        bbox: List[int],
+        timestamp: float
+    ):
+        """Update track evidence from a frame and the face bbox in it"""
+        gray = self.crop(frame, bbox)
+        if gray is not None:
+            track.update(gray, bbox, timestamp)
+
+    def evaluate(self, track: TrackLiveness) -> Dict:
+        """
+        Score accumulated evidence
+
+        Returns:
+            Liveness result; is_live is None when there are too few samples
+        """
+        components = {
+            'motion': min(track.motion.mean / MOTION_REFERENCE, 1.0) if track.motion.count else 0.0,
+            'blink': min(track.eye_ratio.std / BLINK_REFERENCE, 1.0),
+            'texture': 1.0 - float(np.clip(
+                (track.moire.mean - MOIRE_LOW) / (MOIRE_HIGH - MOIRE_LOW), 0.0, 1.0
+            )),
+        }
+        score = sum(WEIGHTS[name] * value for name, value in components.items())
+
+        is_live: Optional[bool] = None
+        if track.samples >= self.min_samples:
+            is_live = score >= self.threshold
+
+        return {
+            'score': float(score),
+            'is_live': is_live,
+            'samples': track.samples,
+            **{name: float(value) for name, value in components.items()}
+        }
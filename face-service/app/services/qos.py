@@ -0,0 +1,138 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from app.config import settings
+
+PRIORITIES = ('interactive', 'normal', 'batch')
+
+# Smoothed wall-clock seconds per sampled frame of recent jobs, for one
+# pipeline: segmented runs are recorded times their number of segments
+_frame_cost = {'seconds': None}
+_lock = threading.Lock()
+
+
+class QosPlan:
+    """How one video is processed to fit its latency budget
+
+    Degradation steps, in order: sample fewer frames (down to
+    QOS_MIN_FRAME_RATE), skip faces too small to recognize reliably
+    (interactive only), and stop at the deadline. Batch requests are
+    never degraded.
+    """
+
+    __slots__ = ('priority', 'latency_budget', 'frame_rate', 'min_face_size', 'deadline', 'estimated_coverage')
+
+    def __init__(
+        self,
+        priority: str,
+        latency_budget: Optional[float],
+        frame_rate: float,
+        min_face_size: int = 0,
+        deadline: Optional[float] = None,
+        estimated_coverage: float = 1.0
+    ):
+        self.priority = priority
+        self.latency_budget = latency_budget
+        self.frame_rate = frame_rate
+        self.min_face_size = min_face_size
+        self.deadline = deadline  # time.time() at which decoding stops
+        self.estimated_coverage = estimated_coverage
+
+    @property
+    def degraded(self) -> bool:
+        """Whether frames or faces are skipped (stopping early is reported separately)"""
+        return self.frame_rate != settings.VIDEO_FRAME_RATE or self.min_face_size > 0
+
+    def report(self, stats: Optional[Dict] = None) -> Dict:
+        """Effective settings plus planned and achieved coverage of the video"""
+        coverage = 1.0
+        stopped_early = False
+        if stats is not None:
+            stopped_early = bool(stats.get('stopped_early'))
+            if stopped_early and stats.get('total_frames'):
+                coverage = min(1.0, stats['covered_frames'] / stats['total_frames'])
+
+        return {
+            'priority': self.priority,
+            'latency_budget': self.latency_budget,
+            'frame_rate': self.frame_rate,
+            'min_face_size': self.min_face_size,
+            'degraded': self.degraded or stopped_early,
+            'stopped_early': stopped_early,
+            'estimated_coverage': self.estimated_coverage,
+            'coverage': coverage
+        }
+
+
+def frame_cost() -> float:
+    """Current estimate of seconds per sampled frame on one pipeline"""
+    return _frame_cost['seconds'] or settings.QOS_FRAME_COST
+
+
+def record_frame_cost(processing_time: float, processed_frames: int, parallelism: int = 1):
+    """
+    Refine the estimate from a finished job
+
+    Args:
+        processing_time: Wall-clock seconds the job took
+        processed_frames: Sampled frames it processed
+        parallelism: Segments it ran as in parallel (1 for one pipeline)
+    """
+    if processed_frames <= 0:
+        return
+    cost = processing_time * max(1, parallelism) / processed_frames
+    with _lock:
+        previous = _frame_cost['seconds']
+        _frame_cost['seconds'] = cost if previous is None else 0.8 * previous + 0.2 * cost
+
+
+def plan_qos(
+    duration: float,
+    latency_budget: Optional[float],
+    priority: str = 'normal',
+    parallelism: int = 1,
+    arrived_at: Optional[float] = None
+) -> QosPlan:
+    """
+    Choose the processing settings for a video of the given duration
+
+    Args:
+        duration: Video length in seconds
+        latency_budget: Seconds the caller can wait for processing; None for no limit
+        priority: One of PRIORITIES
+        parallelism: Segments the video will be processed as in parallel
+        arrived_at: time.time() the request arrived; the budget counts from
+            it (default now)
+
+    Returns:
+        Plan whose deadline counts from arrived_at
+    """
+    nominal = settings.VIDEO_FRAME_RATE
+    if priority == 'batch' or not latency_budget:
+        return QosPlan(priority, latency_budget, nominal)
+
+    now = time.time()
+    arrived_at = now if arrived_at is None else min(arrived_at, now)
+    # Time already spent queued and uploading is gone from the budget
+    available = max(0.0, latency_budget * settings.QOS_BUDGET_FRACTION - (now - arrived_at))
+    cost = frame_cost() / max(1, parallelism)
+
+    frame_rate = nominal
+    needed = duration * nominal * cost
+    if needed > available:
+        frame_rate = max(settings.QOS_MIN_FRAME_RATE, nominal * available / needed)
+        needed = duration * frame_rate * cost
+
+    min_face_size = 0
+    if needed > available and priority == 'interactive':
+        min_face_size = settings.QOS_MIN_FACE_SIZE
+
+    return QosPlan(
+        priority,
+        latency_budget,
+        frame_rate,
+        min_face_size,
+        deadline=now + available,
+        estimated_coverage=min(1.0, available / needed) if needed > 0 else 1.0
+    )
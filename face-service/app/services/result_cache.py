@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import settings
+from app.services.detector_backends import get_detector_backend
+
+logger = logging.getLogger(__name__)
+
+
+def model_version() -> str:
+    """Version string covering every setting that changes recognition output"""
+    return (
+        f"{settings.MODEL_VERSION}"
+        f":detector={get_detector_backend().name}"
+        f":fps={settings.VIDEO_FRAME_RATE}"
+        f":det={settings.DETECTION_CONFIDENCE}"
+        f":cascade={settings.DETECTION_CASCADE and settings.CASCADE_PREFILTER_WIDTH}"
+        f"/{settings.CASCADE_FULL_FRAME_INTERVAL}/{settings.CASCADE_MIN_FACE_SIZE}"
+        f":rec={settings.RECOGNITION_THRESHOLD}"
+        f":live={settings.ENABLE_LIVENESS and settings.LIVENESS_THRESHOLD}/{settings.LIVENESS_GATING}"
+        f":presence={settings.PRESENCE_GAP_SECONDS}/{settings.MIN_PRESENCE_SECONDS}"
+        f":quality={settings.ENABLE_QUALITY_GATE and settings.QUALITY_MIN_FACE_SIZE}"
+        f"/{settings.QUALITY_MIN_CONFIDENCE}/{settings.QUALITY_MIN_SHARPNESS}"
+        f"/{settings.QUALITY_MIN_BRIGHTNESS}-{settings.QUALITY_MAX_BRIGHTNESS}"
+        f"/{settings.QUALITY_DEFER_SECONDS}"
+        f":gallery={settings.GALLERY_PRECISION}/{settings.GALLERY_RERANK_CANDIDATES}"
+    )
+
+
+class ResultCacheService:
+    """Disk-backed cache of video processing results
+
+    Entries are keyed by (content hash, class_id, gallery version, model version)
+    so a re-uploaded clip returns the stored result, while enrollment changes or
+    model/threshold changes produce a new key and therefore a fresh run. File
+    access and eviction run in the default executor, off the event loop.
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: int, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def build_key(
+        content_hash: str,
+        class_id: Optional[str],
+        gallery_version: str,
+        model_version: str
+    ) -> str:
+        """Build cache key from the inputs that determine a result"""
+        raw = "|".join([content_hash, class_id or "*", gallery_version, model_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """
+        Get cached result
+
+        Args:
+            key: Cache key from build_key()
+
+        Returns:
+            Cached result or None on miss/expiry
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+
+    async def set(self, key: str, result: Dict):
+        """Store result and evict old entries if over the size budget"""
+        await asyncio.get_running_loop().run_in_executor(None, self._write, key, result)
+
+    def _read(self, key: str) -> Optional[Dict]:
+        path = self._entry_path(key)
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        if time.time() - stat.st_mtime > self.ttl_seconds:
+            self._remove(path)
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Discarding unreadable cache entry %s: %s", key, e)
+            self._remove(path)
+            return None
+
+        # Keep entries ordered by last use for eviction; TTL counts from write
+        os.utime(path, (time.time(), stat.st_mtime))
+        return result
+
+    def _write(self, key: str, result: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            self._remove(Path(tmp_path))
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used until under max_bytes"""
+        now = time.time()
+        entries = []
+        total_bytes = 0
+
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove(path)
+                continue
+
+            entries.append((stat.st_atime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+        logger.debug("Result cache evicted down to %s bytes", total_bytes)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
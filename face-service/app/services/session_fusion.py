@@ -0,0 +1,106 @@
+import logging
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.detection_store import PresenceIntervals
+
+logger = logging.getLogger(__name__)
+
+
+def fuse_camera_results(
+    results: List[Dict],
+    offsets: Optional[List[float]] = None,
+    best_k: int = 5,
+    presence_gap: float = None,
+    min_presence: float = None
+) -> Dict:
+    """
+    Merge per-camera video results of one session into a single result
+
+    A student seen by any camera is recognized with the best per-camera
+    confidence. Timestamps are shifted onto the session clock by each
+    camera's start offset, and presence intervals from all cameras are
+    unioned, so a student covered by two cameras is not counted twice.
+
+    Args:
+        results: One process-video result per camera, in upload order
+        offsets: Seconds between session start and each video's start
+            (all videos are assumed to start together when omitted)
+        best_k: Detections kept per student across all cameras
+        presence_gap: Gap tolerance for joining intervals
+        min_presence: Minimum presence duration for present=True
+
+    Returns:
+        Fused recognized_students / liveness_rejected and totals
+    """
+    offsets = offsets or [0.0] * len(results)
+    presence_gap = settings.PRESENCE_GAP_SECONDS if presence_gap is None else presence_gap
+    min_presence = settings.MIN_PRESENCE_SECONDS if min_presence is None else min_presence
+
+    recognized: Dict[str, List] = {}  # student_id -> [(camera, offset, student), ...]
+    rejected: Dict[str, List] = {}
+    for camera, (result, offset) in enumerate(zip(results, offsets)):
+        for student in result['recognized_students']:
+            recognized.setdefault(student['student_id'], []).append((camera, offset, student))
+        for student in result.get('liveness_rejected', []):
+            rejected.setdefault(student['student_id'], []).append((camera, offset, student))
+
+    recognized_students = [
+        _fuse_student(sightings, best_k, presence_gap, min_presence)
+        for sightings in recognized.values()
+    ]
+
+    # Rejected only if no camera saw the student pass liveness
+    liveness_rejected = [
+        _fuse_student(sightings, best_k, presence_gap, min_presence)
+        for student_id, sightings in rejected.items()
+        if student_id not in recognized
+    ]
+
+    return {
+        'total_faces_detected': sum(r['total_faces_detected'] for r in results),
+        'unique_students_identified': len(recognized_students),
+        'recognized_students': recognized_students,
+        'liveness_rejected': liveness_rejected
+    }
+
+
+def _fuse_student(sightings: List, best_k: int, presence_gap: float, min_presence: float) -> Dict:
+    """Combine one student's per-camera entries (camera, offset, student)"""
+    _, _, best = max(sightings, key=lambda sighting: sighting[2]['confidence'])
+
+    detections = []
+    intervals = []
+    for camera, offset, student in sightings:
+        detections.extend(
+            dict(detection, timestamp=detection['timestamp'] + offset, camera=camera)
+            for detection in student['detections']
+        )
+        intervals.extend(
+            (interval['start'] + offset, interval['end'] + offset)
+            for interval in student.get('presence_intervals', [])
+        )
+
+    detections = sorted(detections, key=lambda d: (-d['confidence'], d['timestamp']))[:best_k]
+    detections.sort(key=lambda d: d['timestamp'])
+
+    presence = PresenceIntervals(presence_gap, sample_period=0.0)
+    for start, end in sorted(intervals):
+        presence.add_interval(start, end)
+
+    fused = {
+        'student_id': best['student_id'],
+        'student_name': best['student_name'],
+        'confidence': best['confidence'],
+        'detections': detections,
+        'first_seen': presence.first_seen,
+        'last_seen': presence.last_seen,
+        'presence_duration': presence.duration,
+        'presence_intervals': presence.to_list(),
+        'present': presence.duration >= min_presence,
+        'cameras': sorted({camera for camera, _, _ in sightings})
+    }
+    if 'liveness' in best:
+        fused['liveness'] = best['liveness']
+
+    return fused
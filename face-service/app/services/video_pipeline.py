@@ -0,0 +1,416 @@
+import cv2
+import numpy as np
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.face_quality import GATED_MATCH
+from app.utils.exceptions import ProcessingCancelledException, VideoProcessingException
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+_POLL_INTERVAL = 0.1
+
+
+class _Stopped(Exception):
+    """Internal signal that the pipeline is shutting down"""
+
+
+class FrameResult:
+    """A sampled frame and everything the stages attach to it"""
+
+    __slots__ = ('frame_number', 'timestamp', 'frame', 'faces', 'matches', 'crops')
+
+    def __init__(self, frame_number: int, timestamp: float, frame: np.ndarray):
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.frame = frame
+        self.faces: List[Dict] = []
+        self.matches: List[Dict] = []
+        self.crops: List[Optional[np.ndarray]] = []
+
+
+class ModelPool:
+    """Pool of model instances that must not be shared between threads"""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self._idle = queue.SimpleQueue()
+
+    @contextmanager
+    def lease(self):
+        try:
+            model = self._idle.get_nowait()
+        except queue.Empty:
+            model = self.factory()
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+
+class _StageCounter:
+    """Tracks live workers of a stage so the last one can close the next queue"""
+
+    def __init__(self, workers: int):
+        self._remaining = workers
+        self._lock = threading.Lock()
+
+    def worker_done(self) -> bool:
+        with self._lock:
+            self._remaining -= 1
+            return self._remaining == 0
+
+
+class VideoPipeline:
+    """Decode -> detect -> recognize -> aggregate over bounded queues
+
+    The decoder thread fills a bounded queue with batches of sampled
+    frames, so decoding overlaps with inference instead of alternating
+    with it. Detection and recognition each run on their own worker
+    threads (cv2 releases the GIL during decode and DNN forward). The
+    aggregation callback runs on the thread that calls run(), in frame
+    order, so results are deterministic regardless of worker count.
+
+    A failure in any stage stops every stage and is re-raised from run();
+    cancel(), or setting cancel_event, stops the pipeline and makes run()
+    raise ProcessingCancelledException. Stages check for cancellation
+    between batches, and the capture handle is released as the decoder
+    exits.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        detector_pool: ModelPool,
+        recognize: Callable[[np.ndarray, List[Dict]], List[Dict]],
+        on_frame: Callable[[FrameResult], None],
+        frame_rate: float,
+        crop: Optional[Callable[[np.ndarray, List[int]], Optional[np.ndarray]]] = None,
+        batch_size: int = 4,
+        queue_size: int = 4,
+        detect_workers: int = 1,
+        recognize_workers: int = 1,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None,
+        min_face_size: int = 0,
+        deadline: Optional[float] = None,
+        cancel_event=None,
+        quality_gate=None
+    ):
+        """
+        Args:
+            video_path: Video file to decode
+            detector_pool: Pool of objects with detect_video_frame(frame)
+            recognize: (frame, faces) -> one match dict per face; thread-safe
+            on_frame: Aggregation callback, called in frame order
+            frame_rate: Frames per second to sample
+            crop: Optional (frame, bbox) -> small crop kept after the frame is released
+            batch_size: Sampled frames per queue item
+            queue_size: Batches buffered between stages (backpressure bound)
+            detect_workers: Detection threads
+            recognize_workers: Recognition threads
+            start_frame: First frame to decode (seeks when > 0)
+            end_frame: Stop before this frame; None for end of video
+            min_face_size: Faces narrower than this (pixels) are not recognized
+            deadline: time.time() at which decoding stops early; frames already
+                decoded are still processed
+            cancel_event: Optional object with is_set() (threading.Event,
+                CancellationToken or a multiprocessing manager Event) that
+                cancels the pipeline once set
+            quality_gate: Optional FaceQualityGate; faces it holds back are
+                not passed to recognize and get its GATED_MATCH result
+        """
+        self.video_path = video_path
+        self.detector_pool = detector_pool
+        self.recognize = recognize
+        self.on_frame = on_frame
+        self.frame_rate = frame_rate
+        self.crop = crop
+        self.batch_size = max(1, batch_size)
+        self.detect_workers = max(1, detect_workers)
+        self.recognize_workers = max(1, recognize_workers)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.min_face_size = min_face_size
+        self.deadline = deadline
+        self.cancel_event = cancel_event
+        self.quality_gate = quality_gate
+
+        self._detect_queue = queue.Queue(maxsize=max(1, queue_size))
+        self._recognize_queue = queue.Queue(maxsize=max(1, queue_size))
+        self._output_queue = queue.Queue(maxsize=max(1, queue_size))
+
+        self._stop = threading.Event()
+        self._cancelled = False
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.fps = 0.0
+        self.sample_period = 0.0
+        self.total_frames = 0
+        self.processed_frames = 0
+        self.covered_frames = 0
+        self.stopped_early = False
+        self.embedded_faces = 0
+        self.gated_faces = 0
+
+    def cancel(self):
+        """Stop all stages; run() raises ProcessingCancelledException"""
+        self._cancelled = True
+        self._stop.set()
+
+    def run(self) -> Dict:
+        """
+        Run the pipeline to completion on the calling thread
+
+        Returns:
+            Stats: fps, total_frames, processed_frames, covered_frames (decoded
+            range), stopped_early, embedded_faces and gated_faces
+        """
+        detect_counter = _StageCounter(self.detect_workers)
+        recognize_counter = _StageCounter(self.recognize_workers)
+
+        threads = [threading.Thread(target=self._decode, name='pipeline-decode', daemon=True)]
+        threads += [
+            threading.Thread(
+                target=self._stage_worker,
+                args=(self._detect_queue, self._recognize_queue, detect_counter, self._detect),
+                name=f'pipeline-detect-{i}',
+                daemon=True
+            )
+            for i in range(self.detect_workers)
+        ]
+        threads += [
+            threading.Thread(
+                target=self._stage_worker,
+                args=(self._recognize_queue, self._output_queue, recognize_counter,
+                      self._recognize),
+                name=f'pipeline-recognize-{i}',
+                daemon=True
+            )
+            for i in range(self.recognize_workers)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._aggregate()
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # All stages have drained on normal completion; otherwise unblock them
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+        if self._cancelled:
+            raise ProcessingCancelledException("Video processing cancelled")
+
+        return {
+            'fps': self.fps,
+            'total_frames': self.total_frames,
+            'processed_frames': self.processed_frames,
+            'covered_frames': self.covered_frames,
+            'stopped_early': self.stopped_early,
+            'embedded_faces': self.embedded_faces,
+            'gated_faces': self.gated_faces
+        }
+
+    # Stages -----------------------------------------------------------------
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                raise VideoProcessingException("Could not open video file")
+
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            frame_interval = max(1, int(self.fps / self.frame_rate))
+            self.sample_period = frame_interval / self.fps
+
+            frame_number = self.start_frame
+            if frame_number > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+            batch = []
+            batch_index = 0
+            self._check_stop()
+            while self.end_frame is None or frame_number < self.end_frame:
+                if self._stop.is_set():
+                    raise _Stopped()
+
+                if frame_number % frame_interval == 0:
+                    if self.deadline is not None and time.time() >= self.deadline:
+                        self.stopped_early = True
+                        break
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    batch.append(FrameResult(frame_number, frame_number / self.fps, frame))
+                    if len(batch) == self.batch_size:
+                        self._put(self._detect_queue, (batch_index, batch))
+                        batch_index += 1
+                        batch = []
+                elif not cap.grab():
+                    # Skipped frames are grabbed but never converted to BGR
+                    break
+
+                frame_number += 1
+                self.covered_frames = frame_number - self.start_frame
+
+            if batch:
+                self._put(self._detect_queue, (batch_index, batch))
+
+            self._put(self._detect_queue, _SENTINEL)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            cap.release()
+
+    def _stage_worker(
+        self,
+        in_queue: queue.Queue,
+        out_queue: queue.Queue,
+        counter: _StageCounter,
+        handler: Callable
+    ):
+        try:
+            handler(in_queue, out_queue)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            if counter.worker_done() and not self._stop.is_set():
+                try:
+                    self._put(out_queue, _SENTINEL)
+                except _Stopped:
+                    pass
+
+    def _detect(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        with self.detector_pool.lease() as detector:
+            for batch_index, batch in self._batches(in_queue):
+                for result in batch:
+                    result.faces = detector.detect_video_frame(result.frame)
+                    if self.min_face_size:
+                        result.faces = [
+                            face for face in result.faces
+                            if face['bbox'][2] - face['bbox'][0] >= self.min_face_size
+                        ]
+                self._put(out_queue, (batch_index, batch))
+
+    def _recognize(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        for batch_index, batch in self._batches(in_queue):
+            selected = [None] * len(batch)
+            if self.quality_gate is not None:
+                # One vectorized quality pass over every face of the batch
+                selected = self.quality_gate.select(
+                    [result.frame for result in batch],
+                    [result.faces for result in batch],
+                    [result.timestamp for result in batch],
+                    self.sample_period
+                )
+
+            embedded = 0
+            faces = 0
+            for result, flags in zip(batch, selected):
+                if result.faces:
+                    embedded += self._recognize_frame(result, flags)
+                    faces += len(result.faces)
+                # Aggregation only needs faces, matches and crops
+                result.frame = None
+
+            with self._stats_lock:
+                self.embedded_faces += embedded
+                self.gated_faces += faces - embedded
+            self._put(out_queue, (batch_index, batch))
+
+    def _recognize_frame(self, result: FrameResult, flags: Optional[List[bool]]) -> int:
+        """Recognize the faces of one frame that passed the gate; returns how many"""
+        if flags is None:
+            indices = list(range(len(result.faces)))
+        else:
+            indices = [i for i, keep in enumerate(flags) if keep]
+
+        if len(indices) == len(result.faces):
+            result.matches = self.recognize(result.frame, result.faces)
+            if self.crop is not None:
+                result.crops = [self.crop(result.frame, face['bbox']) for face in result.faces]
+            return len(indices)
+
+        result.matches = [dict(GATED_MATCH) for _ in result.faces]
+        result.crops = [None] * len(result.faces)
+        if indices:
+            matches = self.recognize(result.frame, [result.faces[i] for i in indices])
+            for i, match in zip(indices, matches):
+                result.matches[i] = match
+                if self.crop is not None:
+                    result.crops[i] = self.crop(result.frame, result.faces[i]['bbox'])
+        return len(indices)
+
+    def _aggregate(self):
+        pending = {}
+        next_index = 0
+        for batch_index, batch in self._batches(self._output_queue):
+            pending[batch_index] = batch
+            while next_index in pending:
+                for result in pending.pop(next_index):
+                    self.on_frame(result)
+                    self.processed_frames += 1
+                next_index += 1
+
+    # Queue helpers ----------------------------------------------------------
+
+    def _batches(self, in_queue: queue.Queue):
+        """Yield queue items until the sentinel, which is passed on to sibling workers"""
+        while True:
+            item = self._get(in_queue)
+            if item is _SENTINEL:
+                in_queue.put(_SENTINEL)
+                return
+            yield item
+
+    def _check_stop(self):
+        """Raise _Stopped if the pipeline is stopping or its cancel_event is set"""
+        if self.cancel_event is not None and not self._stop.is_set() and self.cancel_event.is_set():
+            self.cancel()
+        if self._stop.is_set():
+            raise _Stopped()
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            self._check_stop()
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            self._check_stop()
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _fail(self, error: BaseException):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+                logger.error("Video pipeline stage failed: %s", error)
+        self._stop.set()
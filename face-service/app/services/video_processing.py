@@ -1,14 +1,34 @@
-import cv2
+import asyncio
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import hashlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import uuid
 from datetime import datetime
 import tempfile
+import time
 import os
 
+from app.services.attendance_writer import AttendanceWriterService
+from app.services.cancellation import CancellationToken
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.detector_backends import get_detector_backend
 from app.services.face_detection import FaceDetectionService
+from app.services.face_quality import new_quality_gate
 from app.services.face_recognition import FaceRecognitionService
+from app.services.gallery import Gallery
+from app.services.job_checkpoints import JobCheckpointer, get_checkpoint_store
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.qos import QosPlan, plan_qos, record_frame_cost
+from app.services.result_cache import ResultCacheService, model_version
+from app.services.session_fusion import fuse_camera_results
+from app.services.video_pipeline import ModelPool, VideoPipeline
+from app.services.video_segments import init_segment_worker, plan_segments, process_segment
+from app.utils.exceptions import ProcessingCancelledException
+from app.utils.profiling import profiled
+from app.utils.video_utils import get_video_info, save_upload_to_temp
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -18,9 +38,26 @@ class VideoProcessingService:
     """Process attendance videos"""
     
     def __init__(self):
-        self.face_detector = FaceDetectionService()
         self.face_recognizer = FaceRecognitionService()
+        # cv2.dnn nets are not thread-safe: one detector per pipeline worker
+        self.detector_pool = ModelPool(FaceDetectionService)
+        self._segment_pool = None
+        self._segment_pool_backend = None
+        self._manager = None
+        self.liveness = LivenessDetectionService() if settings.ENABLE_LIVENESS else None
+        self.attendance_writer = AttendanceWriterService()
+        self.result_cache = None
+        # Runs of identical full-quality jobs, by cache key; identical uploads wait on them
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        
+        if settings.ENABLE_RESULT_CACHE:
+            self.result_cache = ResultCacheService(
+                settings.RESULT_CACHE_DIR,
+                ttl_seconds=settings.RESULT_CACHE_TTL,
+                max_bytes=settings.RESULT_CACHE_MAX_BYTES
+            )
     
+    @profiled('video.process_video')
     async def process_video(
         self,
         video_content: bytes,
@@ -39,127 +76,495 @@ class VideoProcessingService:
             Processing results
         """
         start_time = datetime.now()
-        video_id = str(uuid.uuid4())
+        content_hash = hashlib.sha256(video_content).hexdigest()
         
-        logger.info(f"Processing video {video_id}: {filename}")
+        # Save to temp file
+        video_path = await asyncio.get_running_loop().run_in_executor(
+            None, self._write_temp_file, video_content
+        )
         
-        try:
-            # Save to temp file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                tmp_file.write(video_content)
-                video_path = tmp_file.name
+        return await self._process_saved_video(
+            video_path, content_hash, filename, class_id, start_time
+        )
+    
+    @profiled('video.process_upload')
+    async def process_upload(
+        self,
+        video,
+        class_id: str = None,
+        session_id: str = None,
+        latency_budget: Optional[float] = None,
+        priority: str = 'normal',
+        cancel_token: Optional[CancellationToken] = None,
+        arrived_at: Optional[float] = None
+    ) -> Dict:
+        """
+        Process an uploaded video, hashing it while it streams to disk
+        
+        Args:
+            video: FastAPI UploadFile
+            class_id: Optional class identifier
+            session_id: Optional attendance session to write results into
+            latency_budget: Optional seconds processing may take; the video is
+                processed at reduced quality or partially to fit
+            priority: 'interactive', 'normal' or 'batch' (never degraded)
+            cancel_token: Optional token that stops processing once set
+            arrived_at: time.time() the request arrived; latency_budget
+                counts from it (default when processing starts)
             
-            # Process video
-            result = await self._process_video_file(video_path, video_id, class_id)
+        Returns:
+            Processing results
             
-            # Clean up
+        Raises:
+            ProcessingCancelledException: cancel_token was set before processing finished
+        """
+        start_time = datetime.now()
+        video_path, content_hash, size = await save_upload_to_temp(video)
+        
+        logger.info("Received video: %s (%s bytes, sha256 %s)", video.filename, size, content_hash[:12])
+        
+        try:
+            if session_id and not class_id:
+                class_id = await self.attendance_writer.get_session_class(session_id)
+        except Exception:
             os.unlink(video_path)
+            raise
+        
+        result = await self._process_saved_video(
+            video_path, content_hash, video.filename, class_id, start_time,
+            latency_budget=latency_budget, priority=priority, cancel_token=cancel_token,
+            arrived_at=arrived_at
+        )
+        
+        if session_id:
+            result['session'] = await self.attendance_writer.persist_session_results(
+                session_id, result['recognized_students']
+            )
+        
+        return result
+    
+    @profiled('video.process_session')
+    async def process_session(
+        self,
+        videos: List,
+        class_id: str = None,
+        session_id: str = None,
+        offsets: Optional[List[float]] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict:
+        """
+        Process several camera videos of one session concurrently and fuse them
+        
+        Args:
+            videos: FastAPI UploadFiles, one per camera
+            class_id: Optional class identifier
+            session_id: Optional attendance session to write fused results into
+            offsets: Optional start offset (seconds) of each video on the session clock
+            cancel_token: Optional token that stops all cameras' processing once set
+            
+        Returns:
+            Fused results with a per-video summary
+        """
+        start_time = datetime.now()
+        saved = await asyncio.gather(
+            *(save_upload_to_temp(video) for video in videos), return_exceptions=True
+        )
+        
+        try:
+            for upload in saved:
+                if isinstance(upload, BaseException):
+                    raise upload
+            
+            if session_id and not class_id:
+                class_id = await self.attendance_writer.get_session_class(session_id)
+            
+            logger.info("Processing %s camera videos for session %s", len(videos), session_id or '-')
+            
+            # Each video runs its own pipeline; long ones share the segment worker pool
+            results = await self._run_cameras([
+                self._process_saved_video(
+                    video_path, content_hash, video.filename, class_id, start_time, cancel_token=cancel_token
+                )
+                for video, (video_path, content_hash, _) in zip(videos, saved)
+            ])
+        finally:
+            for upload in saved:
+                if not isinstance(upload, BaseException):
+                    self._remove_temp_file(upload[0])
+        
+        fused = fuse_camera_results(results, offsets)
+        fused['success'] = True
+        fused['class_id'] = class_id
+        fused['videos'] = [
+            {
+                'camera': camera,
+                'filename': video.filename,
+                **{key: result.get(key) for key in (
+                    'video_id', 'content_hash', 'cache_hit', 'total_frames', 'processed_frames',
+                    'total_faces_detected', 'unique_students_identified', 'processing_time'
+                )}
+            }
+            for camera, (video, result) in enumerate(zip(videos, results))
+        ]
+        
+        if session_id:
+            fused['session'] = await self.attendance_writer.persist_session_results(
+                session_id, fused['recognized_students']
+            )
+        
+        fused['processing_time'] = (datetime.now() - start_time).total_seconds()
+        return fused
+    
+    @staticmethod
+    async def _run_cameras(coroutines: List) -> List[Dict]:
+        """Results of the per-camera runs in order; the first failure cancels the others"""
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # Let cancelled pipelines stop and release their files before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    
+    @staticmethod
+    def _remove_temp_file(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    async def _process_saved_video(
+        self,
+        video_path: str,
+        content_hash: str,
+        filename: str,
+        class_id: Optional[str],
+        start_time: datetime,
+        latency_budget: Optional[float] = None,
+        priority: str = 'normal',
+        cancel_token: Optional[CancellationToken] = None,
+        arrived_at: Optional[float] = None
+    ) -> Dict:
+        """Serve from the result cache or process the temp file, then clean up"""
+        try:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             
-            # Calculate processing time
-            processing_time = (datetime.now() - start_time).total_seconds()
-            result['processing_time'] = processing_time
-            result['video_id'] = video_id
+            # Load enrolled embeddings once per video instead of once per face
+            gallery = await self.face_recognizer.load_gallery(class_id)
             
-            logger.info(f"Video {video_id} processed in {processing_time:.2f}s")
+            # Same inputs, same key: identifies the job across pod restarts
+            cache_key = ResultCacheService.build_key(
+                content_hash, class_id, gallery.version, model_version()
+            )
             
-            return result
+            if self.result_cache is not None:
+                cached = await self.result_cache.get(cache_key)
+                if cached is not None:
+                    cached['cache_hit'] = True
+                    cached['qos'] = None
+                    if latency_budget is not None:
+                        cached['qos'] = QosPlan(priority, latency_budget, settings.VIDEO_FRAME_RATE).report()
+                    cached['processing_time'] = (datetime.now() - start_time).total_seconds()
+                    logger.info("Result cache hit for %s (video %s)", filename, cached['video_id'])
+                    return cached
             
+            # A retried upload still being processed shares that run instead of starting another
+            shared = latency_budget is None
+            while shared and cache_key in self._in_flight:
+                result = await self._wait_in_flight(self._in_flight[cache_key], cancel_token)
+                if result is not None:
+                    result['cache_hit'] = True
+                    result['processing_time'] = (datetime.now() - start_time).total_seconds()
+                    logger.info("Joined in-flight processing of %s (video %s)", filename, result['video_id'])
+                    return result
+            
+            in_flight = None
+            if shared:
+                in_flight = asyncio.get_running_loop().create_future()
+                self._in_flight[cache_key] = in_flight
+            
+            try:
+                video_id = str(uuid.uuid4())
+                logger.info("Processing video %s: %s", video_id, filename)
+                
+                # Process video
+                job_id, claim = await self._claim_checkpoint(cache_key, video_id)
+                try:
+                    result = await self._process_video_file(
+                        video_path, video_id, gallery, job_id=job_id,
+                        latency_budget=latency_budget, priority=priority, cancel_token=cancel_token,
+                        arrived_at=arrived_at
+                    )
+                finally:
+                    if claim is not None:
+                        get_checkpoint_store().release(claim)
+                
+                # Calculate processing time
+                processing_time = (datetime.now() - start_time).total_seconds()
+                result['processing_time'] = processing_time
+                result['video_id'] = video_id
+                result['content_hash'] = content_hash
+                result['cache_hit'] = False
+                
+                # Degraded or partial results must not be served to full-quality requests
+                degraded = result.get('qos') is not None and result['qos']['degraded']
+                if self.result_cache is not None and not degraded:
+                    await self.result_cache.set(cache_key, result)
+                
+                logger.info("Video %s processed in %.2fs", video_id, processing_time)
+                
+                if in_flight is not None:
+                    in_flight.set_result(dict(result))
+                return result
+            finally:
+                if in_flight is not None:
+                    del self._in_flight[cache_key]
+                    if not in_flight.done():
+                        # Failed or cancelled: waiting uploads run the job themselves
+                        in_flight.set_result(None)
+            
+        except ProcessingCancelledException as e:
+            # The checkpoint is kept, so a retry of the same upload resumes
+            logger.info("Stopped processing %s: %s", filename, e)
+            raise
         except Exception as e:
-            logger.error(f"Error processing video: {e}")
-            # Clean up on error
+            logger.error("Error processing video: %s", e)
+            raise
+        finally:
             if os.path.exists(video_path):
                 os.unlink(video_path)
-            raise
+    
+    @staticmethod
+    def _write_temp_file(video_content: bytes) -> str:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
+            tmp_file.write(video_content)
+            return tmp_file.name
+    
+    @staticmethod
+    async def _wait_in_flight(
+        future: asyncio.Future,
+        cancel_token: Optional[CancellationToken]
+    ) -> Optional[Dict]:
+        """Result of an identical job in flight (a copy), or None if that job failed"""
+        if cancel_token is None:
+            result = await asyncio.shield(future)
+            return dict(result) if result is not None else None
+        
+        loop = asyncio.get_running_loop()
+        cancelled = loop.create_future()
+        
+        def on_cancel():
+            loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None))
+        
+        # Cancelling this upload stops only its wait, never the shared run
+        cancel_token.add_callback(on_cancel)
+        try:
+            await asyncio.wait([future, cancelled], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancel_token.remove_callback(on_cancel)
+        
+        cancel_token.raise_if_cancelled()
+        result = future.result()
+        return dict(result) if result is not None else None
+    
+    @staticmethod
+    async def _claim_checkpoint(cache_key: str, video_id: str) -> Tuple[Optional[str], object]:
+        """
+        Checkpoint id for a job and its claim on it
+        
+        Returns:
+            (job_id, claim): job_id is cache_key, so a retry of the upload
+            resumes, unless another running job holds that claim; then the
+            job checkpoints under its own id and claim is None
+        """
+        store = get_checkpoint_store()
+        if store is None:
+            return None, None
+        
+        claim = await asyncio.get_running_loop().run_in_executor(None, store.claim, cache_key)
+        if claim is None:
+            logger.info("Checkpoint of %s is held by another job; using a private one", cache_key[:12])
+            return f"{cache_key}-{video_id}", None
+        return cache_key, claim
     
     async def _process_video_file(
         self,
         video_path: str,
         video_id: str,
-        class_id: str
+        gallery: Gallery,
+        job_id: Optional[str] = None,
+        latency_budget: Optional[float] = None,
+        priority: str = 'normal',
+        cancel_token: Optional[CancellationToken] = None,
+        arrived_at: Optional[float] = None
     ) -> Dict:
-        """Process video file and extract faces"""
+        """Process video file and extract faces, resuming job_id's checkpoint if any"""
         
-        cap = cv2.VideoCapture(video_path)
+        info = await asyncio.get_running_loop().run_in_executor(None, get_video_info, video_path)
+        segments = []
+        if settings.SEGMENT_WORKERS > 1:
+            segments = plan_segments(
+                info['frame_count'],
+                info['fps'],
+                settings.SEGMENT_WORKERS,
+                settings.SEGMENT_MIN_SECONDS
+            )
+        parallelism = max(1, len(segments))
         
-        if not cap.isOpened():
-            raise ValueError("Could not open video file")
+        qos = plan_qos(info['duration'], latency_budget, priority, parallelism, arrived_at)
+        if qos.degraded:
+            job_id = None  # checkpoints hold full-quality state only
         
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        started = time.monotonic()
+        if len(segments) > 1:
+            logger.info("Video %s: processing %s segments in parallel", video_id, len(segments))
+            aggregator, stats = await self._process_segments(
+                video_path, segments, gallery, job_id, qos, cancel_token
+            )
+            stats['total_frames'] = info['frame_count']
+            record_frame_cost(time.monotonic() - started, stats['processed_frames'], parallelism)
+            self._log_quality_gate(video_id, stats)
+            return self._with_qos(aggregator.build_result(video_id, stats), qos, stats, latency_budget)
         
-        # Process every Nth frame
-        frame_interval = max(1, int(fps / settings.VIDEO_FRAME_RATE))
+        checkpointer = JobCheckpointer(
+            get_checkpoint_store(),
+            job_id,
+            self.liveness,
+            interval=settings.CHECKPOINT_INTERVAL,
+            frame_rate=qos.frame_rate
+        )
         
-        all_detections = {}  # student_id -> list of detections
-        processed_frames = 0
-        total_faces = 0
+        pipeline = VideoPipeline(
+            video_path,
+            detector_pool=self.detector_pool,
+            recognize=lambda frame, faces: self._recognize_faces(gallery, frame, faces),
+            on_frame=checkpointer.on_frame,
+            frame_rate=qos.frame_rate,
+            crop=self.liveness.crop if self.liveness else None,
+            batch_size=settings.PIPELINE_BATCH_FRAMES,
+            queue_size=settings.PIPELINE_QUEUE_SIZE,
+            detect_workers=settings.PIPELINE_DETECT_WORKERS,
+            recognize_workers=settings.PIPELINE_RECOGNIZE_WORKERS,
+            start_frame=checkpointer.start_frame,
+            min_face_size=qos.min_face_size,
+            deadline=qos.deadline,
+            cancel_event=cancel_token,
+            quality_gate=new_quality_gate()
+        )
         
-        frame_number = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process selected frames only
-            if frame_number % frame_interval == 0:
-                timestamp = frame_number / fps
-                
-                # Detect faces
-                faces = self.face_detector.detect_faces(frame)
-                total_faces += len(faces)
-                
-                # Recognize each face
-                for face in faces:
-                    bbox = face['bbox']
-                    face_img = self.face_detector.extract_face(frame, bbox)
-                    
-                    # Recognize
-                    recognition_result = await self.face_recognizer.recognize_face(
-                        face_img,
-                        class_id
-                    )
-                    
-                    if recognition_result.get('recognized'):
-                        student_id = recognition_result['student_id']
-                        
-                        if student_id not in all_detections:
-                            all_detections[student_id] = {
-                                'student_id': student_id,
-                                'student_name': recognition_result['student_name'],
-                                'detections': []
-                            }
-                        
-                        all_detections[student_id]['detections'].append({
-                            'bbox': face['bbox'],
-                            'confidence': face['confidence'],
-                            'frame_number': frame_number,
-                            'timestamp': timestamp
-                        })
-                
-                processed_frames += 1
-            
-            frame_number += 1
+        future = asyncio.get_running_loop().run_in_executor(None, pipeline.run)
+        try:
+            stats = await future
+        except asyncio.CancelledError:
+            pipeline.cancel()
+            raise
+        
+        stats = checkpointer.finish(stats)
+        record_frame_cost(time.monotonic() - started, stats['processed_frames'])
+        self._log_quality_gate(video_id, stats)
+        return self._with_qos(checkpointer.aggregator.build_result(video_id, stats), qos, stats, latency_budget)
+    
+    @staticmethod
+    def _log_quality_gate(video_id: str, stats: Dict):
+        faces = stats['embedded_faces'] + stats['gated_faces']
+        if faces:
+            logger.info(
+                "Video %s: embedded %s of %s faces (%s below the quality gate)",
+                video_id, stats['embedded_faces'], faces, stats['gated_faces']
+            )
+    
+    @staticmethod
+    def _with_qos(result: Dict, qos: QosPlan, stats: Dict, latency_budget: Optional[float]) -> Dict:
+        """Report effective settings and coverage when the caller set a budget"""
+        result['qos'] = qos.report(stats) if latency_budget is not None else None
+        return result
+    
+    async def _process_segments(
+        self,
+        video_path: str,
+        segments: List[Tuple[int, int]],
+        gallery: Gallery,
+        job_id: Optional[str] = None,
+        qos: Optional[QosPlan] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Tuple[DetectionAggregator, Dict]:
+        """Process frame ranges on the worker pool and merge them in frame order"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_segment_pool()
         
-        cap.release()
+        # Workers cannot see the token; forward it through an event they poll
+        cancel_event = None
+        if cancel_token is not None:
+            cancel_event = self._get_manager().Event()
+            cancel_token.add_callback(cancel_event.set)
         
-        # Calculate average confidence for each student
-        recognized_students = []
-        for student_data in all_detections.values():
-            detections = student_data['detections']
-            avg_confidence = sum(d['confidence'] for d in detections) / len(detections)
-            
-            recognized_students.append({
-                'student_id': student_data['student_id'],
-                'student_name': student_data['student_name'],
-                'confidence': avg_confidence,
-                'detections': detections[:5]  # Include first 5 detections
-            })
-        
-        return {
-            'success': True,
-            'total_frames': total_frames,
-            'processed_frames': processed_frames,
-            'total_faces_detected': total_faces,
-            'unique_students_identified': len(recognized_students),
-            'recognized_students': recognized_students
-        }
\ No newline at end of file
+        futures = [
+            loop.run_in_executor(
+                pool, process_segment, video_path, start, end, gallery, job_id, qos, cancel_event
+            )
+            for start, end in segments
+        ]
+        
+        try:
+            results = await asyncio.gather(*futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            # Stop segments that are already running, not just queued ones
+            if cancel_event is not None:
+                cancel_event.set()
+            raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(cancel_event.set)
+        
+        aggregator, stats = results[0]
+        aggregator.liveness = self.liveness
+        for segment_aggregator, segment_stats in results[1:]:
+            aggregator.merge(segment_aggregator)
+            stats['processed_frames'] += segment_stats['processed_frames']
+            stats['covered_frames'] += segment_stats['covered_frames']
+            stats['stopped_early'] = stats['stopped_early'] or segment_stats['stopped_early']
+            stats['embedded_faces'] += segment_stats['embedded_faces']
+            stats['gated_faces'] += segment_stats['gated_faces']
+        
+        return aggregator, stats
+    
+    def _get_segment_pool(self) -> ProcessPoolExecutor:
+        """Worker processes, each holding its own capture handles and model replica"""
+        backend = get_detector_backend().name
+        if self._segment_pool is not None and self._segment_pool_backend != backend:
+            # Detector backend changed: let running segments finish on the old workers
+            self._segment_pool.shutdown(wait=False)
+            self._segment_pool = None
+        
+        if self._segment_pool is None:
+            self._segment_pool_backend = backend
+            self._segment_pool = ProcessPoolExecutor(
+                max_workers=settings.SEGMENT_WORKERS,
+                # spawn: forking a process that already runs decoder/inference threads is unsafe
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_segment_worker,
+                initargs=(backend,)
+            )
+        return self._segment_pool
+    
+    def _get_manager(self):
+        """Manager process hosting cancellation events shared with segment workers"""
+        if self._manager is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+        return self._manager
+    
+    def _recognize_faces(self, gallery: Gallery, frame: np.ndarray, faces: List[Dict]) -> List[Dict]:
+        """Recognition stage: encode the detected boxes directly, one match per face"""
+        return self.face_recognizer.recognize_faces(
+            frame, [face['bbox'] for face in faces], gallery
+        )
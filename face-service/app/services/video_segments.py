@@ -0,0 +1,153 @@
+import cv2
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.detector_backends import set_detector_backend
+from app.services.face_detection import FaceDetectionService
+from app.services.face_quality import new_quality_gate
+from app.services.face_recognition import FaceRecognitionService
+from app.services.gallery import Gallery
+from app.services.job_checkpoints import JobCheckpointer, get_checkpoint_store
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.qos import QosPlan
+from app.services.video_pipeline import ModelPool, VideoPipeline
+from app.utils.video_utils import get_video_info
+
+logger = logging.getLogger(__name__)
+
+# Per-process model replicas, created by init_segment_worker()
+_worker = {}
+
+
+def plan_segments(
+    total_frames: int,
+    fps: float,
+    max_segments: int,
+    min_segment_seconds: float
+) -> List[Tuple[int, int]]:
+    """
+    Split a video into contiguous frame ranges for parallel processing
+
+    Args:
+        total_frames: Frame count of the video
+        fps: Frames per second
+        max_segments: Upper bound, usually the number of worker processes
+        min_segment_seconds: Segments shorter than this are not worth a worker
+
+    Returns:
+        [(start_frame, end_frame), ...] covering the whole video
+    """
+    if total_frames <= 0 or fps <= 0:
+        return [(0, max(total_frames, 0))]
+
+    min_segment_frames = max(1, int(min_segment_seconds * fps))
+    count = max(1, min(max_segments, total_frames // min_segment_frames))
+    size = math.ceil(total_frames / count)
+
+    return [(start, min(start + size, total_frames)) for start in range(0, total_frames, size)]
+
+
+def init_segment_worker(detector_backend: Optional[str] = None):
+    """
+    Process pool initializer: load one model replica per worker process
+
+    Args:
+        detector_backend: Backend selected in the parent (workers do not calibrate)
+    """
+    # Parallelism comes from processes; keep OpenCV from oversubscribing cores
+    cv2.setNumThreads(1)
+    
+    if detector_backend:
+        set_detector_backend(detector_backend, source='parent')
+
+    _worker['detector_pool'] = ModelPool(FaceDetectionService)
+    _worker['recognizer'] = FaceRecognitionService()
+    _worker['liveness'] = LivenessDetectionService() if settings.ENABLE_LIVENESS else None
+
+
+def process_segment(
+    video_path: str,
+    start_frame: int,
+    end_frame: Optional[int],
+    gallery: Gallery,
+    job_id: Optional[str] = None,
+    qos: Optional[QosPlan] = None,
+    cancel_event=None
+) -> Tuple[DetectionAggregator, Dict]:
+    """
+    Process one frame range in a worker process
+
+    Opens its own capture handle and seeks to start_frame. Frame numbers
+    and timestamps stay global, so segment aggregates merge directly.
+    With a job_id the segment is checkpointed and resumes from its last
+    checkpoint after a restart. A QoS plan lowers the sampling rate, skips
+    small faces and stops at its deadline. Setting cancel_event (a manager
+    Event shared with the parent) stops the segment with
+    ProcessingCancelledException.
+
+    Returns:
+        (aggregate, pipeline stats)
+    """
+    recognizer = _worker['recognizer']
+    liveness = _worker['liveness']
+    qos = qos or QosPlan('batch', None, settings.VIDEO_FRAME_RATE)
+    checkpointer = JobCheckpointer(
+        get_checkpoint_store(),
+        job_id and f"{job_id}-{start_frame}",
+        liveness,
+        start_frame=start_frame,
+        interval=settings.CHECKPOINT_INTERVAL,
+        frame_rate=qos.frame_rate
+    )
+
+    pipeline = VideoPipeline(
+        video_path,
+        detector_pool=_worker['detector_pool'],
+        recognize=lambda frame, faces: recognizer.recognize_faces(
+            frame, [face['bbox'] for face in faces], gallery
+        ),
+        on_frame=checkpointer.on_frame,
+        frame_rate=qos.frame_rate,
+        crop=liveness.crop if liveness else None,
+        batch_size=settings.PIPELINE_BATCH_FRAMES,
+        queue_size=settings.PIPELINE_QUEUE_SIZE,
+        detect_workers=settings.PIPELINE_DETECT_WORKERS,
+        recognize_workers=settings.PIPELINE_RECOGNIZE_WORKERS,
+        start_frame=checkpointer.start_frame,
+        end_frame=end_frame,
+        min_face_size=qos.min_face_size,
+        deadline=qos.deadline,
+        cancel_event=cancel_event,
+        quality_gate=new_quality_gate()
+    )
+    stats = checkpointer.finish(pipeline.run())
+
+    logger.debug("Segment %s-%s: %s frames", start_frame, end_frame, stats['processed_frames'])
+    return checkpointer.aggregator, stats
+
+
+def process_video_file(
+    video_path: str,
+    video_id: str,
+    gallery: Gallery,
+    job_id: Optional[str] = None
+) -> Dict:
+    """
+    Process a whole video in a worker process (offline batch processing)
+
+    With a job_id, an interrupted run resumes from its last checkpoint.
+
+    Returns:
+        The same result dict as the /process-video path, plus 'duration'
+    """
+    info = get_video_info(video_path)
+    aggregator, stats = process_segment(video_path, 0, None, gallery, job_id)
+    stats['total_frames'] = info['frame_count']
+
+    result = aggregator.build_result(video_id, stats)
+    result['video_id'] = video_id
+    result['duration'] = info['duration']
+    return result
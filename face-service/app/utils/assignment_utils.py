@@ -0,0 +1,59 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+    logger.warning("⚠️  scipy not installed, using greedy face assignment. Install with: pip install scipy")
+
+
+def assign(cost: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """
+    One-to-one assignment of rows to columns below a cost threshold
+
+    Pairs at or above the threshold are never assigned. Among the rest the
+    number of pairs is maximised first, then their total cost minimised.
+
+    Args:
+        cost: (rows, cols) cost matrix, e.g. face x student distances
+        threshold: Maximum accepted cost (exclusive)
+
+    Returns:
+        [(row, col), ...] sorted by row
+    """
+    if cost.size == 0:
+        return []
+
+    feasible = cost < threshold
+    if not feasible.any():
+        return []
+
+    if linear_sum_assignment is None:
+        return _greedy_assign(cost, feasible)
+
+    # Infeasible pairs get a cost no set of feasible pairs can outweigh
+    penalty = threshold * (min(cost.shape) + 1)
+    rows, cols = linear_sum_assignment(np.where(feasible, cost, penalty))
+    keep = feasible[rows, cols]
+
+    return list(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+
+def _greedy_assign(cost: np.ndarray, feasible: np.ndarray) -> List[Tuple[int, int]]:
+    """Cheapest-pair-first fallback; optimal whenever pairs do not compete"""
+    rows, cols = np.nonzero(feasible)
+    order = np.argsort(cost[rows, cols], kind='stable')
+
+    used_rows, used_cols, pairs = set(), set(), []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+
+    return sorted(pairs)
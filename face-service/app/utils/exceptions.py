@@ -21,3 +21,8 @@ class VideoProcessingException(FaceServiceException):
 class DatabaseException(FaceServiceException):
     """Database operation failed"""
     pass
+
+
+class ProcessingCancelledException(VideoProcessingException):
+    """Video processing was cancelled before completion"""
+    pass
@@ -1,44 +1,155 @@
+import atexit
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Optional
 
+from app.config import settings
+
+# Pass as `extra=` on per-frame / per-face debug messages; only 1 in
+# LOG_SAMPLE_EVERY of each kind reaches the handlers
+SAMPLE_FRAME = {'sample': 'frame'}
+SAMPLE_FACE = {'sample': 'face'}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'func': record.funcName,
+            'line': record.lineno
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through 1 in `every` records of each sample kind; others pass unchanged"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        kind = getattr(record, 'sample', None)
+        if kind is None:
+            return True
+        with self._lock:
+            count = self._counts.get(kind, 0)
+            self._counts[kind] = count + 1
+        return count % self.every == 0
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueue records unformatted
+
+    The stock QueueHandler merges args into the message on the calling
+    thread; here that is left to the writer thread, so log arguments
+    must not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _handlers(json_format: bool) -> list:
+    if json_format:
+        console_format = file_format = JsonFormatter()
+    else:
+        console_format = logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        file_format = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
+        )
 
-def setup_logger(name: str, level: str = "INFO"):
-    """Setup logger with console and file handlers"""
-    
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, level.upper()))
-    
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
-    
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
     console_handler.setFormatter(console_format)
-    
+
     # File handler
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
+
     file_handler = RotatingFileHandler(
         log_dir / "face_service.log",
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5
     )
     file_handler.setLevel(logging.DEBUG)
-    file_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-    )
     file_handler.setFormatter(file_format)
-    
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+
+    return [console_handler, file_handler]
+
+
+def setup_logging(level: str = None, json_format: bool = None) -> QueueListener:
+    """
+    Route all logging through a queue drained by a background writer thread
+
+    Request handlers only enqueue records; formatting, console output,
+    file writes and rotation happen on the listener thread.
+
+    Args:
+        level: Root log level (default: LOG_LEVEL)
+        json_format: Structured JSON lines (default: LOG_FORMAT == "json")
+
+    Returns:
+        The running listener (already started)
+    """
+    global _listener, _queue_handler
+
+    level = level or settings.LOG_LEVEL
+    json_format = settings.LOG_FORMAT == "json" if json_format is None else json_format
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()))
+
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_EVERY))
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, *_handlers(json_format), respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = _queue_handler = None
+
+
+def setup_logger(name: str, level: str = None):
+    """Logger for `name`, with queued logging configured for the whole process"""
+    setup_logging(level)
+    return logging.getLogger(name)
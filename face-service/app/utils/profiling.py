@@ -0,0 +1,314 @@
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# face-service root; frames below it are labelled with their relative path
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Profile session of the current request; None (the common case) means off
+_session: ContextVar[Optional['ProfileSession']] = ContextVar('profile_session', default=None)
+
+# tracemalloc and the profilers are process-wide: one profiled call at a time
+_profiling_lock = threading.Lock()
+
+
+class StackSampler:
+    """Wall-clock sampling profiler over all threads of the process
+
+    Unlike cProfile it also sees the pipeline's decoder and worker
+    threads. Stacks are kept in collapsed form ("thread;outer;...;inner"),
+    which flamegraph.pl and speedscope load directly.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(_ROOT + os.sep):
+                filename = os.path.relpath(filename, _ROOT)
+            else:
+                filename = os.path.basename(filename)
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, limit: int) -> str:
+        """
+        Service functions by share of samples they were on the stack for
+        (inclusive), then all functions by share they were executing (self;
+        idle threads show up as waits)
+        """
+        inclusive = Counter()
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            leaves[frames[-1]] += count
+            for label in set(frames):
+                if '(app' + os.sep in label:
+                    inclusive[label] += count
+        samples = self.samples or 1
+        total = sum(leaves.values()) or 1
+
+        lines = [f"{self.samples} samples every {self.interval * 1000:.1f} ms, all threads"]
+        lines += ["", "Service code (inclusive)"]
+        lines += [f"{100.0 * count / samples:7.2f}%  {label}" for label, count in inclusive.most_common(limit)]
+        lines += ["", "All frames (self)"]
+        lines += [f"{100.0 * count / total:7.2f}%  {leaf}" for leaf, count in leaves.most_common(limit)]
+        return '\n'.join(lines)
+
+
+class ProfileSession:
+    """Profiling requested for one HTTP request
+
+    Set by the middleware; the first @profiled call made while handling
+    the request is profiled, nested ones run normally.
+    """
+
+    def __init__(self, request_id: str, mode: str = 'sample', store: 'ProfileStore' = None):
+        self.request_id = request_id
+        self.mode = mode
+        self.store = store or get_profile_store()
+        self._running = False
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the enclosed block and write its artifacts"""
+        if not _profiling_lock.acquire(blocking=False):
+            logger.warning("Profiling of %s skipped for request %s: another profile is running", name, self.request_id)
+            yield
+            return
+
+        self._running = True
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile() if self.mode == 'cprofile' else StackSampler(settings.PROFILING_SAMPLE_INTERVAL)
+        started = time.perf_counter()
+        if self.mode == 'cprofile':
+            profiler.enable()
+        else:
+            profiler.start()
+        try:
+            yield
+        finally:
+            if self.mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self._running = False
+            _profiling_lock.release()
+
+            try:
+                self.store.save(
+                    self.request_id, name, self.mode, profiler, snapshot.compare_to(baseline, 'lineno'),
+                    peak, elapsed
+                )
+            except OSError as e:
+                logger.error("Could not write profile of request %s: %s", self.request_id, e)
+
+
+class ProfileStore:
+    """Profile artifacts on disk, one directory per request id
+
+    Each profiled call writes <name>.prof (cProfile, for pstats/snakeviz)
+    or <name>.folded (sampled stacks), plus <name>.txt with the top
+    functions, peak traced memory and top allocation sites. Only the
+    newest max_requests requests are kept.
+    """
+
+    def __init__(self, directory: str, max_requests: int = 50, top: int = 30):
+        self.directory = directory
+        self.max_requests = max_requests
+        self.top = top
+        os.makedirs(directory, exist_ok=True)
+
+    def save(
+        self,
+        request_id: str,
+        name: str,
+        mode: str,
+        profiler,
+        allocations: List[tracemalloc.StatisticDiff],
+        peak_bytes: int,
+        elapsed: float
+    ) -> List[str]:
+        """Write the artifacts of one profiled call; returns their names"""
+        directory = os.path.join(self.directory, request_id)
+        os.makedirs(directory, exist_ok=True)
+
+        if mode == 'cprofile':
+            profile_name = f"{name}.prof"
+            profiler.dump_stats(os.path.join(directory, profile_name))
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+            functions = out.getvalue().strip()
+        else:
+            profile_name = f"{name}.folded"
+            profiler.dump(os.path.join(directory, profile_name))
+            functions = profiler.summary(self.top)
+
+        filtered = [
+            diff for diff in allocations
+            if diff.size_diff > 0 and not diff.traceback[0].filename.endswith(('tracemalloc.py', 'profiling.py'))
+        ]
+        allocation_lines = [
+            f"{diff.size_diff / 1024:10.1f} KiB {diff.count_diff:+8d} blocks  {diff.traceback[0]}"
+            for diff in sorted(filtered, key=lambda d: d.size_diff, reverse=True)[:self.top]
+        ]
+
+        summary_name = f"{name}.txt"
+        with open(os.path.join(directory, summary_name), 'w') as f:
+            f.write(f"request {request_id}  {name}  mode={mode}\n")
+            f.write(f"elapsed {elapsed:.3f}s  peak traced memory {peak_bytes / 2 ** 20:.1f} MiB\n\n")
+            f.write("Top functions\n")
+            f.write(functions + "\n\n")
+            f.write("Top allocation sites (retained at the end of the call)\n")
+            f.write('\n'.join(allocation_lines) + "\n")
+
+        logger.info("Wrote profile of %s for request %s (%.2fs)", name, request_id, elapsed)
+        self.prune()
+        return [profile_name, summary_name]
+
+    def list(self) -> List[Dict]:
+        """Profiled requests, newest first"""
+        profiles = []
+        for request_id in os.listdir(self.directory):
+            directory = os.path.join(self.directory, request_id)
+            if not os.path.isdir(directory):
+                continue
+            profiles.append({
+                'request_id': request_id,
+                'created_at': os.path.getmtime(directory),
+                'artifacts': sorted(os.listdir(directory))
+            })
+        return sorted(profiles, key=lambda p: p['created_at'], reverse=True)
+
+    def artifact_path(self, request_id: str, artifact: str) -> Optional[str]:
+        """Path of one artifact, or None if it does not exist"""
+        if not _REQUEST_ID.match(request_id):
+            return None
+        directory = os.path.join(self.directory, request_id)
+        if not os.path.isdir(directory) or artifact not in os.listdir(directory):
+            return None
+        return os.path.join(directory, artifact)
+
+    def prune(self):
+        for profile in self.list()[self.max_requests:]:
+            shutil.rmtree(os.path.join(self.directory, profile['request_id']), ignore_errors=True)
+
+
+_store = {}
+
+
+def get_profile_store() -> ProfileStore:
+    if 'store' not in _store:
+        _store['store'] = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_REQUESTS)
+    return _store['store']
+
+
+def is_valid_request_id(request_id: str) -> bool:
+    return bool(_REQUEST_ID.match(request_id))
+
+
+def start_session(session: Optional[ProfileSession]):
+    """Make session the current request's profile session; returns a reset token"""
+    return _session.set(session)
+
+
+def end_session(token):
+    _session.reset(token)
+
+
+def profiled(name: str):
+    """
+    Instrumentation point: profile the call if its request asked for it
+
+    Costs one context variable lookup when profiling is off.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                session = _session.get()
+                if session is None or session._running:
+                    return await func(*args, **kwargs)
+                with session.profile(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = _session.get()
+            if session is None or session._running:
+                return func(*args, **kwargs)
+            with session.profile(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
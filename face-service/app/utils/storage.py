@@ -26,7 +26,7 @@ class StorageService:
         """Setup local file storage"""
         storage_path = Path(self.settings.LOCAL_STORAGE_PATH)
         storage_path.mkdir(parents=True, exist_ok=True)
-        logger.info(f"✅ Using local storage: {storage_path.absolute()}")
+        logger.info("✅ Using local storage: %s", storage_path.absolute())
     
     def _setup_s3_storage(self):
         """Setup S3 storage (optional)"""
@@ -44,14 +44,14 @@ class StorageService:
                 aws_secret_access_key=self.settings.AWS_SECRET_ACCESS_KEY,
                 region_name=self.settings.AWS_REGION
             )
-            logger.info(f"✅ Using S3 storage: {self.settings.S3_BUCKET_NAME}")
+            logger.info("✅ Using S3 storage: %s", self.settings.S3_BUCKET_NAME)
         except ImportError:
             logger.error("❌ boto3 not installed. Install with: pip install boto3")
             logger.warning("⚠️  Falling back to local storage")
             self.storage_type = "local"
             self._setup_local_storage()
         except Exception as e:
-            logger.error(f"❌ Error initializing S3: {e}")
+            logger.error("❌ Error initializing S3: %s", e)
             logger.warning("⚠️  Falling back to local storage")
             self.storage_type = "local"
             self._setup_local_storage()
@@ -88,7 +88,7 @@ class StorageService:
                 return await self._save_s3(student_id, filename, image_bytes)
                 
         except Exception as e:
-            logger.error(f"Error saving image: {e}")
+            logger.error("Error saving image: %s", e)
             raise
     
     async def _save_local(
@@ -109,12 +109,12 @@ class StorageService:
             
             # Return relative path
             relative_path = f"faces/{student_id}/{filename}"
-            logger.debug(f"Saved locally: {file_path}")
+            logger.debug("Saved locally: %s", file_path)
             
             return relative_path
             
         except Exception as e:
-            logger.error(f"Error saving to local storage: {e}")
+            logger.error("Error saving to local storage: %s", e)
             raise
     
     async def _save_s3(
@@ -140,12 +140,12 @@ class StorageService:
             
             # Generate URL
             url = f"https://{self.settings.S3_BUCKET_NAME}.s3.{self.settings.AWS_REGION}.amazonaws.com/{key}"
-            logger.debug(f"Saved to S3: {url}")
+            logger.debug("Saved to S3: %s", url)
             
             return url
             
         except Exception as e:
-            logger.error(f"Error saving to S3: {e}")
+            logger.error("Error saving to S3: %s", e)
             # Fallback to local storage
             logger.warning("Falling back to local storage")
             return await self._save_local(student_id, filename, image_bytes)
@@ -158,7 +158,7 @@ class StorageService:
             else:
                 return await self._delete_s3(student_id)
         except Exception as e:
-            logger.error(f"Error deleting images: {e}")
+            logger.error("Error deleting images: %s", e)
             return 0
     
     async def _delete_local(self, student_id: str) -> int:
@@ -180,11 +180,11 @@ class StorageService:
             if not any(student_dir.iterdir()):
                 student_dir.rmdir()
             
-            logger.info(f"Deleted {count} local images for student {student_id}")
+            logger.info("Deleted %s local images for student %s", count, student_id)
             return count
             
         except Exception as e:
-            logger.error(f"Error deleting from local storage: {e}")
+            logger.error("Error deleting from local storage: %s", e)
             return 0
     
     async def _delete_s3(self, student_id: str) -> int:
@@ -210,11 +210,11 @@ class StorageService:
                 )
             
             count = len(objects)
-            logger.info(f"Deleted {count} S3 images for student {student_id}")
+            logger.info("Deleted %s S3 images for student %s", count, student_id)
             return count
             
         except Exception as e:
-            logger.error(f"Error deleting from S3: {e}")
+            logger.error("Error deleting from S3: %s", e)
             return 0
     
     def get_image_url(self, relative_path: str) -> str:
@@ -1,6 +1,13 @@
+import asyncio
 import cv2
+import functools
+import hashlib
+import os
+import tempfile
 import numpy as np
-from typing import Generator
+from typing import Generator, Tuple
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 def extract_frames(
@@ -47,13 +54,55 @@ def get_video_info(video_path: str) -> dict:
     if not cap.isOpened():
         raise ValueError("Could not open video file")
     
+    fps = cap.get(cv2.CAP_PROP_FPS)
     info = {
-        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'fps': fps,
         'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
         'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
         'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-        'duration': cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+        'duration': cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps > 0 else 0.0
     }
     
     cap.release()
-    return info
\ No newline at end of file
+    return info
+
+async def save_upload_to_temp(upload, suffix: str = '.mp4') -> Tuple[str, str, int]:
+    """
+    Stream an uploaded file to a temp file, hashing it on the way in
+
+    Hashing and disk writes run in the default executor, off the event loop.
+
+    Args:
+        upload: FastAPI UploadFile
+        suffix: Temp file suffix
+
+    Returns:
+        (temp_path, sha256_hex, size_bytes)
+    """
+    loop = asyncio.get_running_loop()
+    sha256 = hashlib.sha256()
+    size = 0
+
+    tmp_file = await loop.run_in_executor(
+        None, functools.partial(tempfile.NamedTemporaryFile, delete=False, suffix=suffix)
+    )
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await loop.run_in_executor(None, _append_chunk, tmp_file, sha256, chunk)
+            size += len(chunk)
+        await loop.run_in_executor(None, tmp_file.close)
+    except BaseException:
+        # Also on cancellation, where awaiting the executor is no longer possible
+        tmp_file.close()
+        os.unlink(tmp_file.name)
+        raise
+
+    return tmp_file.name, sha256.hexdigest(), size
+
+
+def _append_chunk(tmp_file, sha256, chunk: bytes):
+    sha256.update(chunk)
+    tmp_file.write(chunk)
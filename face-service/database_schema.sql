@@ -30,3 +30,44 @@ CREATE INDEX idx_face_detection_student ON face_detection_logs(student_id);
 -- Comments
 COMMENT ON TABLE face_embeddings IS 'Stores face embeddings for student recognition';
 COMMENT ON TABLE face_detection_logs IS 'Logs all face detections from processed videos';
+
+-- Gallery change notifications: face services on every pod LISTEN on this
+-- channel and patch their cached class galleries (see gallery_cache.py)
+CREATE OR REPLACE FUNCTION notify_face_gallery_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_student UUID;
+    new_class UUID;
+    old_class UUID;
+BEGIN
+    IF TG_TABLE_NAME = 'students' THEN
+        changed_student := NEW.id;
+        new_class := NEW.class_id;
+        old_class := OLD.class_id;
+    ELSE
+        changed_student := COALESCE(NEW.student_id, OLD.student_id);
+        SELECT class_id INTO new_class FROM students WHERE id = changed_student;
+    END IF;
+
+    PERFORM pg_notify('face_gallery', json_build_object(
+        'student_id', changed_student,
+        'class_id', new_class,
+        'old_class_id', old_class
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_face_embeddings_gallery ON face_embeddings;
+CREATE TRIGGER trg_face_embeddings_gallery
+    AFTER INSERT OR UPDATE OR DELETE ON face_embeddings
+    FOR EACH ROW EXECUTE FUNCTION notify_face_gallery_change();
+
+DROP TRIGGER IF EXISTS trg_students_gallery ON students;
+CREATE TRIGGER trg_students_gallery
+    AFTER UPDATE ON students
+    FOR EACH ROW
+    WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active
+          OR OLD.class_id IS DISTINCT FROM NEW.class_id
+          OR OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION notify_face_gallery_change();
@@ -3,12 +3,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import cv2
 import uvicorn
 
+from app.api.middleware import AdmissionMiddleware, ProfilingMiddleware
+from app.api.endpoints.face import router as face_router
 from app.api.routes import router as api_router
 from app.config import settings
 from app.utils.logger import setup_logger
 from app.core.database import init_db
+from app.services.admission import get_admission_controllers
+from app.services.detector_calibration import calibrate
+from app.services.gallery_cache import GalleryListener, get_gallery_cache
+from app.services.gallery_prefetch import GalleryPrefetcher
 
 logger = setup_logger(__name__)
 
@@ -21,10 +29,33 @@ async def lifespan(app: FastAPI):
     # Initialize database connection
     await init_db()
     
+    if settings.DETECTOR_THREADS > 0:
+        cv2.setNumThreads(settings.DETECTOR_THREADS)
+    
+    # Pick the fastest detector backend that is accurate enough on this host
+    if settings.DETECTOR_BACKEND == 'auto':
+        await asyncio.get_running_loop().run_in_executor(None, calibrate)
+    
+    # Keep cached galleries in sync with enrollments made on any pod
+    gallery_listener = None
+    if settings.ENABLE_GALLERY_CACHE:
+        gallery_listener = GalleryListener(get_gallery_cache())
+        await gallery_listener.start()
+    
+    # Load galleries of upcoming sessions before their first video arrives
+    gallery_prefetcher = None
+    if settings.ENABLE_GALLERY_CACHE and settings.ENABLE_GALLERY_PREFETCH:
+        gallery_prefetcher = GalleryPrefetcher(get_gallery_cache())
+        await gallery_prefetcher.start()
+    
     logger.info("✅ Face Recognition Service started successfully")
     yield
     
     logger.info("👋 Shutting down Face Recognition Service...")
+    if gallery_prefetcher is not None:
+        await gallery_prefetcher.stop()
+    if gallery_listener is not None:
+        await gallery_listener.stop()
 
 
 app = FastAPI(
@@ -34,6 +65,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Bounded concurrency and queueing for the expensive endpoints
+admission = get_admission_controllers()
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        "/api/process-video": admission['video'],
+        "/api/process-session": admission['video'],
+        "/api/enroll-face": admission['enrollment'],
+        "/api/face/enroll": admission['enrollment'],
+    }
+)
+
+# Opt-in per-request profiling (X-Profile header), around admission
+app.add_middleware(ProfilingMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +91,7 @@ app.add_middleware(
 
 # Include API routes
 app.include_router(api_router, prefix="/api")
+app.include_router(face_router, prefix="/api/face", tags=["verification"])
 
 
 @app.get("/")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Batch-process archived attendance videos (e.g. after a model or threshold change)
+
+Examples:
+    python scripts/batch_process.py --input /archive/fall --class-id <uuid> --output fall.jsonl
+    python scripts/batch_process.py --manifest manifest.csv --output fall.jsonl --write-db
+
+A manifest is a CSV (or JSONL) with path, class_id and optional session_id.
+The output JSONL doubles as the checkpoint: re-running with the same
+--output skips videos that were already processed successfully, and a
+video that was interrupted resumes from its last job checkpoint.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.services.attendance_writer import AttendanceWriterService
+from app.services.detector_backends import get_detector_backend
+from app.services.detector_calibration import calibrate
+from app.services.gallery_cache import fetch_gallery
+from app.services.result_cache import ResultCacheService, model_version
+from app.services.video_segments import init_segment_worker, process_video_file
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+
+def load_jobs(args) -> list:
+    """Videos to process as [{'path', 'class_id', 'session_id'}, ...]"""
+    if args.manifest:
+        with open(args.manifest, newline='') as f:
+            if args.manifest.endswith('.jsonl'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = list(csv.DictReader(f))
+        base = os.path.dirname(os.path.abspath(args.manifest))
+        return [
+            {
+                'path': os.path.join(base, row['path']),
+                'class_id': row.get('class_id') or args.class_id,
+                'session_id': row.get('session_id') or None
+            }
+            for row in rows
+        ]
+
+    jobs = []
+    for root, _, files in os.walk(args.input):
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                jobs.append({
+                    'path': os.path.join(root, name),
+                    'class_id': args.class_id,
+                    'session_id': None
+                })
+    return sorted(jobs, key=lambda job: job['path'])
+
+
+def job_key(job: dict) -> str:
+    """Identifies a file version: a replaced video is processed again"""
+    stat = os.stat(job['path'])
+    return f"{os.path.abspath(job['path'])}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_completed(output_path: str) -> set:
+    """Keys of successfully processed videos from a previous run"""
+    if not os.path.exists(output_path):
+        return set()
+
+    completed = set()
+    with open(output_path, 'rb+') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # line cut short by an interrupted run
+            if entry.get('status') == 'ok':
+                completed.add(entry['key'])
+
+        # Start appending on a fresh line if the last write was interrupted
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    return completed
+
+
+def write_entry(output, entry: dict):
+    output.write(json.dumps(entry, default=str) + '\n')
+    output.flush()
+    os.fsync(output.fileno())
+
+
+async def run(args):
+    jobs = load_jobs(args)
+    completed = load_completed(args.output)
+
+    pending = []
+    for job in jobs:
+        if not os.path.exists(job['path']):
+            print(f"⚠️  Missing video, skipped: {job['path']}")
+            continue
+        job['key'] = job_key(job)
+        if job['key'] not in completed:
+            pending.append(job)
+
+    print(f"📋 {len(jobs)} videos, {len(jobs) - len(pending)} already done, {len(pending)} to process")
+    if not pending:
+        return
+
+    # One gallery per class, loaded once and shipped to the workers with each job
+    galleries = {}
+    for class_id in sorted({job['class_id'] for job in pending}, key=str):
+        galleries[class_id] = await fetch_gallery(class_id)
+        print(f"🖼️  Class {class_id or 'all'}: {len(galleries[class_id])} enrolled students")
+
+    if settings.DETECTOR_BACKEND == 'auto':
+        calibrate()
+    print(f"🔧 Detector backend: {get_detector_backend().name}")
+
+    writer = AttendanceWriterService() if args.write_db else None
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_segment_worker,
+        initargs=(get_detector_backend().name,)
+    )
+
+    started = time.monotonic()
+    video_seconds = 0.0
+    processed = failed = 0
+
+    async def process(job):
+        job_started = time.monotonic()
+        try:
+            gallery = galleries[job['class_id']]
+            # A run killed mid-video resumes that video from its last checkpoint
+            job_id = ResultCacheService.build_key(
+                job['key'], job['class_id'], gallery.version, model_version()
+            )
+            result = await loop.run_in_executor(
+                pool, process_video_file, job['path'], str(uuid.uuid4()), gallery, job_id
+            )
+            return job, result, None, time.monotonic() - job_started
+        except Exception as e:
+            return job, None, e, time.monotonic() - job_started
+
+    try:
+        with open(args.output, 'a') as output:
+            for next_done in asyncio.as_completed([process(job) for job in pending]):
+                job, result, error, elapsed = await next_done
+                entry = {
+                    'key': job['key'],
+                    'path': job['path'],
+                    'class_id': job['class_id'],
+                    'session_id': job['session_id'],
+                    'elapsed': round(elapsed, 3)
+                }
+
+                if error is None and writer is not None and job['session_id']:
+                    try:
+                        result['session'] = await writer.persist_session_results(
+                            job['session_id'], result['recognized_students']
+                        )
+                    except Exception as e:
+                        error = e
+
+                if error is None:
+                    processed += 1
+                    video_seconds += result['duration']
+                    entry.update(status='ok', result=result)
+                    status = f"✅ {result['unique_students_identified']} students"
+                else:
+                    failed += 1
+                    entry.update(status='error', error=str(error))
+                    status = f"❌ {error}"
+
+                write_entry(output, entry)
+                print(f"[{processed + failed}/{len(pending)}] {job['path']}: {status} ({elapsed:.1f}s)")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    wall = time.monotonic() - started
+    print("\n📊 Throughput")
+    print(f"   Videos:        {processed} ok, {failed} failed in {wall:.1f}s")
+    print(f"   Videos/min:    {processed / wall * 60:.2f}")
+    print(f"   Video time:    {video_seconds / 60:.1f} min ({video_seconds / wall:.1f}x realtime)")
+    print(f"   Workers:       {args.workers}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="Directory of videos (searched recursively)")
+    source.add_argument('--manifest', help="CSV/JSONL with path, class_id[, session_id]")
+    parser.add_argument('--class-id', help="Class for videos without one (default: all classes)")
+    parser.add_argument('--output', required=True, help="Results JSONL, also used to resume")
+    parser.add_argument('--write-db', action='store_true', help="Write attendance for rows with a session_id")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted; re-run with the same --output to resume")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark suite for the face service
+
+Examples:
+    python scripts/benchmark.py detection --input lecture.mp4
+    python scripts/benchmark.py detection --input frames/ --max-frames 500
+    python scripts/benchmark.py allocations --input lecture.mp4
+    python scripts/benchmark.py quantization --students 20000 --exemplars 5
+
+Each suite prints timings and the accuracy cost of the optimization it
+measures against the unoptimized reference path.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.services.face_detection import FaceDetectionService
+from app.services.gallery import PRECISIONS, Gallery
+from app.utils.video_utils import extract_frames
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_frames(path: str, max_frames: int) -> list:
+    """Sampled video frames, or the images of a directory"""
+    frames = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(path, name))
+                if image is not None:
+                    frames.append(image)
+    else:
+        for _, _, frame in extract_frames(path, settings.VIDEO_FRAME_RATE):
+            frames.append(frame)
+            if len(frames) >= max_frames:
+                break
+    return frames[:max_frames]
+
+
+def iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def timed(fn, frames):
+    """Run fn on every frame; returns (results, per-frame milliseconds)"""
+    results, times = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(fn(frame))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, np.asarray(times)
+
+
+def report_timing(name: str, times: np.ndarray):
+    print(f"   {name:<14} mean {times.mean():7.2f} ms   p95 {np.percentile(times, 95):7.2f} ms   "
+          f"total {times.sum() / 1000:7.2f} s")
+
+
+def allocated_per_frame(fn, frames):
+    """
+    Transient memory fn allocates per frame, and garbage collections it triggers
+
+    Returns:
+        (per-frame peak bytes above the pre-call baseline, gen-0 collections)
+    """
+    fn(frames[0])  # buffers are allocated on the first frame
+    collections = gc.get_stats()[0]['collections']
+    tracemalloc.start()
+    peaks = []
+    for frame in frames:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return np.asarray(peaks), gc.get_stats()[0]['collections'] - collections
+
+
+def reference_blob(image: np.ndarray, size: int) -> np.ndarray:
+    """Preprocessing before buffer reuse: resize, then blobFromImage"""
+    return cv2.dnn.blobFromImage(cv2.resize(image, (size, size)), 1.0, (size, size), (104.0, 177.0, 123.0))
+
+
+def reference_parse(detections: np.ndarray, w: int, h: int, threshold: float) -> list:
+    """Postprocessing before vectorization: one Python iteration per detection row"""
+    faces = []
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
+        if confidence > threshold:
+            x1, y1, x2, y2 = (detections[0, 0, i, 3:7] * np.array([w, h, w, h])).astype("int")
+            if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+                continue
+            faces.append({'bbox': [int(x1), int(y1), int(x2), int(y2)], 'confidence': float(confidence),
+                          'width': int(x2 - x1), 'height': int(y2 - y1)})
+    return faces
+
+
+def bench_allocations(args):
+    """Per-frame allocations and time of detection pre/postprocessing, fresh vs. reused buffers"""
+    frames = load_frames(args.input, args.max_frames)
+    if not frames:
+        sys.exit(f"❌ No frames loaded from {args.input}")
+
+    detector = FaceDetectionService()
+    size = detector.input_size
+    threshold = settings.DETECTION_CONFIDENCE
+    h, w = frames[0].shape[:2]
+
+    if detector.net is not None:
+        outputs = []
+        for frame in frames:
+            detector.net.setInput(detector._prepare_blob(frame))
+            outputs.append(detector.net.forward().copy())
+    else:
+        # No model: a typical SSD output (200 candidates, a few faces)
+        print("⚠️  DNN model not loaded; postprocessing uses synthetic detection tensors")
+        rng = np.random.RandomState(0)
+        outputs = []
+        for _ in frames:
+            detections = np.zeros((1, 1, 200, 7), dtype=np.float32)
+            detections[0, 0, :, 2] = rng.beta(0.3, 3.0, 200)
+            detections[0, 0, :, 3:5] = rng.uniform(0.0, 0.8, (200, 2))
+            detections[0, 0, :, 5:7] = detections[0, 0, :, 3:5] + rng.uniform(0.02, 0.2, (200, 2))
+            outputs.append(detections)
+    output_of = {id(frame): output for frame, output in zip(frames, outputs)}
+
+    paths = [
+        ("blob (fresh)", lambda f: reference_blob(f, size)),
+        ("blob (reused)", detector._prepare_blob),
+        ("parse (loop)", lambda f: reference_parse(output_of[id(f)], w, h, threshold)),
+        ("parse (vector)", lambda f: detector._parse_detections(output_of[id(f)], w, h, threshold)),
+        ("gray (fresh)", lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)),
+        ("gray (reused)", detector._gray),
+    ]
+    if detector.net is not None:
+        def reference_detect(frame):
+            detector.net.setInput(reference_blob(frame, size))
+            return reference_parse(detector.net.forward(), w, h, threshold)
+
+        paths += [
+            ("detect (before)", reference_detect),
+            ("detect (after)", lambda f: detector._detect_with_dnn(f, threshold)),
+        ]
+
+    print(f"🧪 Allocations: {len(frames)} frames of {w}x{h}, DNN input {size}x{size}")
+    print(f"\n   {'path':<16} {'mean ms':>8} {'p95 ms':>8} {'KiB/frame':>10} {'gen0 GCs':>9}")
+    for name, fn in paths:
+        _, times = timed(fn, frames)
+        peaks, collections = allocated_per_frame(fn, frames)
+        print(f"   {name:<16} {times.mean():8.3f} {np.percentile(times, 95):8.3f} "
+              f"{peaks.mean() / 1024:10.1f} {collections:9d}")
+
+
+def synthetic_gallery(students: int, exemplars: int, dim: int = 128, seed: int = 0):
+    """
+    Gallery rows shaped like dlib encodings: one centre per student
+    (components ~N(0, 0.09)), exemplars spread ~0.35 around it
+
+    Returns:
+        (student_ids, embeddings, owners)
+    """
+    rng = np.random.RandomState(seed)
+    centres = rng.normal(0.0, 0.09, (students, dim))
+    owners = np.repeat(np.arange(students, dtype=np.int32), exemplars)
+    embeddings = centres[owners] + rng.normal(0.0, 0.35 / np.sqrt(dim), (len(owners), dim))
+    return [f"student-{i}" for i in range(students)], embeddings, owners, centres
+
+
+def bench_quantization(args):
+    """Gallery memory, scan time and match accuracy per storage precision, against float32"""
+    student_ids, embeddings, owners, centres = synthetic_gallery(args.students, args.exemplars)
+    rng = np.random.RandomState(1)
+    dim = embeddings.shape[1]
+
+    # Enrolled faces seen again, plus strangers who should stay unmatched
+    enrolled = rng.randint(0, args.students, args.probes)
+    probes = centres[enrolled] + rng.normal(0.0, 0.4 / np.sqrt(dim), (args.probes, dim))
+    strangers = rng.normal(0.0, 0.09, (args.probes // 4, dim))
+    probes = np.vstack([probes, strangers])
+    batches = [probes[i:i + args.faces] for i in range(0, len(probes), args.faces)]
+
+    variants = [(precision, args.rerank) for precision in PRECISIONS]
+    variants += [('float16', 0), ('int8', 0)]
+
+    results = {}
+    for precision, rerank in variants:
+        gallery = Gallery(student_ids, student_ids, embeddings, owners, precision=precision, rerank=rerank)
+        distances, times = timed(gallery.student_distances, batches)
+        distances = np.vstack(distances)
+        results[precision, rerank] = (gallery.nbytes, times, distances)
+
+    _, _, reference = results['float32', args.rerank]
+    ref_best = reference.argmin(axis=1)
+    ref_distance = reference[np.arange(len(reference)), ref_best]
+    threshold = settings.RECOGNITION_THRESHOLD
+    ref_match = ref_distance < threshold
+
+    print(f"🧪 Quantization: {args.students} students x {args.exemplars} exemplars, "
+          f"{len(probes)} probes in batches of {args.faces}, threshold {threshold}")
+    print(f"   Reference match rate {ref_match.mean():.1%}")
+    print(f"\n   {'precision':<18} {'MiB':>8} {'ms/batch':>9} {'p95 ms':>8} "
+          f"{'top-1 agree':>12} {'flips':>6} {'max |Δd|':>10}")
+    for (precision, rerank), (nbytes, times, distances) in results.items():
+        best = distances.argmin(axis=1)
+        best_distance = distances[np.arange(len(distances)), best]
+        agree = (best == ref_best).mean()
+        flips = int(((best_distance < threshold) != ref_match).sum())
+        delta = np.abs(best_distance - ref_distance).max()
+        name = precision if precision in ('float64', 'float32') else f"{precision} (rerank {rerank})"
+        print(f"   {name:<18} {nbytes / 2 ** 20:8.1f} {times.mean():9.2f} {np.percentile(times, 95):8.2f} "
+              f"{agree:12.2%} {flips:6d} {delta:10.2e}")
+
+    int8_bytes = results['int8', args.rerank][0]
+    print(f"\n   int8 memory: {int8_bytes / results['float16', args.rerank][0]:.2f}x float16, "
+          f"{int8_bytes / results['float32', args.rerank][0]:.2f}x float32")
+
+
+def bench_detection(args):
+    """DNN-only vs. Haar-prefiltered cascade: speed and false-negative rate"""
+    frames = load_frames(args.input, args.max_frames)
+    if not frames:
+        sys.exit(f"❌ No frames loaded from {args.input}")
+
+    detector = FaceDetectionService()
+    if detector.net is None:
+        sys.exit("❌ DNN model not loaded (run scripts/download_models.py); it is the reference")
+
+    threshold = settings.DETECTION_CONFIDENCE
+    print(f"🧪 Detection: {len(frames)} frames, prefilter width {settings.CASCADE_PREFILTER_WIDTH}, "
+          f"full pass every {settings.CASCADE_FULL_FRAME_INTERVAL or 'never'}")
+
+    reference, dnn_times = timed(lambda f: detector._detect_with_dnn(f, threshold), frames)
+    cascade, cascade_times = timed(lambda f: detector._detect_cascade(f, threshold), frames)
+
+    expected = missed = extra = 0
+    empty = [i for i, faces in enumerate(reference) if not faces]
+    for ref_faces, got_faces in zip(reference, cascade):
+        matched = set()
+        for ref in ref_faces:
+            expected += 1
+            hit = next(
+                (j for j, got in enumerate(got_faces)
+                 if j not in matched and iou(ref['bbox'], got['bbox']) >= args.iou),
+                None
+            )
+            if hit is None:
+                missed += 1
+            else:
+                matched.add(hit)
+        extra += len(got_faces) - len(matched)
+
+    stats = detector.cascade_stats
+    print("\n⏱️  Timing")
+    report_timing("DNN only", dnn_times)
+    report_timing("Cascade", cascade_times)
+    if empty:
+        report_timing("DNN (empty)", dnn_times[empty])
+        report_timing("Cascade (empty)", cascade_times[empty])
+    print(f"   Speedup        {dnn_times.sum() / cascade_times.sum():.2f}x")
+
+    print("\n🎯 Accuracy vs. DNN only")
+    print(f"   Reference faces  {expected}")
+    print(f"   False negatives  {missed} ({missed / expected:.1%})" if expected else "   False negatives  n/a")
+    print(f"   Extra detections {extra}")
+
+    print("\n🔀 Cascade routing")
+    print(f"   Skipped {stats['skipped']}, ROI {stats['roi']}, full frame {stats['full']} "
+          f"of {stats['frames']} frames")
+
+
+SUITES = {
+    'detection': bench_detection,
+    'allocations': bench_allocations,
+    'quantization': bench_quantization,
+}
+
+# Suites that read frames from --input
+FRAME_SUITES = ('detection', 'allocations')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suite', choices=sorted(SUITES))
+    parser.add_argument('--input', help="Video file or directory of images (detection, allocations)")
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--iou', type=float, default=0.5, help="IoU for a detection to count as found")
+    parser.add_argument('--students', type=int, default=10000, help="Synthetic gallery size (quantization)")
+    parser.add_argument('--exemplars', type=int, default=5, help="Embeddings per student (quantization)")
+    parser.add_argument('--probes', type=int, default=2000, help="Enrolled-face probes (quantization)")
+    parser.add_argument('--faces', type=int, default=16, help="Faces per scan (quantization)")
+    parser.add_argument('--rerank', type=int, default=settings.GALLERY_RERANK_CANDIDATES,
+                        help="Rows re-ranked per face (quantization)")
+    args = parser.parse_args()
+    if args.suite in FRAME_SUITES and not args.input:
+        parser.error(f"--input is required for {args.suite}")
+
+    SUITES[args.suite](args)
+
+
+if __name__ == "__main__":
+    main()
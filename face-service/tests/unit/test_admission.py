@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.api.middleware import AdmissionMiddleware
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmission:
+
+    @pytest.mark.asyncio
+    async def test_queue_full_is_rejected_with_429(self):
+        """Test requests beyond slots plus queue are turned away at once"""
+        controller = AdmissionController('video', max_concurrent=1, max_queue=1, max_wait=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after >= 1
+        controller.release(1.0)
+        await waiter
+        assert controller.metrics()['rejected_queue_full'] == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_passed_is_rejected_with_503(self):
+        """Test a queued request gives up after its deadline and frees its queue place"""
+        controller = AdmissionController('video', max_concurrent=1, max_queue=4, max_wait=5)
+        await controller.acquire()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(timeout=0.01)
+
+        assert rejected.value.status_code == 503
+        assert controller.queued == 0 and controller.active == 1
+
+    @pytest.mark.asyncio
+    async def test_slots_are_handed_over_in_arrival_order(self):
+        """Test a released slot goes to the oldest waiter, not a newcomer"""
+        controller = AdmissionController('enrollment', max_concurrent=1, max_queue=4, max_wait=5)
+        await controller.acquire()
+        order = []
+
+        async def request(name):
+            await controller.acquire()
+            order.append(name)
+            controller.release()
+
+        tasks = [asyncio.ensure_future(request(name)) for name in 'abc']
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ['a', 'b', 'c']
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        """Test a client that disconnects while queued does not hold a slot"""
+        controller = AdmissionController('video', max_concurrent=1, max_queue=4, max_wait=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        controller.release()
+
+        assert controller.active == 0 and controller.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_middleware_rejects_before_calling_app(self):
+        """Test a saturated route answers 429 with Retry-After without reading the body"""
+        controller = AdmissionController('video', max_concurrent=1, max_queue=0, max_wait=5)
+        await controller.acquire()
+        called, sent = [], []
+
+        async def app(scope, receive, send):
+            called.append(scope['path'])
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = AdmissionMiddleware(app, {'/api/process-video': controller})
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/process-video', 'headers': []}
+        await middleware(scope, None, send)
+
+        assert called == []
+        assert sent[0]['status'] == 429
+        assert (b'retry-after', str(controller.retry_after()).encode()) in sent[0]['headers']
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app.utils import assignment_utils
+from app.utils.assignment_utils import assign
+
+
+class TestAssign:
+
+    @pytest.fixture(params=["hungarian", "greedy"])
+    def solver(self, request, monkeypatch):
+        if request.param == "hungarian":
+            pytest.importorskip("scipy")
+        else:
+            monkeypatch.setattr(assignment_utils, "linear_sum_assignment", None)
+        return request.param
+
+    def test_each_column_assigned_once(self, solver):
+        """Test two faces closest to the same student are not both assigned to it"""
+        cost = np.array([
+            [0.30, 0.50],
+            [0.35, 0.90]
+        ])
+        pairs = assign(cost, threshold=0.6)
+        assert pairs
+        assert len({col for _, col in pairs}) == len(pairs)
+
+    def test_threshold_excludes_pairs(self, solver):
+        """Test pairs at or above the threshold are never returned"""
+        cost = np.array([
+            [0.20, 0.70],
+            [0.65, 0.60]
+        ])
+        assert assign(cost, threshold=0.6) == [(0, 0)]
+
+    def test_empty(self, solver):
+        """Test empty matrices and all-infeasible costs"""
+        assert assign(np.empty((0, 3)), threshold=0.6) == []
+        assert assign(np.full((2, 2), 0.9), threshold=0.6) == []
+
+    def test_hungarian_maximises_matches(self):
+        """Test the optimal solver prefers two matches over one cheaper one"""
+        pytest.importorskip("scipy")
+        cost = np.array([
+            [0.30, 0.50],
+            [0.35, 0.90]
+        ])
+        assert assign(cost, threshold=0.6) == [(0, 1), (1, 0)]
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.services.cancellation import (
+    CancellationToken, JobAlreadyRunning, abort_job, cancellable_job, watch_disconnect
+)
+from app.utils.exceptions import ProcessingCancelledException
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.disconnect_after
+
+
+class TestCancellation:
+
+    def test_callbacks_fire_once(self):
+        """Test callbacks run on the first cancel only, and immediately once cancelled"""
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append('early'))
+        token.cancel('aborted')
+        token.cancel('again')
+        token.add_callback(lambda: calls.append('late'))
+
+        assert calls == ['early', 'late']
+        assert token.reason == 'aborted'
+        with pytest.raises(ProcessingCancelledException, match='aborted'):
+            token.raise_if_cancelled()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_token(self):
+        """Test the watcher sets the token once the client is gone"""
+        token = CancellationToken()
+        request = FakeRequest(disconnect_after=2)
+        await asyncio.wait_for(watch_disconnect(request, token, interval=0.001), 1)
+
+        assert token.is_set() and token.reason == 'client disconnected'
+        assert request.checks == 3
+
+    @pytest.mark.asyncio
+    async def test_abort_running_job_by_id(self):
+        """Test a registered job can be aborted by id until it finishes"""
+        async with cancellable_job(FakeRequest(disconnect_after=10 ** 6), 'job-1') as token:
+            with pytest.raises(JobAlreadyRunning):
+                async with cancellable_job(FakeRequest(0), 'job-1'):
+                    pass
+            assert abort_job('job-1')
+
+        assert token.reason == 'aborted'
+        assert not abort_job('job-1')
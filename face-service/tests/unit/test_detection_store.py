@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.detection_store import DetectionColumns, PresenceIntervals
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.video_pipeline import FrameResult
+
+
+def _frame(frame_number, faces):
+    """faces: [(student_id, confidence), ...]"""
+    result = FrameResult(frame_number, frame_number / 10.0, None)
+    result.faces = [
+        {'bbox': [frame_number, 0, frame_number + 40, 40], 'confidence': confidence}
+        for _, confidence in faces
+    ]
+    result.matches = [
+        {'recognized': True, 'student_id': sid, 'student_name': sid.upper()}
+        for sid, _ in faces
+    ]
+    return result
+
+
+class TestDetectionColumns:
+
+    def test_grows_past_capacity(self):
+        """Test appends beyond the initial capacity keep earlier rows intact"""
+        columns = DetectionColumns(capacity=2)
+        for i in range(5):
+            columns.append(i % 2, i, i / 10.0, [i, i, i + 1, i + 1], 0.5)
+
+        assert len(columns) == 5
+        assert columns.record(1).bbox == [1, 1, 2, 2]
+        assert columns.record(4).frame_number == 4
+
+    def test_best_per_student(self):
+        """Test top-k per student by confidence, earlier frame winning ties"""
+        columns = DetectionColumns()
+        for frame_number, student, confidence in [
+            (0, 0, 0.5), (1, 1, 0.9), (2, 0, 0.8), (3, 0, 0.8), (4, 0, 0.7)
+        ]:
+            columns.append(student, frame_number, 0.0, [0, 0, 1, 1], confidence)
+
+        best = columns.best_per_student(k=2)
+
+        assert [r.frame_number for r in best[0]] == [2, 3]
+        assert [r.frame_number for r in best[1]] == [1]
+
+
+class TestPresenceIntervals:
+
+    def test_gap_tolerance(self):
+        """Test short gaps extend an interval and long gaps start a new one"""
+        presence = PresenceIntervals(gap=2.0, sample_period=0.5)
+        for timestamp in [0.0, 0.5, 2.0, 10.0, 10.5]:
+            presence.add(timestamp)
+
+        assert presence.intervals == [[0.0, 2.5], [10.0, 11.0]]
+        assert presence.duration == pytest.approx(3.5)
+        assert (presence.first_seen, presence.last_seen) == (0.0, 11.0)
+
+    def test_merge_joins_across_segments(self):
+        """Test an interval spanning a segment boundary is merged into one"""
+        first = PresenceIntervals(gap=2.0, sample_period=0.5)
+        second = PresenceIntervals(gap=2.0, sample_period=0.5)
+        for timestamp in [0.0, 1.0]:
+            first.add(timestamp)
+        for timestamp in [2.0, 9.0]:
+            second.add(timestamp)
+
+        first.merge(second)
+
+        assert first.intervals == [[0.0, 2.5], [9.0, 9.5]]
+
+
+class TestDetectionAggregator:
+
+    def test_flushing_does_not_change_result(self):
+        """Test bounded buffering gives the same result as one final reduction"""
+        frames = [
+            _frame(i, [('a', 0.5 + 0.01 * i), ('b', 0.9 - 0.01 * i)] if i % 3 else [('a', 0.6)])
+            for i in range(40)
+        ]
+        stats = {'total_frames': 40, 'processed_frames': 40}
+
+        buffered = DetectionAggregator(None, flush_rows=4096)
+        streamed = DetectionAggregator(None, flush_rows=3)
+        for frame in frames:
+            buffered.add_frame(frame)
+            streamed.add_frame(frame)
+
+        expected = buffered.build_result("video", stats)
+        actual = streamed.build_result("video", stats)
+        for exp, act in zip(expected['recognized_students'], actual['recognized_students']):
+            assert act['confidence'] == pytest.approx(exp['confidence'])
+            assert act['detections'] == exp['detections']
+
+    def test_detections_are_best_k_in_frame_order(self):
+        """Test the reported detections are the most confident ones, by frame"""
+        aggregator = DetectionAggregator(None, best_k=2)
+        for frame_number, confidence in enumerate([0.6, 0.9, 0.7, 0.95]):
+            aggregator.add_frame(_frame(frame_number, [('a', confidence)]))
+
+        student = aggregator.build_result("video", {'total_frames': 4, 'processed_frames': 4})[
+            'recognized_students'
+        ][0]
+
+        assert [d['frame_number'] for d in student['detections']] == [1, 3]
+        assert student['confidence'] == pytest.approx(0.7875)
+
+    def test_min_presence_marks_short_visits(self):
+        """Test students seen for less than the minimum are not present"""
+        aggregator = DetectionAggregator(None, presence_gap=1.0, min_presence=1.0)
+        for frame_number in range(10):
+            faces = [('a', 0.9)] + ([('b', 0.9)] if frame_number < 2 else [])
+            aggregator.add_frame(_frame(frame_number, faces))
+
+        students = {
+            s['student_id']: s
+            for s in aggregator.build_result("video", {'total_frames': 10, 'processed_frames': 10})[
+                'recognized_students'
+            ]
+        }
+
+        assert students['a']['present'] is True
+        assert students['b']['present'] is False
+        assert students['b']['last_seen'] < students['a']['last_seen']
+
+    @pytest.mark.parametrize("gating", [False, True])
+    def test_liveness_reported_and_only_gated_when_enabled(self, gating):
+        """Test a failing liveness score drops the student only with gating on"""
+        liveness = LivenessDetectionService(threshold=1.01, min_samples=1)
+        aggregator = DetectionAggregator(liveness, liveness_gating=gating)
+        for frame_number in range(5):
+            frame = _frame(frame_number, [('a', 0.9)])
+            frame.crops = [np.full((50, 50), 100, dtype=np.uint8)]
+            aggregator.add_frame(frame)
+
+        result = aggregator.build_result("video", {'total_frames': 5, 'processed_frames': 5})
+
+        reported = result['liveness_rejected'] if gating else result['recognized_students']
+        assert [s['student_id'] for s in reported] == ['a']
+        assert reported[0]['liveness']['is_live'] is False
+        assert len(result['recognized_students']) == (0 if gating else 1)
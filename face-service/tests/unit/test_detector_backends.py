@@ -0,0 +1,72 @@
+import pytest
+
+from app.config import settings
+from app.services import detector_backends
+from app.services.detector_backends import get_backend, get_detector_backend, set_detector_backend
+from app.services import detector_calibration
+from app.services.detector_calibration import calibrate, calibration_frames, measure_backend
+
+
+@pytest.fixture(autouse=True)
+def fresh_selection(monkeypatch):
+    monkeypatch.setattr(
+        detector_backends, '_selection', {'backend': None, 'source': None, 'calibration': []}
+    )
+
+
+class TestDetectorBackends:
+
+    def test_registry_includes_dnn_sizes_and_haar(self):
+        """Test every DNN input size is offered on the always-available OpenCV CPU path"""
+        names = [b.name for b in detector_backends.available_backends()]
+        assert 'haar' in names
+        assert all(f"dnn-{size}-opencv-cpu" in names for size in detector_backends.DNN_INPUT_SIZES)
+
+    def test_override(self):
+        """Test a named backend replaces the default and unknown names are rejected"""
+        assert get_detector_backend().name == detector_backends.DEFAULT_BACKEND
+        set_detector_backend('haar')
+        assert get_detector_backend().name == 'haar'
+        with pytest.raises(ValueError):
+            set_detector_backend('dnn-999-nowhere-cpu')
+
+    def test_calibration_frames_have_ground_truth(self):
+        """Test synthetic frames contain the bundled face at known boxes, small ones included"""
+        frames, truth = calibration_frames()
+        assert len(frames) == len(truth) == 7
+        assert [len(boxes) for boxes in truth] == [1, 1, 1, 3, 3, 0, 0]
+        assert min(box[2] - box[0] for boxes in truth for box in boxes) < 50
+
+    def test_measure_haar(self):
+        """Test Haar finds the large calibration faces but not enough small ones to qualify"""
+        frames, truth = calibration_frames()
+        result = measure_backend(get_backend('haar'), frames[:3], truth[:3], rounds=1)
+        assert result['recall'] == 1.0
+        assert result['latency_ms'] > 0
+
+        result = measure_backend(get_backend('haar'), frames, truth, rounds=1)
+        assert result['recall'] < settings.DETECTOR_MIN_RECALL
+
+    def test_calibrate_selects_usable_backend(self):
+        """Test calibration records every backend and selects a measured one"""
+        results = calibrate(rounds=1)
+        measured = {r['backend'] for r in results if 'error' not in r}
+        assert get_detector_backend().name in measured
+        assert detector_backends.detector_backend_status()['source'] == 'calibration'
+
+    def test_calibration_rejects_false_positives(self, monkeypatch):
+        """Test a fast backend with many false detections loses to a clean one"""
+        measured = {
+            'haar': {'latency_ms': 1.0, 'recall': 0.95, 'false_positives': 12, 'false_positives_per_frame': 1.7},
+            'dnn-300-opencv-cpu': {'latency_ms': 9.0, 'recall': 0.93, 'false_positives': 0,
+                                   'false_positives_per_frame': 0.0},
+        }
+        monkeypatch.setattr(detector_calibration, 'available_backends', lambda: [
+            get_backend(name) for name in measured
+        ])
+        monkeypatch.setattr(detector_calibration, 'measure_backend', lambda backend, *args: dict(
+            measured[backend.name], backend=backend.name
+        ))
+
+        calibrate(min_recall=0.9, rounds=1, max_false_positives=0.2)
+        assert get_detector_backend().name == 'dnn-300-opencv-cpu'
@@ -1,6 +1,14 @@
+import cv2
 import pytest
 import numpy as np
-from app.services.face_detection import FaceDetectionService
+import os
+from pathlib import Path
+
+from app.config import settings
+from app.services.face_detection import FaceDetectionService, _merge_boxes
+
+PHOTO = Path(__file__).resolve().parents[2] / "photo1.jpg"
+FACE_IMAGE = os.path.join(os.path.dirname(__file__), '..', '..', 'app', 'models', 'calibration_face.jpg')
 
 
 class TestFaceDetection:
@@ -16,7 +24,7 @@ class TestFaceDetection:
     def test_detect_faces_empty_image(self, detector):
         """Test detection on empty image"""
         empty_image = np.zeros((480, 640, 3), dtype=np.uint8)
-        faces = detector.detect_faces(empty_image)
+        faces = detector.detect_video_frame(empty_image)
         assert isinstance(faces, list)
     
     def test_extract_face(self, detector, sample_image):
@@ -24,4 +32,124 @@ class TestFaceDetection:
         bbox = [100, 100, 300, 300]
         face = detector.extract_face(sample_image, bbox)
         assert face is not None
-        assert face.shape[0] > 0 and face.shape[1] > 0
\ No newline at end of file
+        assert face.shape[0] > 0 and face.shape[1] > 0
+
+
+class TestDetectionCascade:
+    
+    @pytest.fixture
+    def detector(self, monkeypatch):
+        """Detector whose DNN stage records the regions it is given"""
+        detector = FaceDetectionService()
+        detector.net = object()
+        detector.dnn_inputs = []
+        detector.thresholds = []
+        
+        def fake_dnn(image, threshold):
+            detector.dnn_inputs.append(image.shape[:2])
+            detector.thresholds.append(threshold)
+            h, w = image.shape[:2]
+            return [{'bbox': [w // 4, h // 4, 3 * w // 4, 3 * h // 4], 'confidence': 0.9,
+                     'width': w // 2, 'height': h // 2}]
+        
+        monkeypatch.setattr(detector, '_detect_with_dnn', fake_dnn)
+        monkeypatch.setattr(settings, 'DETECTION_CASCADE', True)
+        monkeypatch.setattr(settings, 'CASCADE_FULL_FRAME_INTERVAL', 0)
+        return detector
+    
+    def test_empty_frame_skips_dnn(self, detector):
+        """Test frames without prefilter candidates never reach the DNN"""
+        faces = detector.detect_video_frame(np.full((720, 1280, 3), 128, dtype=np.uint8))
+        assert faces == []
+        assert detector.dnn_inputs == []
+        assert detector.cascade_stats['skipped'] == 1
+    
+    def test_face_frame_runs_dnn_on_region(self, detector):
+        """Test the DNN sees a region around the face and boxes map back to the frame"""
+        image = cv2.imread(str(PHOTO))
+        if image is None:
+            pytest.skip("photo1.jpg not available")
+        
+        faces = detector.detect_video_frame(image)
+        
+        assert detector.cascade_stats['skipped'] == 0
+        assert len(detector.dnn_inputs) >= 1
+        x1, y1, x2, y2 = faces[0]['bbox']
+        assert 0 <= x1 < x2 <= image.shape[1] and 0 <= y1 < y2 <= image.shape[0]
+    
+    def test_periodic_full_frame_pass(self, detector, monkeypatch):
+        """Test every Nth frame bypasses the prefilter"""
+        monkeypatch.setattr(settings, 'CASCADE_FULL_FRAME_INTERVAL', 3)
+        empty = np.full((480, 640, 3), 128, dtype=np.uint8)
+        
+        for _ in range(6):
+            detector.detect_video_frame(empty)
+        
+        assert detector.cascade_stats['full'] == 2
+        assert detector.dnn_inputs == [(480, 640), (480, 640)]
+    
+    def test_small_face_in_hd_frame_reaches_dnn(self, detector, monkeypatch):
+        """Test a back-row sized face in a 1080p frame survives the downscaled prefilter"""
+        monkeypatch.setattr(settings, 'DETECTION_CONFIDENCE', 0.55)
+        face = cv2.resize(cv2.imread(FACE_IMAGE)[43:214, 42:213], (48, 48), interpolation=cv2.INTER_AREA)
+        frame = np.full((1080, 1920, 3), 128, dtype=np.uint8)
+        frame[500:548, 900:948] = face
+        
+        detector.detect_video_frame(frame)
+        
+        assert detector.cascade_stats['skipped'] == 0
+        assert detector.cascade_stats['roi'] == 1
+        assert detector.thresholds == [0.55]
+    
+    def test_still_images_bypass_cascade(self, detector):
+        """Test detect_faces runs the DNN on the whole image even without candidates"""
+        faces = detector.detect_faces(np.full((480, 640, 3), 128, dtype=np.uint8))
+        assert len(faces) == 1
+        assert detector.dnn_inputs == [(480, 640)]
+        assert detector.cascade_stats['frames'] == 0
+    
+    def test_merge_boxes(self):
+        """Test overlapping regions are unioned, chains included"""
+        merged = _merge_boxes([[0, 0, 10, 10], [50, 50, 60, 60], [5, 5, 20, 20], [18, 18, 30, 30]])
+        assert sorted(merged) == [[0, 0, 30, 30], [50, 50, 60, 60]]
+
+
+class TestDnnPreprocessing:
+    
+    @pytest.fixture
+    def detector(self):
+        return FaceDetectionService()
+    
+    def test_blob_matches_blob_from_image_and_reuses_buffer(self, detector):
+        """Test the buffered blob equals the cv2.dnn reference and is not reallocated"""
+        size = (detector.input_size, detector.input_size)
+        first = None
+        for shape in [(480, 640, 3), (720, 1280, 3)]:
+            image = np.random.RandomState(0).randint(0, 255, shape, dtype=np.uint8)
+            expected = cv2.dnn.blobFromImage(cv2.resize(image, size), 1.0, size, (104.0, 177.0, 123.0))
+            blob = detector._prepare_blob(image)
+            assert np.array_equal(blob, expected)
+            first = blob if first is None else first
+        assert blob is first
+    
+    def test_parse_detections_matches_per_row_loop(self):
+        """Test vectorized thresholding and scaling give the loop's faces, in order"""
+        rng = np.random.RandomState(1)
+        detections = np.zeros((1, 1, 200, 7), dtype=np.float32)
+        detections[0, 0, :, 2] = rng.rand(200)
+        detections[0, 0, :, 3:5] = rng.uniform(-0.1, 0.6, (200, 2))
+        detections[0, 0, :, 5:7] = rng.uniform(0.4, 1.1, (200, 2))
+        w, h = 1280, 720
+        
+        expected = []
+        for i in range(detections.shape[2]):
+            confidence = detections[0, 0, i, 2]
+            if confidence > 0.7:
+                x1, y1, x2, y2 = (detections[0, 0, i, 3:7] * np.array([w, h, w, h])).astype("int")
+                if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+                    continue
+                expected.append({'bbox': [int(x1), int(y1), int(x2), int(y2)], 'confidence': float(confidence),
+                                 'width': int(x2 - x1), 'height': int(y2 - y1)})
+        
+        assert FaceDetectionService._parse_detections(detections, w, h, 0.7) == expected
+        assert len(expected) > 0
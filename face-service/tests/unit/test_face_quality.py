@@ -0,0 +1,87 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.face_quality import FaceQualityGate
+
+FACE_IMAGE = os.path.join(os.path.dirname(__file__), '..', '..', 'app', 'models', 'calibration_face.jpg')
+FACE_BOX = [42, 43, 213, 214]
+
+
+def _face(bbox=FACE_BOX, confidence=0.95):
+    return {'bbox': list(bbox), 'confidence': confidence}
+
+
+class TestFaceQualityGate:
+
+    @pytest.fixture
+    def frame(self):
+        return cv2.imread(FACE_IMAGE)
+
+    @pytest.fixture
+    def gate(self):
+        return FaceQualityGate(
+            min_size=80, min_confidence=0.8, min_sharpness=100.0, brightness=(40.0, 220.0), defer_seconds=2.0
+        )
+
+    def test_scores_match_per_crop_computation(self, gate, frame):
+        """Test the stacked thumbnail pass equals scoring each crop with OpenCV"""
+        scores = gate.score([frame, frame], [[_face()], [_face([60, 60, 120, 130])]])
+
+        for i, (x1, y1, x2, y2) in enumerate([FACE_BOX, [60, 60, 120, 130]]):
+            thumbnail = cv2.resize(frame[y1:y2, x1:x2], (32, 32), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY).astype(np.float32)
+            laplacian = cv2.Laplacian(gray, cv2.CV_32F)[1:-1, 1:-1]
+            assert scores['sharpness'][i] == pytest.approx(laplacian.var(), rel=0.02)
+            assert scores['brightness'][i] == pytest.approx(gray.mean(), abs=1.0)
+        assert scores['size'].tolist() == [171, 60]
+
+    def test_rejects_small_blurred_dark_and_uncertain_faces(self, gate, frame):
+        """Test each threshold rejects on its own"""
+        blurred = cv2.GaussianBlur(frame, (0, 0), 10)
+        dark = (frame * 0.1).astype(np.uint8)
+        frames = [frame, frame, blurred, dark, frame]
+        faces = [[_face()], [_face([42, 43, 100, 100])], [_face()], [_face()], [_face(confidence=0.72)]]
+
+        assert gate.passes(gate.score(frames, faces)).tolist() == [True, False, False, False, False]
+
+    def test_rejected_face_rescued_once_per_window(self, gate, frame):
+        """Test a face seen only below the gate is still embedded once per defer window"""
+        blurred = cv2.GaussianBlur(frame, (0, 0), 10)
+        timestamps = [i * 0.5 for i in range(10)]
+        selected = gate.select([blurred] * 10, [[_face()]] * 10, timestamps, 0.5)
+
+        assert [t for t, (embed,) in zip(timestamps, selected) if embed] == [0.0, 2.0, 4.0]
+
+    def test_decisions_independent_of_earlier_frames(self, gate, frame):
+        """Test a resumed or segmented run embeds the same faces as one pass"""
+        behind = _face([110, 110, 150, 150], confidence=0.5)
+        frames, faces = [frame] * 20, [[_face(), behind]] * 20
+        timestamps = [i * 0.5 for i in range(20)]
+
+        whole = gate.select(frames, faces, timestamps, 0.5)
+        resumed = FaceQualityGate(
+            min_size=80, min_confidence=0.8, min_sharpness=100.0, brightness=(40.0, 220.0), defer_seconds=2.0
+        )
+        split = gate.select(frames[:7], faces[:7], timestamps[:7], 0.5)
+        split += resumed.select(frames[7:], faces[7:], timestamps[7:], 0.5)
+
+        assert split == whole
+        assert all(good for good, _ in whole)
+        assert [t for t, (_, poor) in zip(timestamps, whole) if poor] == [0.0, 2.0, 4.0, 6.0, 8.0]
+
+    def test_default_floors_keep_small_faces(self, frame):
+        """Test small, slightly soft back-row faces pass the default gate"""
+        gate = FaceQualityGate()
+        x1, y1, x2, y2 = FACE_BOX
+        frames, faces = [], []
+        for width in (24, 32, 48, 64):
+            small = cv2.resize(frame[y1:y2, x1:x2], (width, width), interpolation=cv2.INTER_AREA)
+            canvas = np.full((240, 320, 3), 128, dtype=np.uint8)
+            canvas[100:100 + width, 150:150 + width] = small
+            frames.append(cv2.GaussianBlur(canvas, (0, 0), 1.0))
+            faces.append([_face([150, 100, 150 + width, 100 + width], confidence=0.72)])
+
+        assert gate.passes(gate.score(frames, faces)).all()
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+
+pytest.importorskip("face_recognition")
+
+from app.services.face_recognition import FaceRecognitionService
+from app.services.gallery import Gallery
+
+PHOTO = Path(__file__).resolve().parents[2] / "photo1.jpg"
+FACE_BBOX = [187, 453, 662, 928]
+
+
+class TestFaceRecognition:
+
+    @pytest.fixture
+    def service(self):
+        return FaceRecognitionService()
+
+    @pytest.fixture
+    def photo(self):
+        image = cv2.imread(str(PHOTO))
+        if image is None:
+            pytest.skip("photo1.jpg not available")
+        return image
+
+    def test_encode_faces_one_per_box(self, service, photo):
+        """Test encodings are computed from given boxes, None for empty boxes"""
+        encodings = service.encode_faces(photo, [FACE_BBOX, [50, 50, 50, 80]])
+        assert len(encodings) == 2
+        assert encodings[0].shape == (128,)
+        assert encodings[1] is None
+
+    def test_recognize_faces_against_gallery(self, service, photo):
+        """Test a box is matched to the student enrolled from the same face"""
+        encoding = service.encode_faces(photo, [FACE_BBOX])[0]
+        gallery = Gallery(
+            ["student-1", "student-2"],
+            ["Alice", "Bob"],
+            np.stack([encoding, -encoding]),
+            np.array([0, 1], dtype=np.int32)
+        )
+
+        results = service.recognize_faces(photo, [FACE_BBOX], gallery)
+        assert len(results) == 1
+        assert results[0]['recognized'] is True
+        assert results[0]['student_id'] == "student-1"
+
+    def test_recognize_faces_empty_gallery(self, service, photo):
+        """Test no encoding work is done without enrolled students"""
+        results = service.recognize_faces(photo, [FACE_BBOX], Gallery.empty())
+        assert results == [{'recognized': False, 'reason': 'No enrolled students found'}]
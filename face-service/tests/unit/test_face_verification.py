@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from app.services.face_recognition_service import FaceVerificationService, TemplateCache, pair_distances
+from app.services.gallery_cache import GalleryCache
+
+ALICE = '00000000-0000-0000-0000-00000000000a'
+BOB = '00000000-0000-0000-0000-00000000000b'
+
+
+def _student(student_id, vectors):
+    return {
+        'student_id': student_id,
+        'name': student_id[-1].upper(),
+        'class_id': 'c1',
+        'is_active': True,
+        'embeddings': [{'id': f'{student_id}-{i}', 'embedding': v} for i, v in enumerate(vectors)]
+    }
+
+
+class TestFaceVerification:
+
+    @pytest.fixture
+    def fetches(self):
+        return []
+
+    @pytest.fixture
+    def templates(self, fetches):
+        students = {ALICE: _student(ALICE, [[0.0, 0.0], [1.0, 0.0]]), BOB: _student(BOB, [[0.0, 3.0]])}
+
+        async def fetch_students(ids):
+            fetches.append(sorted(ids))
+            return {i: students[i] for i in ids if i in students}
+
+        gallery_cache = GalleryCache()
+        gallery_cache.listening = True
+        return TemplateCache(gallery_cache, max_size=1, fetch_students=fetch_students)
+
+    def test_pair_distances(self):
+        """Test each probe is compared only with its own template"""
+        encodings = np.array([[0.9, 0.0], [0.0, 0.0]])
+        templates = [np.array([[0.0, 0.0], [1.0, 0.0]]), np.array([[0.0, 3.0]])]
+        assert pair_distances(encodings, templates) == pytest.approx([0.1, 3.0])
+
+    @pytest.mark.asyncio
+    async def test_templates_fetched_once_and_evicted_lru(self, templates, fetches):
+        """Test misses are fetched in one query and the cache stays within its size"""
+        first = await templates.get_many([ALICE, BOB, ALICE, 'not-a-uuid'])
+        assert fetches == [[ALICE, BOB]]
+        assert first['not-a-uuid'] is None and len(first[ALICE]) == 2
+
+        await templates.get_many([BOB])
+        assert len(fetches) == 1  # BOB was the most recent insert and survived
+
+        await templates.get_many([ALICE])
+        assert fetches[-1] == [ALICE]
+
+    @pytest.mark.asyncio
+    async def test_enrollment_change_invalidates_template(self, templates, fetches):
+        """Test a gallery refresh for a student drops their cached template"""
+        await templates.get_many([ALICE])
+        await templates.gallery_cache.refresh_student(ALICE)
+        await templates.get_many([ALICE])
+        assert fetches == [[ALICE], [ALICE]]
+
+    @pytest.mark.asyncio
+    async def test_verify_batch(self, templates, monkeypatch):
+        """Test pairs are matched against their own user, with per-pair errors"""
+        service = FaceVerificationService(recognizer=object(), templates=templates)
+        encodings = {b'alice': np.array([0.95, 0.0]), b'bob': np.array([0.0, 0.0])}
+        monkeypatch.setattr(service, '_encode_images', lambda images: [
+            (encodings[image], None) if image in encodings else (None, 'No face detected')
+            for image in images
+        ])
+
+        results = await service.verify_batch([
+            (ALICE, b'alice'), (BOB, b'bob'), (ALICE, b'blank'), ('unknown', b'alice')
+        ])
+
+        assert [r.is_match for r in results] == [True, False, False, False]
+        assert results[0].confidence == pytest.approx(0.95)
+        assert results[2].error == 'No face detected'
+        assert results[3].error == "No face data found for user unknown"
@@ -0,0 +1,231 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.gallery import Gallery
+from app.services.gallery_cache import GalleryCache
+
+
+def _student(student_id, name, class_id="class-1", embeddings=None, is_active=True):
+    return {
+        'student_id': student_id,
+        'name': name,
+        'class_id': class_id,
+        'is_active': is_active,
+        'embeddings': embeddings if embeddings is not None else [
+            {'id': f"{student_id}-e1", 'embedding': [1.0, 0.0]}
+        ]
+    }
+
+
+class FakeDatabase:
+    """Stands in for the gallery_cache fetch_* functions"""
+
+    def __init__(self, students):
+        self.students = {s['student_id']: s for s in students}
+        self.gallery_loads = 0
+
+    def _gallery(self, class_id):
+        return Gallery.from_students([
+            s for s in self.students.values()
+            if s['is_active'] and (class_id is None or s['class_id'] == class_id)
+        ])
+
+    async def fetch_gallery(self, class_id):
+        self.gallery_loads += 1
+        return self._gallery(class_id)
+
+    async def fetch_student(self, student_id):
+        return self.students.get(student_id)
+
+    async def fetch_gallery_version(self, class_id):
+        return self._gallery(class_id).version
+
+
+class TestGallery:
+
+    def test_with_and_without_student(self):
+        """Test copy-on-write updates keep owners aligned with students"""
+        gallery = Gallery.from_students([
+            _student("s1", "Alice", embeddings=[{'id': 'e1', 'embedding': [1.0, 0.0]}]),
+            _student("s2", "Bob", embeddings=[{'id': 'e2', 'embedding': [0.0, 1.0]}])
+        ])
+
+        updated = gallery.without_student("s1").with_student(
+            "s3", "Carol", [{'id': 'e3', 'embedding': [1.0, 1.0]}]
+        )
+
+        assert gallery.student_ids == ["s1", "s2"]
+        assert updated.student_ids == ["s2", "s3"]
+        assert updated.match(np.array([0.0, 1.0]))[0] == 0
+        assert updated.match(np.array([1.0, 1.0]))[0] == 1
+
+    def test_version_ignores_build_order(self):
+        """Test the version depends on content, not on how the gallery was built"""
+        students = [_student("s1", "Alice"), _student("s2", "Bob")]
+        built = Gallery.from_students(students)
+        patched = Gallery.from_students(students[1:]).with_student(
+            "s1", "Alice", students[0]['embeddings']
+        )
+
+        assert built.version == patched.version
+        assert built.version != Gallery.from_students(students[:1]).version
+
+    def test_student_distances_take_closest_embedding(self):
+        """Test the face x student matrix uses each student's nearest embedding"""
+        gallery = Gallery.from_students([
+            _student("s1", "Alice", embeddings=[
+                {'id': 'e1', 'embedding': [1.0, 0.0]},
+                {'id': 'e2', 'embedding': [0.0, 1.0]}
+            ]),
+            _student("s2", "Bob", embeddings=[{'id': 'e3', 'embedding': [3.0, 0.0]}])
+        ])
+        faces = np.array([[0.0, 1.0], [3.0, 0.0]])
+
+        distances = gallery.student_distances(faces)
+
+        expected = np.array([
+            [0.0, np.sqrt(10.0)],
+            [2.0, 0.0]
+        ])
+        np.testing.assert_allclose(distances, expected, atol=1e-6)
+
+    @pytest.mark.parametrize("precision, tolerance", [("float32", 1e-5), ("float16", 1e-3), ("int8", 1e-2)])
+    def test_compact_precisions_match_float64(self, precision, tolerance):
+        """Test compact galleries find the same students at nearly the same distances"""
+        rng = np.random.RandomState(0)
+        owners = rng.permutation(np.repeat(np.arange(50, dtype=np.int32), 3))
+        embeddings = rng.normal(0.0, 0.09, (len(owners), 128))
+        faces = embeddings[:20] + rng.normal(0.0, 0.01, (20, 128))
+        ids = [f"s{i}" for i in range(50)]
+
+        exact = Gallery(ids, ids, embeddings, owners)
+        compact = Gallery(ids, ids, embeddings, owners, precision=precision, rerank=3)
+
+        expected = exact.student_distances(faces)
+        distances = compact.student_distances(faces)
+        assert compact.nbytes < exact.nbytes
+        np.testing.assert_array_equal(distances.argmin(axis=1), expected.argmin(axis=1))
+        np.testing.assert_allclose(distances.min(axis=1), expected.min(axis=1), atol=tolerance)
+        assert compact.match(faces[0]) == (int(owners[0]), pytest.approx(expected[0].min(), abs=tolerance))
+
+    def test_int8_keeps_only_codes(self):
+        """Test int8 galleries hold no full-precision copy and take half of float16"""
+        rng = np.random.RandomState(0)
+        embeddings = rng.normal(0.0, 0.09, (200, 128))
+        owners = np.arange(200, dtype=np.int32)
+        ids = [f"s{i}" for i in range(200)]
+
+        half = Gallery(ids, ids, embeddings, owners, precision='float16')
+        int8 = Gallery(ids, ids, embeddings, owners, precision='int8')
+
+        assert int8.nbytes < 0.6 * half.nbytes
+        np.testing.assert_allclose(int8.embeddings, embeddings, atol=0.09 * 5 / 127)
+
+    def test_updates_keep_precision(self):
+        """Test copy-on-write updates return galleries of the same precision"""
+        gallery = Gallery.from_students([_student("s1", "Alice"), _student("s2", "Bob")], 'int8')
+
+        updated = gallery.without_student("s1").with_student(
+            "s3", "Carol", [{'id': 'e3', 'embedding': [0.0, 1.0]}]
+        )
+
+        assert updated.precision == 'int8' and updated.codes.dtype == np.int8
+        assert updated.match(np.array([0.0, 0.9]))[0] == 1
+
+    def test_unknown_precision_rejected(self):
+        """Test a misconfigured precision fails loudly"""
+        with pytest.raises(ValueError):
+            Gallery.from_students([_student("s1", "Alice")], 'int4')
+
+
+class TestGalleryCache:
+
+    @pytest.fixture
+    def database(self):
+        return FakeDatabase([
+            _student("s1", "Alice"),
+            _student("s2", "Bob", class_id="class-2")
+        ])
+
+    @pytest.fixture
+    def cache(self, database):
+        cache = GalleryCache(
+            database.fetch_gallery, database.fetch_student, database.fetch_gallery_version
+        )
+        cache.listening = True
+        return cache
+
+    @pytest.mark.asyncio
+    async def test_not_cached_while_not_listening(self, cache, database):
+        """Test galleries come from the database until notifications are live"""
+        cache.listening = False
+        await cache.get("class-1")
+        await cache.get("class-1")
+        assert database.gallery_loads == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_student_patches_cached_gallery(self, cache, database):
+        """Test an enrollment change is applied without reloading the class"""
+        await cache.get("class-1")
+        database.students["s3"] = _student("s3", "Carol")
+
+        await cache.refresh_student("s3", class_ids=("class-1",))
+
+        gallery = await cache.get("class-1")
+        assert gallery.student_ids == ["s1", "s3"]
+        assert gallery.version == await database.fetch_gallery_version("class-1")
+        assert database.gallery_loads == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_student_class_move(self, cache, database):
+        """Test a student moved between classes leaves the old gallery"""
+        await cache.get("class-1")
+        await cache.get("class-2")
+        database.students["s1"]['class_id'] = "class-2"
+
+        await cache.refresh_student("s1", class_ids=("class-2", "class-1"))
+
+        assert (await cache.get("class-1")).student_ids == []
+        assert (await cache.get("class-2")).student_ids == ["s2", "s1"]
+
+    @pytest.mark.asyncio
+    async def test_change_during_first_load_is_applied(self, cache, database):
+        """Test a notification arriving mid-fetch is not lost when the gallery is published"""
+        fetched = asyncio.Event()
+        release = asyncio.Event()
+        fetch_gallery = database.fetch_gallery
+
+        async def slow_fetch_gallery(class_id):
+            gallery = await fetch_gallery(class_id)
+            fetched.set()
+            await release.wait()
+            return gallery
+
+        cache._fetch_gallery = slow_fetch_gallery
+        load = asyncio.create_task(cache.get("class-1"))
+        await fetched.wait()
+
+        database.students["s3"] = _student("s3", "Carol")
+        database.students["s1"]['is_active'] = False
+        await cache.refresh_student("s3", class_ids=("class-1",))
+        await cache.refresh_student("s1", class_ids=("class-1",))
+        release.set()
+
+        gallery = await load
+        assert gallery.student_ids == ["s3"]
+        assert (await cache.get("class-1")) is gallery
+        assert gallery.version == await database.fetch_gallery_version("class-1")
+
+    @pytest.mark.asyncio
+    async def test_resync_reloads_stale_galleries(self, cache, database):
+        """Test only galleries whose version changed are reloaded"""
+        await cache.get("class-1")
+        await cache.get("class-2")
+        database.students["s2"]['is_active'] = False
+
+        await cache.resync()
+
+        assert (await cache.get("class-2")).student_ids == []
+        assert database.gallery_loads == 3
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.gallery import Gallery
+from app.services.gallery_cache import GalleryCache
+from app.services.gallery_prefetch import GalleryPrefetcher
+
+
+def _gallery(rows):
+    """Gallery of one student with rows 128-d float64 embeddings (rows KiB)"""
+    return Gallery(['s'], ['S'], np.zeros((rows, 128)), np.zeros(rows, dtype=np.int32))
+
+
+class TestGalleryPrefetcher:
+
+    @pytest.fixture
+    def loads(self):
+        return []
+
+    @pytest.fixture
+    def cache(self, loads):
+        sizes = {'c1': 1, 'c2': 1, 'c3': 1, 'big': 64}
+
+        async def fetch_gallery(class_id):
+            loads.append(class_id)
+            return _gallery(sizes[class_id])
+
+        cache = GalleryCache(fetch_gallery=fetch_gallery)
+        cache.listening = True
+        return cache
+
+    def _prefetcher(self, cache, class_ids, **kwargs):
+        async def fetch_classes(horizon, recent, limit):
+            return class_ids[:limit]
+
+        options = {'max_per_cycle': 10, 'delay': 0, 'max_bytes': 2 ** 20}
+        options.update(kwargs)
+        return GalleryPrefetcher(cache, fetch_classes=fetch_classes, **options)
+
+    @pytest.mark.asyncio
+    async def test_warms_uncached_classes_in_order(self, cache, loads):
+        """Test upcoming classes are loaded once, already cached ones skipped"""
+        await cache.get('c2')
+        prefetcher = self._prefetcher(cache, ['c1', 'c2', 'c3'])
+
+        assert await prefetcher.prefetch_once() == ['c1', 'c3']
+        assert await prefetcher.prefetch_once() == []
+        assert loads == ['c2', 'c1', 'c3']
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_per_cycle(self, cache):
+        """Test a scan loads at most max_per_cycle galleries"""
+        prefetcher = self._prefetcher(cache, ['c1', 'c2', 'c3'], max_per_cycle=2)
+        assert await prefetcher.prefetch_once() == ['c1', 'c2']
+        assert await prefetcher.prefetch_once() == ['c3']
+
+    @pytest.mark.asyncio
+    async def test_stays_within_memory_budget(self, cache):
+        """Test a gallery that overflows the budget is dropped and the scan stops"""
+        budget = 2 * _gallery(1).nbytes + 1
+        prefetcher = self._prefetcher(cache, ['c1', 'big', 'c2', 'c3'], max_bytes=budget)
+
+        assert await prefetcher.prefetch_once() == ['c1']
+        assert not cache.is_cached('big')
+        assert cache.memory_bytes() <= budget
+
+    @pytest.mark.asyncio
+    async def test_idle_while_not_listening(self, cache, loads):
+        """Test nothing is loaded while galleries would not be cached"""
+        cache.listening = False
+        assert await self._prefetcher(cache, ['c1']).prefetch_once() == []
+        assert loads == []
@@ -0,0 +1,91 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.detection_store import DetectionColumns
+from app.services.job_checkpoints import CheckpointStore, JobCheckpointer
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.video_pipeline import FrameResult
+
+FRAMES = [(0, ['a']), (5, ['a', 'b']), (10, ['b']), (15, ['a', 'c']), (20, ['c']), (25, ['a'])]
+
+
+def _frame(frame_number, student_ids):
+    result = FrameResult(frame_number, frame_number / 10.0, None)
+    result.faces = [
+        {'bbox': [10 + frame_number, 10, 60 + frame_number, 60], 'confidence': 0.5 + 0.01 * i}
+        for i in range(len(student_ids))
+    ]
+    result.matches = [
+        {'recognized': True, 'student_id': sid, 'student_name': sid.upper()}
+        for sid in student_ids
+    ]
+    result.crops = [np.full((50, 50), 100 + frame_number, dtype=np.uint8) for _ in student_ids]
+    return result
+
+
+class TestJobCheckpoints:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return CheckpointStore(str(tmp_path), ttl_seconds=3600)
+
+    @pytest.fixture
+    def liveness(self):
+        return LivenessDetectionService(threshold=0.5, min_samples=1)
+
+    def test_resume_matches_uninterrupted_run(self, store, liveness):
+        """Test a job restarted from its checkpoint produces the uninterrupted result"""
+        uninterrupted = DetectionAggregator(liveness)
+        for frame_number, ids in FRAMES:
+            uninterrupted.add_frame(_frame(frame_number, ids))
+
+        # First attempt checkpoints every frame and dies after frame 10
+        first = JobCheckpointer(store, 'job', liveness, interval=0)
+        for frame_number, ids in FRAMES[:3]:
+            first.on_frame(_frame(frame_number, ids))
+
+        resumed = JobCheckpointer(store, 'job', liveness, interval=0)
+        assert resumed.start_frame == 11
+        for frame_number, ids in FRAMES:
+            if frame_number >= resumed.start_frame:
+                resumed.on_frame(_frame(frame_number, ids))
+        stats = resumed.finish({'total_frames': 30, 'processed_frames': 3})
+
+        assert stats['processed_frames'] == 6
+        assert resumed.aggregator.build_result('video', stats) == \
+            uninterrupted.build_result('video', {'total_frames': 30, 'processed_frames': 6})
+        assert store.load('job') is None
+
+    def test_claim_is_exclusive_until_released(self, store):
+        """Test a second job of the same upload cannot take over a claimed checkpoint"""
+        claim = store.claim('job')
+        assert claim is not None
+        assert store.claim('job') is None
+        assert store.claim('other') is not None
+
+        store.release(claim)
+        assert store.claim('job') is not None
+
+    def test_unreadable_checkpoint_is_discarded(self, store, liveness, tmp_path):
+        """Test a corrupt checkpoint starts the job from scratch"""
+        (tmp_path / 'job.ckpt').write_bytes(b'not a checkpoint')
+
+        checkpointer = JobCheckpointer(store, 'job', liveness)
+
+        assert checkpointer.start_frame == 0
+        assert not (tmp_path / 'job.ckpt').exists()
+
+    def test_columns_pickle_only_filled_rows(self):
+        """Test buffered detections survive pickling without their spare capacity"""
+        columns = DetectionColumns(4096)
+        columns.append(3, 7, 0.7, [1, 2, 3, 4], 0.9)
+
+        data = pickle.dumps(columns)
+        restored = pickle.loads(data)
+
+        assert len(data) < 2048
+        assert len(restored) == 1 and len(restored.student) == 4096
+        assert restored.record(0).to_dict() == columns.record(0).to_dict()
@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+from app.services.liveness_detection import LivenessDetectionService
+from app.utils.stats_utils import RunningStat
+
+
+class TestLivenessDetection:
+
+    @pytest.fixture
+    def service(self):
+        return LivenessDetectionService(threshold=0.85, min_samples=3)
+
+    @pytest.fixture
+    def frame(self):
+        rng = np.random.default_rng(0)
+        return rng.integers(90, 160, (480, 640, 3), dtype=np.uint8)
+
+    def test_too_few_samples_is_undecided(self, service, frame):
+        """Test tracks are not gated before min_samples sightings"""
+        track = service.new_track()
+        service.observe(track, frame, [100, 100, 200, 200], 0.0)
+        result = service.evaluate(track)
+        assert result['samples'] == 1
+        assert result['is_live'] is None
+
+    def test_static_face_is_rejected(self, service, frame):
+        """Test a motionless, unchanging face (printed photo) fails"""
+        track = service.new_track()
+        for i in range(6):
+            service.observe(track, frame, [100, 100, 200, 200], i * 0.5)
+        result = service.evaluate(track)
+        assert result['motion'] == 0.0
+        assert result['is_live'] is False
+
+    def test_moving_blinking_face_passes(self, service, frame):
+        """Test micro-motion plus eye-band variation passes"""
+        track = service.new_track()
+        for i in range(8):
+            shifted = frame.copy()
+            offset = 4 * (i % 2)
+            if i % 3 == 0:
+                shifted[120 + offset:145 + offset, 100:210] = 230
+            bbox = [100 + offset, 100 + offset, 200 + offset, 200 + offset]
+            service.observe(track, shifted, bbox, i * 0.5)
+        result = service.evaluate(track)
+        assert result['motion'] > 0.9
+        assert result['blink'] > 0.9
+        assert result['is_live'] is True
+
+    def test_running_stat_merge_matches_sequential(self):
+        """Test merged stats equal stats over the concatenated data"""
+        values = [0.1, 0.4, 0.35, 0.8, 0.05, 0.6]
+        left, right, full = RunningStat(), RunningStat(), RunningStat()
+        for v in values[:2]:
+            left.push(v)
+        for v in values[2:]:
+            right.push(v)
+        for v in values:
+            full.push(v)
+        left.merge(right)
+        assert left.count == full.count
+        assert left.mean == pytest.approx(full.mean)
+        assert left.variance == pytest.approx(full.variance)
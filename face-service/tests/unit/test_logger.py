@@ -0,0 +1,65 @@
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener
+
+from app.utils.logger import JsonFormatter, SamplingFilter, SAMPLE_FRAME, _DeferredQueueHandler
+
+
+def _record(msg, *args, **extra):
+    record = logging.LogRecord('app.test', logging.DEBUG, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = []
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.append(threading.current_thread())
+
+
+class TestLogger:
+
+    def test_sampling_keeps_one_in_n_per_kind(self):
+        """Test sampled kinds are thinned independently and others always pass"""
+        sampler = SamplingFilter(every=10)
+
+        frames = sum(sampler.filter(_record("frame", **SAMPLE_FRAME)) for _ in range(100))
+        faces = sum(sampler.filter(_record("face", sample='face')) for _ in range(30))
+        plain = sum(sampler.filter(_record("plain")) for _ in range(5))
+
+        assert (frames, faces, plain) == (10, 3, 5)
+
+    def test_json_formatter(self):
+        """Test records render as one JSON object with the merged message"""
+        entry = json.loads(JsonFormatter().format(_record("Video %s: %d faces", 'abc', 3)))
+
+        assert entry['message'] == "Video abc: 3 faces"
+        assert entry['level'] == 'DEBUG'
+        assert entry['logger'] == 'app.test'
+
+    def test_formatting_happens_on_writer_thread(self):
+        """Test the calling thread only enqueues; the listener formats and writes"""
+        log_queue = queue.SimpleQueue()
+        capture = _Capture()
+        listener = QueueListener(log_queue, capture)
+        listener.start()
+
+        logger = logging.getLogger('app.test.queued')
+        logger.propagate = False
+        handler = _DeferredQueueHandler(log_queue)
+        logger.addHandler(handler)
+        try:
+            logger.warning("Image %s rejected", 7)
+        finally:
+            logger.removeHandler(handler)
+            listener.stop()
+
+        assert capture.records == ["Image 7 rejected"]
+        assert capture.threads[0] is not threading.current_thread()
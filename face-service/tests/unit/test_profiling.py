@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from app.config import settings
+from app.api.middleware import is_detector_admin, is_profiling_admin
+from app.utils.profiling import ProfileSession, ProfileStore, end_session, profiled, start_session
+
+
+class Service:
+    def __init__(self):
+        self.calls = 0
+
+    @profiled('test.work')
+    async def work(self):
+        self.calls += 1
+        return sum(i * i for i in range(20000))
+
+    @profiled('test.sync_work')
+    def sync_work(self):
+        return [bytes(1024) for _ in range(100)]
+
+
+class TestProfiling:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return ProfileStore(str(tmp_path), max_requests=2)
+
+    @pytest.mark.asyncio
+    async def test_no_session_runs_unprofiled(self, store):
+        """Test instrumented calls outside a profiled request write nothing"""
+        service = Service()
+        assert await service.work() == sum(i * i for i in range(20000))
+        assert store.list() == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('mode, profile_artifact', [('sample', 'test.work.folded'), ('cprofile', 'test.work.prof')])
+    async def test_profiled_call_writes_artifacts(self, store, mode, profile_artifact):
+        """Test a profiled request stores its profile and allocation summary"""
+        token = start_session(ProfileSession('req-1', mode, store))
+        try:
+            await Service().work()
+        finally:
+            end_session(token)
+
+        assert store.list()[0]['artifacts'] == sorted([profile_artifact, 'test.work.txt'])
+        with open(store.artifact_path('req-1', 'test.work.txt')) as f:
+            summary = f.read()
+        assert 'peak traced memory' in summary and 'Top allocation sites' in summary
+
+    def test_sync_call_and_pruning(self, store):
+        """Test sync instrumentation points and that only the newest requests are kept"""
+        for request_id in ('a', 'b', 'c'):
+            token = start_session(ProfileSession(request_id, 'cprofile', store))
+            try:
+                Service().sync_work()
+            finally:
+                end_session(token)
+            os.utime(os.path.join(store.directory, request_id), (0, {'a': 1, 'b': 2, 'c': 3}[request_id]))
+            store.prune()
+
+        assert [p['request_id'] for p in store.list()] == ['c', 'b']
+
+    def test_artifact_path_rejects_traversal(self, store):
+        """Test artifact lookups cannot leave the profile directory"""
+        assert store.artifact_path('../etc', 'passwd') is None
+        assert store.artifact_path('req-1', '../../secret') is None
+
+    def test_admin_token(self, monkeypatch):
+        """Test profiling is only triggered by the configured token"""
+        monkeypatch.setattr(settings, 'PROFILING_TOKEN', None)
+        assert not is_profiling_admin('anything')
+        monkeypatch.setattr(settings, 'PROFILING_TOKEN', 's3cret')
+        assert is_profiling_admin('s3cret')
+        assert not is_profiling_admin('wrong') and not is_profiling_admin(None)
+
+    def test_detector_admin_token_is_separate(self, monkeypatch):
+        """Test the detector override needs its own token and is off while unset"""
+        monkeypatch.setattr(settings, 'PROFILING_TOKEN', 's3cret')
+        monkeypatch.setattr(settings, 'DETECTOR_ADMIN_TOKEN', None)
+        assert not is_detector_admin('s3cret') and not is_detector_admin(None)
+        monkeypatch.setattr(settings, 'DETECTOR_ADMIN_TOKEN', 'admin')
+        assert is_detector_admin('admin') and not is_detector_admin('s3cret')
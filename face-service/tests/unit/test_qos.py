@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import qos
+from app.services.qos import plan_qos
+
+
+class TestQos:
+
+    @pytest.fixture(autouse=True)
+    def cost(self, monkeypatch):
+        """0.1 s per sampled frame at 2 fps"""
+        monkeypatch.setitem(qos._frame_cost, 'seconds', 0.1)
+        monkeypatch.setattr(settings, 'VIDEO_FRAME_RATE', 2)
+        monkeypatch.setattr(settings, 'QOS_BUDGET_FRACTION', 1.0)
+        monkeypatch.setattr(settings, 'QOS_MIN_FRAME_RATE', 0.5)
+
+    def test_fits_budget_at_full_quality(self):
+        """Test a budget that covers the whole video changes nothing but the deadline"""
+        plan = plan_qos(duration=60, latency_budget=30, priority='normal')
+        assert plan.frame_rate == 2 and plan.min_face_size == 0
+        assert not plan.degraded
+        assert plan.estimated_coverage == 1.0
+        assert plan.deadline == pytest.approx(time.time() + 30, abs=1)
+
+    def test_sampling_rate_lowered_to_fit(self):
+        """Test the sampling rate drops in proportion to the shortfall"""
+        plan = plan_qos(duration=60, latency_budget=6, priority='normal')
+        assert plan.frame_rate == pytest.approx(1.0)
+        assert plan.degraded and plan.estimated_coverage == 1.0
+
+    def test_interactive_skips_small_faces_then_stops_early(self):
+        """Test beyond the sampling floor interactive requests skip small faces and cover less"""
+        plan = plan_qos(duration=600, latency_budget=15, priority='interactive')
+        assert plan.frame_rate == 0.5
+        assert plan.min_face_size == settings.QOS_MIN_FACE_SIZE
+        assert plan.estimated_coverage == pytest.approx(0.5)
+
+        assert plan_qos(duration=600, latency_budget=15, priority='normal').min_face_size == 0
+
+    def test_batch_is_never_degraded(self):
+        """Test batch priority ignores the budget"""
+        plan = plan_qos(duration=600, latency_budget=1, priority='batch')
+        assert plan.deadline is None and not plan.degraded
+
+    def test_report_coverage(self):
+        """Test the report reflects where decoding stopped"""
+        plan = plan_qos(duration=60, latency_budget=6, priority='normal')
+        report = plan.report({'total_frames': 600, 'covered_frames': 150, 'stopped_early': True})
+        assert report['coverage'] == 0.25 and report['degraded'] and report['stopped_early']
+
+    def test_segmented_runs_recorded_per_pipeline(self, monkeypatch):
+        """Test a segmented run's cost is normalized so short in-process videos are not underestimated"""
+        monkeypatch.setitem(qos._frame_cost, 'seconds', None)
+        qos.record_frame_cost(processing_time=10.0, processed_frames=400, parallelism=4)
+        assert qos.frame_cost() == pytest.approx(0.1)
+
+        # 60 s at 2 fps needs 12 s on one pipeline, 3 s over four segments
+        assert plan_qos(duration=60, latency_budget=6, priority='normal').frame_rate == pytest.approx(1.0)
+        assert not plan_qos(duration=60, latency_budget=6, priority='normal', parallelism=4).degraded
+
+    def test_budget_counts_from_arrival(self):
+        """Test time spent queued and uploading is taken off the budget"""
+        # 60 s needs 12 s; of a 20 s budget, 14 s went to the queue and upload
+        arrived_at = time.time() - 14
+        plan = plan_qos(duration=60, latency_budget=20, priority='normal', arrived_at=arrived_at)
+
+        assert plan.deadline == pytest.approx(arrived_at + 20, abs=0.5)
+        assert plan.frame_rate == pytest.approx(1.0, rel=0.05)
+        assert plan.degraded
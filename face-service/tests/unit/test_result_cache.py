@@ -0,0 +1,51 @@
+import os
+import time
+import pytest
+from app.services.result_cache import ResultCacheService
+
+
+class TestResultCache:
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ResultCacheService(str(tmp_path), ttl_seconds=60, max_bytes=10_000)
+
+    def test_key_depends_on_gallery_version(self):
+        """Test enrollment changes produce a new key"""
+        key_a = ResultCacheService.build_key("abc", "class-1", "gallery-1", "model-1")
+        key_b = ResultCacheService.build_key("abc", "class-1", "gallery-2", "model-1")
+        assert key_a != key_b
+        assert key_a == ResultCacheService.build_key("abc", "class-1", "gallery-1", "model-1")
+
+    @pytest.mark.asyncio
+    async def test_set_and_get(self, cache):
+        """Test stored result is returned on hit"""
+        await cache.set("key", {"video_id": "v1", "recognized_students": []})
+        assert await cache.get("key") == {"video_id": "v1", "recognized_students": []}
+        assert await cache.get("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_miss(self, cache, tmp_path):
+        """Test entries older than the TTL are dropped"""
+        await cache.set("key", {"video_id": "v1"})
+        old = time.time() - 120
+        os.utime(tmp_path / "key.json", (old, old))
+        assert await cache.get("key") is None
+        assert not (tmp_path / "key.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, tmp_path):
+        """Test size budget evicts least recently used entries first"""
+        cache = ResultCacheService(str(tmp_path), ttl_seconds=60, max_bytes=2_500)
+        payload = {"data": "x" * 1000}
+
+        await cache.set("first", payload)
+        await cache.set("second", payload)
+        now = time.time()
+        os.utime(tmp_path / "first.json", (now - 10, now))
+        os.utime(tmp_path / "second.json", (now - 20, now))
+        await cache.set("third", payload)
+
+        assert await cache.get("second") is None
+        assert await cache.get("first") == payload
+        assert await cache.get("third") == payload
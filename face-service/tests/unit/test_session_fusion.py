@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.session_fusion import fuse_camera_results
+
+
+def _student(student_id, confidence, intervals, liveness=None):
+    student = {
+        'student_id': student_id,
+        'student_name': student_id.upper(),
+        'confidence': confidence,
+        'detections': [
+            {'bbox': [0, 0, 10, 10], 'confidence': confidence, 'frame_number': 0, 'timestamp': start}
+            for start, _ in intervals
+        ],
+        'presence_intervals': [{'start': start, 'end': end} for start, end in intervals]
+    }
+    if liveness is not None:
+        student['liveness'] = liveness
+    return student
+
+
+def _result(recognized, rejected=()):
+    return {
+        'total_faces_detected': 10,
+        'recognized_students': list(recognized),
+        'liveness_rejected': list(rejected)
+    }
+
+
+class TestSessionFusion:
+
+    def test_best_confidence_and_union_of_presence(self):
+        """Test a student seen by two cameras is reported once on the session clock"""
+        results = [
+            _result([_student('a', 0.7, [(0.0, 20.0)]), _student('b', 0.8, [(0.0, 5.0)])]),
+            _result([_student('a', 0.9, [(10.0, 30.0)])])
+        ]
+
+        fused = fuse_camera_results(results, offsets=[0.0, 5.0], presence_gap=1.0, min_presence=0.0)
+
+        students = {s['student_id']: s for s in fused['recognized_students']}
+        assert fused['unique_students_identified'] == 2
+        assert fused['total_faces_detected'] == 20
+        assert students['a']['confidence'] == 0.9
+        assert students['a']['cameras'] == [0, 1]
+        assert students['a']['presence_intervals'] == [{'start': 0.0, 'end': 35.0}]
+        assert students['a']['presence_duration'] == pytest.approx(35.0)
+        assert [d['camera'] for d in students['a']['detections']] == [0, 1]
+        assert students['a']['detections'][1]['timestamp'] == 15.0
+
+    def test_liveness_rejected_only_if_no_camera_passed(self):
+        """Test a spoof flag from one camera is overridden by a live sighting elsewhere"""
+        results = [
+            _result([], rejected=[_student('a', 0.8, [(0.0, 1.0)]), _student('b', 0.8, [(0.0, 1.0)])]),
+            _result([_student('a', 0.7, [(0.0, 1.0)])])
+        ]
+
+        fused = fuse_camera_results(results, presence_gap=1.0, min_presence=0.0)
+
+        assert [s['student_id'] for s in fused['recognized_students']] == ['a']
+        assert [s['student_id'] for s in fused['liveness_rejected']] == ['b']
+
+    def test_min_presence_uses_fused_duration(self):
+        """Test presence split across cameras counts toward the minimum"""
+        results = [
+            _result([_student('a', 0.8, [(0.0, 30.0)])]),
+            _result([_student('a', 0.8, [(60.0, 90.0)])])
+        ]
+
+        fused = fuse_camera_results(results, presence_gap=1.0, min_presence=45.0)
+
+        assert fused['recognized_students'][0]['present'] is True
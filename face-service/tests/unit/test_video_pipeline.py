@@ -0,0 +1,119 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from app.services.video_pipeline import ModelPool, VideoPipeline
+from app.utils.exceptions import ProcessingCancelledException
+
+
+class FakeDetector:
+    def detect_video_frame(self, frame):
+        return [{'bbox': [10, 10, 50, 50], 'confidence': 0.9}]
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    """40-frame 10 fps video whose pixel values encode the frame number"""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 64))
+    for i in range(40):
+        writer.write(np.full((64, 64, 3), i * 5, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+class TestVideoPipeline:
+
+    def _pipeline(self, video_path, on_frame, recognize=None, **kwargs):
+        return VideoPipeline(
+            video_path,
+            detector_pool=ModelPool(FakeDetector),
+            recognize=recognize or (lambda frame, faces: [{'recognized': True} for _ in faces]),
+            on_frame=on_frame,
+            frame_rate=2,
+            batch_size=2,
+            queue_size=1,
+            detect_workers=3,
+            recognize_workers=2,
+            **kwargs
+        )
+
+    def test_frames_sampled_and_aggregated_in_order(self, video_path):
+        """Test sampled frames reach the aggregator in frame order"""
+        seen = []
+        stats = self._pipeline(video_path, lambda r: seen.append(r.frame_number)).run()
+        assert seen == list(range(0, 40, 5))
+        assert stats['processed_frames'] == 8
+        assert stats['total_frames'] == 40
+
+    def test_frame_range(self, video_path):
+        """Test start/end frames keep the global sampling grid"""
+        seen = []
+        self._pipeline(
+            video_path, lambda r: seen.append(r.frame_number), start_frame=12, end_frame=31
+        ).run()
+        assert seen == [15, 20, 25, 30]
+
+    def test_stage_error_is_raised(self, video_path):
+        """Test an exception in a worker stage propagates from run()"""
+        def recognize(frame, faces):
+            raise RuntimeError("model failure")
+
+        with pytest.raises(RuntimeError, match="model failure"):
+            self._pipeline(video_path, lambda r: None, recognize=recognize).run()
+
+    def test_cancel(self, video_path):
+        """Test cancel() stops the pipeline"""
+        pipeline = None
+
+        def on_frame(result):
+            pipeline.cancel()
+
+        pipeline = self._pipeline(video_path, on_frame)
+        with pytest.raises(ProcessingCancelledException):
+            pipeline.run()
+
+    def test_deadline_stops_early(self, video_path):
+        """Test a passed deadline ends decoding without an error"""
+        stats = self._pipeline(video_path, lambda r: None, deadline=0.0).run()
+        assert stats['stopped_early'] is True
+        assert stats['processed_frames'] == 0 and stats['covered_frames'] == 0
+
+    def test_small_faces_skipped(self, video_path):
+        """Test faces narrower than min_face_size never reach recognition"""
+        seen = []
+        self._pipeline(video_path, lambda r: seen.append(len(r.faces)), min_face_size=41).run()
+        assert seen == [0] * 8
+
+    def test_cancel_event(self, video_path):
+        """Test setting the cancel event stops every stage"""
+        event = threading.Event()
+
+        def recognize(frame, faces):
+            event.set()
+            return [{'recognized': True} for _ in faces]
+
+        with pytest.raises(ProcessingCancelledException):
+            self._pipeline(video_path, lambda r: None, recognize=recognize, cancel_event=event).run()
+
+    def test_quality_gate_skips_embedding(self, video_path):
+        """Test faces held back by the gate are not recognized but still counted"""
+        class Gate:
+            def select(self, frames, faces, timestamps, period):
+                return [[timestamp < 1.0 for _ in frame_faces] for frame_faces, timestamp in zip(faces, timestamps)]
+
+        recognized = []
+
+        def recognize(frame, faces):
+            recognized.append(len(faces))
+            return [{'recognized': True} for _ in faces]
+
+        matches = []
+        stats = self._pipeline(
+            video_path, lambda r: matches.append(r.matches[0]['recognized']), recognize=recognize, quality_gate=Gate()
+        ).run()
+
+        assert matches == [True, True, False, False, False, False, False, False]
+        assert len(recognized) == 2
+        assert stats['embedded_faces'] == 2 and stats['gated_faces'] == 6
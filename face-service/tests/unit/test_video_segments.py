@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from app.services.detection_aggregator import DetectionAggregator
+from app.services.liveness_detection import LivenessDetectionService
+from app.services.video_pipeline import FrameResult
+from app.services.video_segments import plan_segments
+
+
+def _frame(frame_number, student_ids):
+    result = FrameResult(frame_number, frame_number / 10.0, None)
+    result.faces = [
+        {'bbox': [10 + frame_number, 10, 60 + frame_number, 60], 'confidence': 0.5 + 0.01 * i}
+        for i in range(len(student_ids))
+    ]
+    result.matches = [
+        {'recognized': True, 'student_id': sid, 'student_name': sid.upper()}
+        for sid in student_ids
+    ]
+    result.crops = [np.full((50, 50), 100 + frame_number, dtype=np.uint8) for _ in student_ids]
+    return result
+
+
+class TestVideoSegments:
+
+    def test_plan_segments_covers_video(self):
+        """Test segments are contiguous and cover every frame"""
+        segments = plan_segments(total_frames=9000, fps=30, max_segments=4, min_segment_seconds=60)
+        assert len(segments) == 4
+        assert segments[0][0] == 0 and segments[-1][1] == 9000
+        assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+    def test_plan_segments_short_video_not_split(self):
+        """Test videos shorter than two minimum segments stay whole"""
+        assert plan_segments(total_frames=1500, fps=30, max_segments=8, min_segment_seconds=60) == [(0, 1500)]
+
+    def test_merged_segments_match_sequential(self):
+        """Test merging segment aggregates in order equals one sequential pass"""
+        liveness = LivenessDetectionService(threshold=0.5, min_samples=1)
+        frames = [
+            (0, ['a']), (5, ['a', 'b']), (10, ['b']), (15, ['a', 'c']), (20, ['c']), (25, ['a'])
+        ]
+
+        sequential = DetectionAggregator(liveness)
+        for frame_number, ids in frames:
+            sequential.add_frame(_frame(frame_number, ids))
+
+        merged = DetectionAggregator(liveness)
+        for frame_number, ids in frames[:3]:
+            merged.add_frame(_frame(frame_number, ids))
+        second = DetectionAggregator(liveness)
+        for frame_number, ids in frames[3:]:
+            second.add_frame(_frame(frame_number, ids))
+        merged.merge(second)
+
+        stats = {'total_frames': 30, 'processed_frames': 6}
+        expected = sequential.build_result("video", stats)
+        actual = merged.build_result("video", stats)
+        expected_liveness = [s.pop('liveness') for s in expected['recognized_students']]
+        actual_liveness = [s.pop('liveness') for s in actual['recognized_students']]
+        assert actual == expected
+
+        # Motion across the segment boundary is not observed; the rest merges exactly
+        for exp, act in zip(expected_liveness, actual_liveness):
+            assert act['samples'] == exp['samples']
+            assert act['blink'] == pytest.approx(exp['blink'], abs=1e-9)
+            assert act['texture'] == pytest.approx(exp['texture'])